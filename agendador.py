@@ -0,0 +1,350 @@
+"""
+Agendador de tarefas seguro para múltiplos processos
+Todos os workers rodam o agendador, mas apenas o líder (lease no banco) executa as tarefas
+"""
+
+import atexit
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+import db
+import metricas
+
+DB = db.DB
+
+# Duração da liderança e intervalo de renovação (segundos)
+LEASE_SEGUNDOS = int(os.getenv('AGENDADOR_LEASE', '60'))
+HEARTBEAT_SEGUNDOS = int(os.getenv('AGENDADOR_HEARTBEAT', '15'))
+
+# Execuções perdidas (ex: líder caiu no horário) são recuperadas até este limite
+TOLERANCIA_ATRASO = timedelta(hours=int(os.getenv('AGENDADOR_TOLERANCIA_HORAS', '6')))
+
+# Tarefas sob demanda: intervalo mínimo entre execuções e espera após um erro
+INTERVALO_SOB_DEMANDA = timedelta(seconds=60)
+ESPERA_APOS_ERRO = timedelta(minutes=int(os.getenv('AGENDADOR_ESPERA_ERRO_MINUTOS', '5')))
+
+NOME_LEASE = 'agendador'
+
+logger = logging.getLogger(__name__)
+
+
+def criar_tabelas(conn):
+    """Cria as tabelas de liderança e de execuções do agendador"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS agendador_lider (
+            nome TEXT PRIMARY KEY,
+            dono TEXT NOT NULL,
+            expira_em REAL NOT NULL,
+            heartbeat_em REAL NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS agendador_execucoes (
+            tarefa TEXT NOT NULL,
+            agendado_para TEXT NOT NULL,
+            executado_por TEXT NOT NULL,
+            inicio TIMESTAMP,
+            fim TIMESTAMP,
+            status TEXT DEFAULT 'Executando',
+            erro TEXT,
+            PRIMARY KEY (tarefa, agendado_para)
+        )
+    ''')
+
+
+class Agendador:
+    """
+    Agendador com lease de liderança no banco de dados
+
+    Cada processo mantém um BackgroundScheduler, mas uma tarefa só roda
+    no processo que detém o lease. O lease é renovado por heartbeat e
+    assumido por outro processo quando expira. Cada disparo é reservado
+    em agendador_execucoes, então uma mesma ocorrência nunca roda duas
+    vezes, nem durante a troca de líder.
+
+    Tarefas sob demanda não têm horário fixo: o líder consulta quando
+    precisam rodar e agenda um único disparo para esse momento,
+    reavaliado após cada execução e a cada heartbeat.
+    """
+
+    def __init__(self, db=DB):
+        self.db = db
+        self.identidade = None
+        self.lider = False
+        self._tarefas = {}
+        self._sob_demanda = {}
+        self._agendadas = {}
+        self._nao_antes = {}
+        self._executando = set()
+        self._lock_sob_demanda = threading.Lock()
+        self._scheduler = None
+
+    def adicionar_tarefa(self, func, tarefa_id, trigger='cron', **trigger_args):
+        """Registra uma tarefa (trigger 'cron' ou 'interval' do APScheduler)"""
+        if trigger == 'cron':
+            trigger_obj = CronTrigger(**trigger_args)
+        elif trigger == 'interval':
+            trigger_obj = IntervalTrigger(**trigger_args)
+        else:
+            raise ValueError(f"Trigger não suportado: {trigger}")
+
+        self._tarefas[tarefa_id] = (func, trigger_obj)
+        if self._scheduler:
+            self._agendar(tarefa_id)
+
+    def adicionar_tarefa_sob_demanda(self, func, tarefa_id, proxima_execucao):
+        """
+        Registra uma tarefa que roda quando houver trabalho
+
+        Args:
+            func: Função executada
+            tarefa_id: Identificador da tarefa
+            proxima_execucao: Função que retorna o datetime em que func deve
+                rodar (no passado = o quanto antes) ou None se não há nada a fazer
+        """
+        self._tarefas[tarefa_id] = (func, None)
+        self._sob_demanda[tarefa_id] = proxima_execucao
+        if self._scheduler and self.lider:
+            self._reprogramar(tarefa_id)
+
+    def iniciar(self):
+        """Inicia o agendador neste processo"""
+        if self._scheduler:
+            return
+
+        # A identidade é definida aqui, e não no __init__, para ser única após um fork
+        self.identidade = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        with db.conectar(self.db) as conn:
+            criar_tabelas(conn)
+            conn.commit()
+
+        self._scheduler = BackgroundScheduler()
+        self._scheduler.add_job(
+            self.heartbeat,
+            trigger=IntervalTrigger(seconds=HEARTBEAT_SEGUNDOS),
+            id='agendador_heartbeat',
+        )
+        for tarefa_id in self._tarefas:
+            if tarefa_id not in self._sob_demanda:
+                self._agendar(tarefa_id)
+
+        self._scheduler.start()
+        atexit.register(self.parar)
+
+        self.heartbeat()
+        logger.info(f"Agendador iniciado ({self.identidade}) - líder: {self.lider}")
+
+    def parar(self):
+        """Para o agendador e libera o lease para outro processo assumir"""
+        if not self._scheduler:
+            return
+
+        self._scheduler.shutdown(wait=False)
+        self._scheduler = None
+
+        if self.lider:
+            try:
+                with db.conectar(self.db) as conn:
+                    conn.execute('UPDATE agendador_lider SET expira_em = 0 WHERE nome = ? AND dono = ?',
+                                 (NOME_LEASE, self.identidade))
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Erro ao liberar liderança: {e}")
+            self.lider = False
+
+    def heartbeat(self):
+        """Renova o lease (se líder) ou tenta assumi-lo (se expirado)"""
+        era_lider = self.lider
+        agora = time.time()
+
+        try:
+            with db.conectar(self.db) as conn:
+                cursor = conn.execute('''
+                    INSERT INTO agendador_lider (nome, dono, expira_em, heartbeat_em)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(nome) DO UPDATE SET
+                        dono = excluded.dono,
+                        expira_em = excluded.expira_em,
+                        heartbeat_em = excluded.heartbeat_em
+                    WHERE agendador_lider.dono = excluded.dono
+                       OR agendador_lider.expira_em < ?
+                ''', (NOME_LEASE, self.identidade, agora + LEASE_SEGUNDOS, agora, agora))
+                conn.commit()
+                self.lider = cursor.rowcount == 1
+        except sqlite3.Error as e:
+            # Sem conseguir renovar não há garantia de exclusividade
+            logger.warning(f"Erro no heartbeat do agendador: {e}")
+            self.lider = False
+
+        if self.lider and not era_lider:
+            logger.info(f"Liderança do agendador assumida por {self.identidade}")
+            self._recuperar_atrasadas()
+        elif era_lider and not self.lider:
+            logger.warning(f"Liderança do agendador perdida por {self.identidade}")
+
+        # Alterações feitas por outros processos são percebidas aqui
+        if self.lider and self._scheduler:
+            for tarefa_id in self._sob_demanda:
+                self._reprogramar(tarefa_id)
+
+        return self.lider
+
+    def _agendar(self, tarefa_id):
+        func, trigger = self._tarefas[tarefa_id]
+        self._scheduler.add_job(
+            self._executar,
+            trigger=trigger,
+            args=(tarefa_id,),
+            id=tarefa_id,
+            replace_existing=True,
+        )
+
+    def _reprogramar(self, tarefa_id):
+        """Agenda o disparo de uma tarefa sob demanda para o momento atual indicado por ela"""
+        with self._lock_sob_demanda:
+            # Reprogramada ao fim da execução em andamento
+            if tarefa_id in self._executando:
+                return
+            try:
+                quando = self._sob_demanda[tarefa_id]()
+            except Exception as e:
+                logger.error(f"Erro ao consultar a próxima execução de {tarefa_id}: {e}")
+                return
+
+            if quando is not None:
+                quando = max(quando, datetime.now(), self._nao_antes.get(tarefa_id, datetime.min))
+            if quando == self._agendadas.get(tarefa_id):
+                return
+
+            self._agendadas[tarefa_id] = quando
+            if quando is None:
+                if self._scheduler.get_job(tarefa_id):
+                    self._scheduler.remove_job(tarefa_id)
+                return
+
+            self._scheduler.add_job(
+                self._executar_sob_demanda,
+                trigger=DateTrigger(run_date=quando),
+                args=(tarefa_id,),
+                id=tarefa_id,
+                replace_existing=True,
+            )
+
+    def _executar_sob_demanda(self, tarefa_id):
+        with self._lock_sob_demanda:
+            self._executando.add(tarefa_id)
+        try:
+            status = self._executar(tarefa_id)
+        finally:
+            with self._lock_sob_demanda:
+                self._executando.discard(tarefa_id)
+        espera = ESPERA_APOS_ERRO if status == 'Erro' else INTERVALO_SOB_DEMANDA
+        self._nao_antes[tarefa_id] = datetime.now() + espera
+        self._agendadas.pop(tarefa_id, None)
+        if self._scheduler:
+            self._reprogramar(tarefa_id)
+
+    def _reservar(self, tarefa_id, agendado_para):
+        """Reserva uma ocorrência; retorna False se outro processo já a executou"""
+        with db.conectar(self.db) as conn:
+            cursor = conn.execute('''
+                INSERT OR IGNORE INTO agendador_execucoes (tarefa, agendado_para, executado_por, inicio)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (tarefa_id, agendado_para, self.identidade))
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def _disparo_atual(self, tarefa_id):
+        """
+        Horário agendado do disparo em execução: o último do trigger até agora
+
+        A ocorrência é identificada por ele, e não pelo relógio no momento da
+        execução, para que um disparo atrasado (ou recuperado por outro líder)
+        não seja executado de novo. Tarefas sob demanda usam o horário atual.
+        """
+        agora = datetime.now().astimezone()
+        _, trigger = self._tarefas[tarefa_id]
+        if trigger is None:
+            return agora
+
+        disparo, proximo = None, trigger.get_next_fire_time(None, agora - TOLERANCIA_ATRASO)
+        while proximo and proximo <= agora:
+            disparo, proximo = proximo, trigger.get_next_fire_time(proximo, proximo + timedelta(seconds=1))
+        return disparo or agora
+
+    def _executar(self, tarefa_id, agendado_para=None):
+        """
+        Executa a tarefa se este processo for o líder
+
+        Returns:
+            Status da execução ('Concluída' ou 'Erro'), ou None se não executou
+        """
+        if not self.lider:
+            return
+
+        if agendado_para is None:
+            agendado_para = self._disparo_atual(tarefa_id).strftime('%Y-%m-%d %H:%M')
+
+        if not self._reservar(tarefa_id, agendado_para):
+            return
+
+        func, _ = self._tarefas[tarefa_id]
+        status, erro = 'Concluída', None
+        inicio = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            status, erro = 'Erro', str(e)
+            logger.error(f"Erro na tarefa {tarefa_id}: {e}")
+        metricas.TAREFA_DURACAO.labels(tarefa_id, status).observe(time.perf_counter() - inicio)
+
+        with db.conectar(self.db) as conn:
+            conn.execute('''
+                UPDATE agendador_execucoes SET fim = CURRENT_TIMESTAMP, status = ?, erro = ?
+                WHERE tarefa = ? AND agendado_para = ?
+            ''', (status, erro, tarefa_id, agendado_para))
+            conn.commit()
+        return status
+
+    def _recuperar_atrasadas(self):
+        """Executa disparos que ocorreram enquanto não havia líder"""
+        agora = datetime.now().astimezone()
+
+        for tarefa_id, (_, trigger) in self._tarefas.items():
+            if not isinstance(trigger, CronTrigger):
+                continue
+
+            with db.conectar(self.db) as conn:
+                ultima = conn.execute(
+                    'SELECT MAX(agendado_para) FROM agendador_execucoes WHERE tarefa = ?',
+                    (tarefa_id,)
+                ).fetchone()[0]
+
+            # Sem execução anterior não há como saber se o disparo já foi feito
+            if not ultima:
+                continue
+
+            desde = max(agora - TOLERANCIA_ATRASO,
+                        datetime.strptime(ultima, '%Y-%m-%d %H:%M').astimezone() + timedelta(minutes=1))
+
+            disparo = trigger.get_next_fire_time(None, desde)
+            if disparo and disparo <= agora:
+                logger.info(f"Recuperando execução atrasada de {tarefa_id} ({disparo:%d/%m/%Y %H:%M})")
+                self._scheduler.add_job(
+                    self._executar,
+                    args=(tarefa_id, disparo.strftime('%Y-%m-%d %H:%M')),
+                    id=f'{tarefa_id}_recuperacao',
+                    replace_existing=True,
+                )
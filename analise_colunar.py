@@ -0,0 +1,314 @@
+"""
+Cache colunar para análises cruzadas (pivots) dos ativos
+As colunas usadas nas análises ficam em memória como arrays NumPy
+(textos codificados por dicionário, valores float e datas como ordinais);
+tabelas cruzadas e somas filtradas são feitas com operações vetorizadas,
+sem GROUP BY no banco. As escritas chegam pela tabela ativos_alteracoes,
+alimentada por triggers, e são aplicadas de forma incremental
+
+O NumPy só é importado ao montar as colunas: criar as tabelas e podar o
+fluxo de mudanças (init_db e agendador) não pesam na inicialização
+"""
+
+import logging
+import threading
+from datetime import date
+
+import cache
+import db
+
+# Dimensões disponíveis para linhas, colunas e filtros (expressão na consulta)
+DIMENSOES = {
+    'estado': 'a.estado',
+    'categoria': 'c.nome',
+    'localizacao': 'a.localizacao',
+    'responsavel': 'a.responsavel',
+    'fornecedor': 'a.fornecedor',
+}
+
+# Colunas de ativos cuja alteração entra no fluxo de mudanças
+COLUNAS_MONITORADAS = ('estado', 'categoria_id', 'localizacao', 'responsavel', 'fornecedor',
+                       'valor_aquisicao', 'data_aquisicao')
+
+# Acima desse número de ativos alterados, recarregar tudo sai mais barato
+LIMITE_INCREMENTAL = 5000
+
+# Entradas mantidas em ativos_alteracoes pela limpeza periódica; um
+# processo que ficar mais atrás que isso recarrega tudo
+ALTERACOES_MANTIDAS = 50000
+
+logger = logging.getLogger(__name__)
+
+
+def criar_tabelas(conn):
+    """
+    Cria a tabela ativos_alteracoes e os triggers que a alimentam
+
+    Cada escrita que mexe numa coluna analisada registra o id do ativo com
+    um número de sequência; cada processo lembra até onde já aplicou.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ativos_alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            ativo_id INTEGER NOT NULL
+        )
+    ''')
+
+    colunas = ', '.join(COLUNAS_MONITORADAS)
+    for nome, evento, origem in [('insert', 'INSERT', 'NEW'),
+                                 ('update', f'UPDATE OF {colunas}', 'NEW'),
+                                 ('delete', 'DELETE', 'OLD')]:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS ativos_alteracoes_{nome} AFTER {evento} ON ativos
+            BEGIN
+                INSERT INTO ativos_alteracoes (ativo_id) VALUES ({origem}.id);
+            END
+        ''')
+
+
+def limpar_alteracoes(manter=ALTERACOES_MANTIDAS):
+    """
+    Apaga as entradas mais antigas do fluxo de mudanças
+
+    Returns:
+        Número de entradas removidas
+    """
+    with db.conectar() as conn:
+        cursor = conn.execute(
+            'DELETE FROM ativos_alteracoes WHERE seq <= (SELECT MAX(seq) FROM ativos_alteracoes) - ?', (manter,))
+        return cursor.rowcount
+
+
+def _ordinal(valor):
+    """Data 'AAAA-MM-DD' como ordinal (0 se vazia ou inválida)"""
+    if not valor:
+        return 0
+    try:
+        return date.fromisoformat(str(valor)[:10]).toordinal()
+    except ValueError:
+        return 0
+
+
+class Dicionario:
+    """Codificação de valores de uma dimensão em inteiros (None incluído)"""
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codificar(self, valor):
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def codigos(self, valores):
+        """Códigos dos valores já conhecidos (os desconhecidos são ignorados)"""
+        return [self._codigos[v] for v in valores if v in self._codigos]
+
+
+class Colunas:
+    """
+    Colunas de ativos em arrays NumPy
+
+    Linhas de ativos excluídos ficam marcadas em 'vivo' até a próxima
+    recarga completa; inclusões são acrescentadas ao final (os arrays
+    crescem dobrando de capacidade).
+    """
+
+    def __init__(self, capacidade=1024):
+        import numpy as np
+
+        self.total = 0
+        self.linha_por_id = {}
+        self.dicionarios = {dim: Dicionario() for dim in DIMENSOES}
+        self.codigos = {dim: np.zeros(capacidade, dtype=np.int32) for dim in DIMENSOES}
+        self.valor = np.zeros(capacidade, dtype=np.float64)
+        self.data = np.zeros(capacidade, dtype=np.int32)
+        self.vivo = np.zeros(capacidade, dtype=bool)
+        self.excluidos = 0
+
+    def _crescer(self, minimo):
+        import numpy as np
+
+        capacidade = max(minimo, 2 * len(self.vivo))
+        for dim, array in self.codigos.items():
+            self.codigos[dim] = np.resize(array, capacidade)
+        self.valor = np.resize(self.valor, capacidade)
+        self.data = np.resize(self.data, capacidade)
+        vivo = np.zeros(capacidade, dtype=bool)
+        vivo[:self.total] = self.vivo[:self.total]
+        self.vivo = vivo
+
+    def gravar(self, ativo_id, dimensoes, valor, data):
+        """Inclui ou atualiza a linha do ativo"""
+        linha = self.linha_por_id.get(ativo_id)
+        if linha is None:
+            if self.total == len(self.vivo):
+                self._crescer(self.total + 1)
+            linha = self.linha_por_id[ativo_id] = self.total
+            self.total += 1
+        for dim, valor_dim in zip(DIMENSOES, dimensoes):
+            self.codigos[dim][linha] = self.dicionarios[dim].codificar(valor_dim)
+        self.valor[linha] = valor or 0.0
+        self.data[linha] = _ordinal(data)
+        self.vivo[linha] = True
+
+    def excluir(self, ativo_id):
+        linha = self.linha_por_id.pop(ativo_id, None)
+        if linha is not None:
+            self.vivo[linha] = False
+            self.excluidos += 1
+
+
+def _consulta_ativos(where=''):
+    return f'''
+        SELECT a.id, {', '.join(DIMENSOES.values())}, a.valor_aquisicao, a.data_aquisicao
+        FROM ativos a
+        LEFT JOIN categorias c ON c.id = a.categoria_id
+        {where}
+    '''
+
+
+class AnaliseColunar:
+    """
+    Cache colunar do processo, sincronizado com o fluxo de mudanças
+
+    Sem escritas, a verificação antes de cada consulta custa a leitura das
+    versões já feita pelo cache padrão; com escritas em ativos, apenas os
+    ativos alterados são relidos. Uma alteração em categorias (ex: nome)
+    recarrega tudo.
+    """
+
+    def __init__(self):
+        self._colunas = None
+        self._seq = 0
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def _recarregar(self, conn):
+        colunas = Colunas()
+        conn.execute('BEGIN')
+        try:
+            # Sequência e dados lidos no mesmo instantâneo do banco
+            seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM ativos_alteracoes').fetchone()[0]
+            for linha in conn.execute(_consulta_ativos()):
+                colunas.gravar(linha[0], linha[1:-2], linha[-2], linha[-1])
+        finally:
+            conn.rollback()
+        self._colunas = colunas
+        self._seq = seq
+        logger.info(f'Cache colunar carregado: {colunas.total} ativos')
+
+    def _aplicar_alteracoes(self, conn):
+        """Aplica as alterações posteriores à última aplicada (False se precisar recarregar)"""
+        minimo, maximo = conn.execute('SELECT MIN(seq), MAX(seq) FROM ativos_alteracoes').fetchone()
+        if maximo is None or maximo <= self._seq:
+            return True
+        if minimo > self._seq + 1:
+            return False
+
+        ids = [linha[0] for linha in conn.execute(
+            'SELECT DISTINCT ativo_id FROM ativos_alteracoes WHERE seq > ? AND seq <= ?', (self._seq, maximo))]
+        if len(ids) > LIMITE_INCREMENTAL:
+            return False
+
+        encontrados = set()
+        for inicio in range(0, len(ids), 500):
+            lote = ids[inicio:inicio + 500]
+            where = f"WHERE a.id IN ({','.join('?' * len(lote))})"
+            for linha in conn.execute(_consulta_ativos(where), lote):
+                self._colunas.gravar(linha[0], linha[1:-2], linha[-2], linha[-1])
+                encontrados.add(linha[0])
+        for ativo_id in set(ids) - encontrados:
+            self._colunas.excluir(ativo_id)
+
+        # Muitas linhas excluídas ocupando espaço: compacta na próxima recarga
+        if self._colunas.excluidos > self._colunas.total // 5:
+            return False
+        self._seq = maximo
+        return True
+
+    def _sincronizar(self):
+        """Deixa as colunas em dia com o banco (chamado com o lock)"""
+        versoes = cache.cache.versoes_atuais()
+        versao = (versoes.get('ativos'), versoes.get('categorias'))
+        if self._colunas is not None and versao == self._versao:
+            return
+        with db.conectar() as conn:
+            categorias_iguais = self._versao is not None and versao[1] == self._versao[1]
+            if self._colunas is None or not categorias_iguais or not self._aplicar_alteracoes(conn):
+                self._recarregar(conn)
+        self._versao = versao
+
+    def pivot(self, linhas, colunas=None, filtros=None, de=None, ate=None):
+        """
+        Tabela cruzada de quantidade e valor de aquisição dos ativos
+
+        Args:
+            linhas: Dimensão das linhas (chave de DIMENSOES)
+            colunas: Dimensão das colunas (None para uma coluna única)
+            filtros: {dimensão: [valores aceitos]}
+            de, ate: Período de aquisição (date, inclusive)
+
+        Returns:
+            dict com 'linhas' e 'colunas' (valores das dimensões), as
+            matrizes 'quantidade' e 'valor' e os totais
+        """
+        import numpy as np
+
+        for dim in [linhas, colunas] + list(filtros or {}):
+            if dim is not None and dim not in DIMENSOES:
+                raise ValueError(f'Dimensão desconhecida: {dim}')
+
+        with self._lock:
+            self._sincronizar()
+            dados = self._colunas
+            n = dados.total
+
+            mascara = dados.vivo[:n].copy()
+            for dim, valores in (filtros or {}).items():
+                mascara &= np.isin(dados.codigos[dim][:n], dados.dicionarios[dim].codigos(valores))
+            if de:
+                mascara &= dados.data[:n] >= de.toordinal()
+            if ate:
+                mascara &= dados.data[:n] <= ate.toordinal()
+
+            codigos_linha = dados.codigos[linhas][:n][mascara]
+            rotulos_linha = list(dados.dicionarios[linhas].valores)
+            if colunas:
+                codigos_coluna = dados.codigos[colunas][:n][mascara]
+                rotulos_coluna = list(dados.dicionarios[colunas].valores)
+            else:
+                codigos_coluna = np.zeros(len(codigos_linha), dtype=np.int32)
+                rotulos_coluna = ['Total']
+            valores = dados.valor[:n][mascara]
+
+        # Célula (linha, coluna) como um único índice para o bincount
+        forma = (len(rotulos_linha), len(rotulos_coluna))
+        celulas = codigos_linha.astype(np.int64) * forma[1] + codigos_coluna
+        quantidade = np.bincount(celulas, minlength=forma[0] * forma[1]).reshape(forma)
+        valor = np.bincount(celulas, weights=valores, minlength=forma[0] * forma[1]).reshape(forma)
+
+        # Apenas linhas/colunas com algum ativo, maiores totais primeiro
+        ordem_linhas = [i for i in np.argsort(-quantidade.sum(axis=1), kind='stable') if quantidade[i].any()]
+        ordem_colunas = [j for j in np.argsort(-quantidade.sum(axis=0), kind='stable') if quantidade[:, j].any()]
+        quantidade = quantidade[np.ix_(ordem_linhas, ordem_colunas)]
+        valor = valor[np.ix_(ordem_linhas, ordem_colunas)]
+
+        return {
+            'linhas': [rotulos_linha[i] for i in ordem_linhas],
+            'colunas': [rotulos_coluna[j] for j in ordem_colunas],
+            'quantidade': quantidade.tolist(),
+            'valor': np.round(valor, 2).tolist(),
+            'total_linhas': {'quantidade': quantidade.sum(axis=1).tolist(),
+                             'valor': np.round(valor.sum(axis=1), 2).tolist()},
+            'total_colunas': {'quantidade': quantidade.sum(axis=0).tolist(),
+                              'valor': np.round(valor.sum(axis=0), 2).tolist()},
+            'total': {'quantidade': int(quantidade.sum()), 'valor': round(float(valor.sum()), 2)},
+        }
+
+
+# Cache colunar padrão do processo
+analise = AnaliseColunar()
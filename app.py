@@ -1,17 +1,30 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify, session, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
+from flask.logging import default_handler
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
-import qrcode
+import io
 import os
-import pandas as pd
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import db
 import email_service
-from apscheduler.schedulers.background import BackgroundScheduler
-import atexit
-import logging
-from logging.handlers import RotatingFileHandler
+import etiquetas_zpl
+import versao_dados
+import valores_filtro
+import autocompletar
+import busca_facetada
+import busca_trigramas
+import desempenho
+import metricas
+import consultas_lentas
+import log_estruturado
+import relatorio_jobs
+import manutencao_resumo
+import planos_manutencao
+import estado_alertas
+import cache
+from cache import Cache, em_cache
 from functools import wraps
 
 app = Flask(__name__)
@@ -20,28 +33,34 @@ app.config['PERMANENT_SESSION_LIFETIME'] = 1800  # 30 minutos
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 
-DB = "ativos.db"
+DB = db.DB
 QR_FOLDER = "static/qrcodes"
 BASE_URL = os.environ.get('BASE_URL', 'http://localhost:5000')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'xls', 'xlsx'}
 
-# Configurar logging
-if not os.path.exists('logs'):
-    os.makedirs('logs')
-
-logging.basicConfig(level=logging.INFO)
-file_handler = RotatingFileHandler('logs/sistema_ativos.log', maxBytes=10240000, backupCount=10)
-file_handler.setFormatter(logging.Formatter(
-    '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-))
-app.logger.addHandler(file_handler)
-app.logger.setLevel(logging.INFO)
-app.logger.info('Sistema de Ativos iniciado')
-
-os.makedirs(QR_FOLDER, exist_ok=True)
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'fotos'), exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'documentos'), exist_ok=True)
+# Segundos que a requisição espera pelo relatório antes de mostrar a página de acompanhamento
+RELATORIOS_ESPERA = float(os.getenv('RELATORIOS_ESPERA', '3'))
+
+_app_configurada = False
+
+# Listas completas de ativos (etiquetas): poucas entradas, validade curta.
+# Requisições simultâneas iguais (link compartilhado, toda a equipe às 9h)
+# executam a consulta uma única vez e recebem o mesmo resultado
+cache_relatorios = Cache(max_itens=8, ttl=int(os.getenv('RELATORIOS_CACHE_TTL', '60')))
+
+# Páginas de leitura respondidas com 304 enquanto as tabelas de que dependem não mudarem
+ROTAS_CONDICIONAIS = {
+    'api_analise_pivot': ('ativos', 'categorias'),
+    'api_manutencoes_custos': ('manutencoes', 'categorias'),
+    'api_manutencoes_mais_caros': ('manutencoes', 'ativos', 'categorias'),
+    'api_manutencoes_mtbf': ('manutencoes', 'ativos', 'categorias'),
+    'api_manutencoes_planejadas': ('manutencoes_fila', 'ativos'),
+    'api_dashboard': lambda widget: WIDGETS_DASHBOARD[widget][0] if widget in WIDGETS_DASHBOARD else None,
+    'ativos': ('ativos', 'categorias'),
+    'ativo': ('ativos', 'categorias', 'anexos', 'manutencoes', 'historico', 'manutencoes_fila'),
+    'categorias': ('categorias', 'ativos'),
+    'relatorios': ('ativos',),
+}
 
 # Configurar Flask-Login
 login_manager = LoginManager()
@@ -72,14 +91,14 @@ class User(UserMixin):
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        with sqlite3.connect(DB) as conn:
-            user_data = conn.execute(
-                'SELECT id, username, email, nome, perfil, ativo FROM usuarios WHERE id = ?',
-                (user_id,)
-            ).fetchone()
-
-            if user_data and user_data[5]:  # ativo = True
-                return User(user_data[0], user_data[1], user_data[2], user_data[3], user_data[4], user_data[5])
+        # Executado a cada requisição: reutiliza a conexão da thread
+        user_data = db.conexao_persistente().execute(
+            'SELECT id, username, email, nome, perfil, ativo FROM usuarios WHERE id = ?',
+            (user_id,)
+        ).fetchone()
+
+        if user_data and user_data[5]:  # ativo = True
+            return User(user_data[0], user_data[1], user_data[2], user_data[3], user_data[4], user_data[5])
     except Exception as e:
         app.logger.error(f'Erro ao carregar usuário: {e}')
     return None
@@ -90,17 +109,149 @@ def allowed_file(filename):
 def registrar_historico(ativo_id, acao, campo=None, valor_anterior=None, valor_novo=None):
     try:
         usuario = current_user.username if current_user.is_authenticated else 'Sistema'
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             conn.execute('''
                 INSERT INTO historico (ativo_id, acao, campo, valor_anterior, valor_novo, usuario, ip_address)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (ativo_id, acao, campo, valor_anterior, valor_novo, usuario, request.remote_addr))
             conn.commit()
     except Exception as e:
-        print(f"Erro ao registrar histórico: {e}")
+        app.logger.error(f"Erro ao registrar histórico: {e}")
+
+def destino_local(url, padrao):
+    """URL de retorno vinda do cliente, aceita só se for um caminho deste site"""
+    if not url or not url.startswith('/') or url.startswith('//') or url.startswith('/\\'):
+        return padrao
+    return url
+
+@em_cache(('categorias',))
+def listar_categorias():
+    """Categorias para os seletores dos formulários (id, nome, icone)"""
+    with db.conectar() as conn:
+        return conn.execute('SELECT id, nome, icone FROM categorias ORDER BY nome').fetchall()
+
+# Janela (dias) das garantias e manutenções mostradas no dashboard
+DASHBOARD_JANELA_DIAS = 30
+
+def widget_totais(hoje):
+    """Total de ativos e quantos estão ativos, em manutenção e inativos"""
+    with db.conectar() as conn:
+        total, ativos, em_manutencao, inativos = conn.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(estado = 'Ativo'), 0),
+                   COALESCE(SUM(estado IN ('Em manutenção', 'Em Manutenção')), 0),
+                   COALESCE(SUM(estado = 'Inativo'), 0)
+            FROM ativos
+        """).fetchone()
+    return {'total': total, 'ativos': ativos, 'em_manutencao': em_manutencao, 'inativos': inativos}
+
+def widget_estados(hoje):
+    """Ativos por estado (gráfico de rosca)"""
+    with db.conectar() as conn:
+        linhas = conn.execute("""
+            SELECT estado, COUNT(*) as count
+            FROM ativos
+            GROUP BY estado
+        """).fetchall()
+    return {'labels': [estado or 'Sem estado' for estado, _ in linhas], 'valores': [n for _, n in linhas]}
+
+def widget_localizacoes(hoje):
+    """Top 5 localizações (gráfico de barras)"""
+    with db.conectar() as conn:
+        linhas = conn.execute("""
+            SELECT localizacao, COUNT(*) as count
+            FROM ativos
+            GROUP BY localizacao
+            ORDER BY count DESC
+            LIMIT 5
+        """).fetchall()
+    return {'labels': [local or 'Sem localização' for local, _ in linhas], 'valores': [n for _, n in linhas]}
+
+def widget_ultimos(hoje):
+    """Últimos 5 ativos cadastrados"""
+    with db.conectar() as conn:
+        linhas = conn.execute("""
+            SELECT id, codigo_id, nome, sn, localizacao, responsavel, estado
+            FROM ativos
+            ORDER BY id DESC
+            LIMIT 5
+        """).fetchall()
+    colunas = ('id', 'codigo_id', 'nome', 'sn', 'localizacao', 'responsavel', 'estado')
+    return [dict(zip(colunas, linha)) for linha in linhas]
+
+def widget_garantias(hoje):
+    """Garantias que vencem na janela do dashboard (as 5 primeiras e o total)"""
+    with db.conectar() as conn:
+        linhas = conn.execute("""
+            SELECT id, codigo_id, nome, garantia_ate,
+                   CAST(julianday(garantia_ate) - julianday(?) AS INTEGER) as dias_restantes
+            FROM ativos
+            WHERE garantia_ate > ? AND garantia_ate <= date(?, '+' || ? || ' days')
+            ORDER BY garantia_ate ASC
+        """, (hoje, hoje, hoje, DASHBOARD_JANELA_DIAS)).fetchall()
+    colunas = ('id', 'codigo_id', 'nome', 'garantia_ate', 'dias_restantes')
+    return {'total': len(linhas), 'itens': [dict(zip(colunas, linha)) for linha in linhas[:5]]}
+
+def widget_manutencoes(hoje):
+    """Manutenções agendadas na janela do dashboard (as 5 primeiras e o total)"""
+    with db.conectar() as conn:
+        linhas = conn.execute("""
+            SELECT m.ativo_id, a.codigo_id, a.nome, m.tipo, m.proximo_agendamento
+            FROM manutencoes m
+            JOIN ativos a ON m.ativo_id = a.id
+            WHERE m.proximo_agendamento >= ? AND m.proximo_agendamento <= date(?, '+' || ? || ' days')
+            ORDER BY m.proximo_agendamento ASC
+        """, (hoje, hoje, DASHBOARD_JANELA_DIAS)).fetchall()
+    colunas = ('ativo_id', 'codigo_id', 'nome', 'tipo', 'proximo_agendamento')
+    return {'total': len(linhas), 'itens': [dict(zip(colunas, linha)) for linha in linhas[:5]]}
+
+# Widgets do dashboard: nome -> (tabelas das quais depende, função que recebe a data de hoje)
+# Cada widget tem sua entrada no cache e sua ETag, invalidadas só pelas próprias tabelas
+WIDGETS_DASHBOARD = {
+    'totais': (('ativos',), widget_totais),
+    'estados': (('ativos',), widget_estados),
+    'localizacoes': (('ativos',), widget_localizacoes),
+    'ultimos': (('ativos',), widget_ultimos),
+    'garantias': (('ativos',), widget_garantias),
+    'manutencoes': (('manutencoes', 'ativos'), widget_manutencoes),
+}
+
+def pedir_relatorio(tipo, parametros, nome_download, voltar, mensagem_vazio):
+    """
+    Pede o relatório à fila e responde conforme o andamento
+
+    Relatórios já gerados com a versão atual dos dados, ou que ficam prontos
+    em RELATORIOS_ESPERA segundos, são enviados na hora; os demais seguem
+    em segundo plano e o usuário vai para a página de acompanhamento.
+    """
+    job = relatorio_jobs.submeter(tipo, parametros, current_user.username)
+    if job['status'] not in ('concluido', 'erro'):
+        job = relatorio_jobs.aguardar(job['id'], RELATORIOS_ESPERA)
+
+    if job['status'] == 'erro':
+        flash(f"Erro ao gerar relatório: {job['erro']}", 'error')
+        return redirect(voltar)
+
+    if job['status'] == 'concluido':
+        if not job['arquivo']:
+            flash(mensagem_vazio, 'warning')
+            return redirect(voltar)
+        return send_file(os.path.abspath(job['arquivo']), as_attachment=True, download_name=nome_download)
+
+    return redirect(url_for('relatorio_job', job_id=job['id'], nome=nome_download, voltar=voltar))
+
+def listar_ativos_etiquetas(colunas='*'):
+    """Ativos ordenados por código para as etiquetas (compartilhado entre requisições)"""
+    def consultar():
+        with db.conectar() as conn:
+            return conn.execute(f"SELECT {colunas} FROM ativos ORDER BY codigo_id").fetchall()
+
+    return cache_relatorios.obter(('etiquetas', colunas), ('ativos',), consultar)
 
 def init_db():
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
+        db.configurar_banco(conn)
+
         # Tabela principal de ativos
         conn.execute('''
             CREATE TABLE IF NOT EXISTS ativos (
@@ -241,6 +392,38 @@ def init_db():
             except sqlite3.IntegrityError:
                 pass  # Categoria já existe
 
+        # Planos de manutenção e fila de ocorrências (antes dos triggers de versão, que cobrem a fila)
+        planos_manutencao.criar_tabelas(conn)
+
+        # Versão dos dados por tabela (ETag das páginas de leitura)
+        versao_dados.criar_tabelas(conn)
+
+        # Valores distintos dos filtros com contagem (mantidos por triggers)
+        valores_filtro.criar_tabelas(conn)
+
+        # Índices dos filtros de faceta da busca
+        busca_facetada.criar_indices(conn)
+
+        # Trigramas para a busca aproximada
+        busca_trigramas.criar_tabelas(conn)
+
+        # Fila de relatórios em segundo plano
+        relatorio_jobs.criar_tabelas(conn)
+
+        # Fluxo de mudanças dos ativos para o cache colunar das análises
+        import analise_colunar
+        analise_colunar.criar_tabelas(conn)
+
+        # Depreciação por categoria e fechamentos mensais
+        import depreciacao
+        depreciacao.criar_tabelas(conn)
+
+        # Resumos de custo e frequência das manutenções
+        manutencao_resumo.criar_tabelas(conn)
+
+        # Alertas já enviados por limiar e destinatário
+        estado_alertas.criar_tabelas(conn)
+
         conn.commit()
 
 @app.route('/')
@@ -253,33 +436,53 @@ def index():
 @login_required
 def ativos():
     busca = request.args.get('busca', '').strip()
-    query = "SELECT * FROM ativos"
-    params = ()
-
-    if busca:
-        busca_like = f"%{busca}%"
-        query += """
-            WHERE
-                codigo_id LIKE ? OR
-                nome LIKE ? OR
-                sn LIKE ? OR
-                descricao LIKE ? OR
-                localizacao LIKE ? OR
-                responsavel LIKE ?
-        """
-        params = (busca_like,) * 6
-
-    with sqlite3.connect(DB) as conn:
-        ativos_list = conn.execute(query, params).fetchall()
-
-    return render_template('index.html', ativos=ativos_list, busca=busca)
+    filtros = busca_facetada.filtros_da_requisicao(request.args)
+
+    with db.conectar() as conn:
+        resultado = busca_facetada.buscar(conn, busca, filtros)
+
+    nomes_categorias = {str(cat[0]): cat[1] for cat in listar_categorias()}
+
+    if request.args.get('formato') == 'json':
+        return jsonify({
+            'total': len(resultado['ativos']),
+            'aproximada': resultado['aproximada'],
+            'ativos': [dict(zip(resultado['colunas'], linha)) for linha in resultado['ativos']],
+            'facetas': {
+                campo: [{'valor': valor, 'total': total} for valor, total in valores]
+                for campo, valores in resultado['facetas'].items()
+            },
+        })
+
+    # Facetas para a página: cada valor é um link que adiciona o filtro
+    argumentos = request.args.to_dict()
+    argumentos.pop('formato', None)
+    facetas = []
+    for campo, titulo in busca_facetada.FACETAS:
+        valores = []
+        for valor, total in resultado['facetas'][campo]:
+            rotulo = nomes_categorias.get(str(valor), valor) if campo == 'categoria_id' else valor
+            valores.append({
+                'rotulo': rotulo,
+                'total': total,
+                'url': url_for('ativos', **{**argumentos, campo: valor}),
+            })
+        selecionado = filtros.get(campo)
+        facetas.append({
+            'campo': campo,
+            'titulo': titulo,
+            'valores': valores,
+            'selecionado': nomes_categorias.get(selecionado, selecionado) if campo == 'categoria_id' else selecionado,
+            'url_remover': url_for('ativos', **{k: v for k, v in argumentos.items() if k != campo}),
+        })
+
+    return render_template('index.html', ativos=resultado['ativos'], busca=busca, facetas=facetas,
+                           aproximada=resultado['aproximada'])
 
 @app.route('/novo')
 @login_required
 def novo():
-    with sqlite3.connect(DB) as conn:
-        categorias = conn.execute('SELECT id, nome, icone FROM categorias ORDER BY nome').fetchall()
-    return render_template('novo.html', categorias=categorias)
+    return render_template('novo.html', categorias=listar_categorias())
 
 @app.route('/add', methods=['POST'])
 @login_required
@@ -303,7 +506,7 @@ def add():
         garantia_ate = request.form.get('garantia_ate') or None
         observacoes = request.form.get('observacoes') or None
 
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO ativos (codigo_id, nome, sn, descricao, localizacao, responsavel, estado,
@@ -314,12 +517,17 @@ def add():
                  categoria_id, subcategoria, numero_patrimonio, data_aquisicao,
                  valor_aquisicao, fornecedor, garantia_ate, observacoes))
             ativo_id = cursor.lastrowid
+            planos_manutencao.atualizar_ativo(conn, ativo_id, categoria_id)
             conn.commit()
 
+            autocompletar.indice.registrar_alteracao(conn, depois={
+                'localizacao': localizacao, 'responsavel': responsavel,
+                'fornecedor': fornecedor, 'codigo_id': codigo_id,
+            })
+
         # Gera QR Code com URL correta
-        url = f"{BASE_URL}/ver/{ativo_id}"
-        img = qrcode.make(url)
-        img.save(f"{QR_FOLDER}/ativo_{ativo_id}.png")
+        import qr_service
+        qr_service.salvar_qrcode_ativo(ativo_id, BASE_URL, QR_FOLDER)
 
         # Registrar no histórico
         registrar_historico(ativo_id, 'Ativo criado', None, None, f'{codigo_id} - {nome}')
@@ -342,10 +550,26 @@ def add():
         flash(f'Erro ao cadastrar ativo: {str(e)}', 'error')
         return redirect(url_for('novo'))
 
+@app.route('/api/autocompletar/<campo>')
+@login_required
+def api_autocompletar(campo):
+    """Sugestões por prefixo para campos de texto livre (?q=prefixo&limite=10)"""
+    if campo not in autocompletar.CAMPOS_AUTOCOMPLETAR:
+        return jsonify({'error': f'Campo sem autocompletar: {campo}'}), 404
+
+    prefixo = request.args.get('q', '')
+    limite = min(request.args.get('limite', autocompletar.LIMITE_PADRAO, type=int) or 1,
+                 autocompletar.LIMITE_MAXIMO)
+
+    sugestoes = autocompletar.indice.buscar(campo, prefixo, limite)
+    resposta = jsonify([{'valor': valor, 'total': total} for valor, total in sugestoes])
+    resposta.headers['Cache-Control'] = 'private, max-age=30'
+    return resposta
+
 @app.route('/ativo/<int:ativo_id>')
 @login_required
 def ativo(ativo_id):
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         # Dados do ativo
         ativo = conn.execute("SELECT * FROM ativos WHERE id=?", (ativo_id,)).fetchone()
 
@@ -379,6 +603,9 @@ def ativo(ativo_id):
             ORDER BY data_manutencao DESC
         ''', (ativo_id,)).fetchall()
 
+        # Próximas ocorrências dos planos de manutenção
+        planejadas = planos_manutencao.pendentes_ativo(conn, ativo_id)
+
         # Histórico
         historico = conn.execute('''
             SELECT id, acao, campo, valor_anterior, valor_novo, usuario, ip_address, criado_em
@@ -389,7 +616,7 @@ def ativo(ativo_id):
         ''', (ativo_id,)).fetchall()
 
         # Todas as categorias (para seleção)
-        categorias = conn.execute('SELECT id, nome, icone FROM categorias ORDER BY nome').fetchall()
+        categorias = listar_categorias()
 
     return render_template('detalhe.html',
                          ativo=ativo,
@@ -397,13 +624,14 @@ def ativo(ativo_id):
                          fotos=fotos,
                          documentos=documentos,
                          manutencoes=manutencoes,
+                         planejadas=planejadas,
                          historico=historico,
                          categorias=categorias)
 
 @app.route('/editar/<int:ativo_id>', methods=['GET', 'POST'])
 @login_required
 def editar(ativo_id):
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
 
         if request.method == 'POST':
@@ -427,6 +655,10 @@ def editar(ativo_id):
                 garantia_ate = request.form.get('garantia_ate') or None
                 observacoes = request.form.get('observacoes') or None
 
+                antes = cursor.execute(
+                    f"SELECT {', '.join(autocompletar.CAMPOS_AUTOCOMPLETAR)} FROM ativos WHERE id = ?",
+                    (ativo_id,)).fetchone()
+
                 cursor.execute('''
                     UPDATE ativos SET
                         codigo_id = ?, nome = ?, sn = ?, descricao = ?,
@@ -438,8 +670,17 @@ def editar(ativo_id):
                 ''', (codigo_id, nome, sn, descricao, localizacao, responsavel, estado,
                      categoria_id, subcategoria, numero_patrimonio, data_aquisicao,
                      valor_aquisicao, fornecedor, garantia_ate, observacoes, ativo_id))
+                planos_manutencao.atualizar_ativo(conn, ativo_id, categoria_id)
                 conn.commit()
 
+                if antes:
+                    autocompletar.indice.registrar_alteracao(
+                        conn,
+                        antes=dict(zip(autocompletar.CAMPOS_AUTOCOMPLETAR, antes)),
+                        depois={'localizacao': localizacao, 'responsavel': responsavel,
+                                'fornecedor': fornecedor, 'codigo_id': codigo_id},
+                    )
+
                 # Registrar no histórico
                 registrar_historico(ativo_id, 'editado')
 
@@ -465,7 +706,7 @@ def editar(ativo_id):
             return redirect(url_for('ativos'))
 
         # Buscar categorias para o selector
-        categorias = cursor.execute('SELECT id, nome, icone FROM categorias ORDER BY nome').fetchall()
+        categorias = listar_categorias()
 
     return render_template('editar.html', ativo=ativo, categorias=categorias)
 
@@ -473,7 +714,7 @@ def editar(ativo_id):
 @login_required
 def deletar(ativo_id):
     try:
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             # Busca dados do ativo antes de deletar
             ativo = conn.execute("SELECT codigo_id, nome, sn FROM ativos WHERE id=?", (ativo_id,)).fetchone()
 
@@ -489,9 +730,18 @@ def deletar(ativo_id):
             else:
                 nome_ativo = "Ativo"
 
+            antes = conn.execute(
+                f"SELECT {', '.join(autocompletar.CAMPOS_AUTOCOMPLETAR)} FROM ativos WHERE id = ?",
+                (ativo_id,)).fetchone()
+
             conn.execute("DELETE FROM ativos WHERE id=?", (ativo_id,))
+            planos_manutencao.remover_ativo(conn, ativo_id)
             conn.commit()
 
+            if antes:
+                autocompletar.indice.registrar_alteracao(
+                    conn, antes=dict(zip(autocompletar.CAMPOS_AUTOCOMPLETAR, antes)))
+
         # Remove o QR Code
         qr_path = os.path.join(QR_FOLDER, f"ativo_{ativo_id}.png")
         if os.path.exists(qr_path):
@@ -508,17 +758,8 @@ def deletar(ativo_id):
 @login_required
 def exportar():
     try:
-        with sqlite3.connect(DB) as conn:
-            df = pd.read_sql_query("SELECT * FROM ativos", conn)
-
-        if df.empty:
-            flash('Não há ativos para exportar!', 'warning')
-            return redirect(url_for('ativos'))
-
-        file_path = "ativos.xlsx"
-        df.to_excel(file_path, index=False)
-
-        return send_file(file_path, as_attachment=True, download_name='ativos_export.xlsx')
+        return pedir_relatorio('ativos', {}, 'ativos_export.xlsx', url_for('ativos'),
+                               'Não há ativos para exportar!')
 
     except Exception as e:
         flash(f'Erro ao exportar ativos: {str(e)}', 'error')
@@ -527,58 +768,74 @@ def exportar():
 @app.route('/ver/<int:ativo_id>')
 @login_required
 def ver(ativo_id):
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         ativo = conn.execute("SELECT * FROM ativos WHERE id=?", (ativo_id,)).fetchone()
     return render_template('visualizar.html', ativo=ativo)
 
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    with sqlite3.connect(DB) as conn:
-        # Total de ativos
-        total_ativos = conn.execute("SELECT COUNT(*) FROM ativos").fetchone()[0]
+    # Apenas a estrutura da página: cada widget busca seus dados em /api/dashboard/<widget>
+    return render_template('dashboard.html', janela_dias=DASHBOARD_JANELA_DIAS)
 
-        # Ativos por estado
-        ativos_por_estado = conn.execute("""
-            SELECT estado, COUNT(*) as count
-            FROM ativos
-            GROUP BY estado
-        """).fetchall()
+@app.route('/api/dashboard/<widget>')
+@login_required
+def api_dashboard(widget):
+    """Dados de um widget do dashboard (JSON), calculados uma vez por versão das tabelas"""
+    if widget not in WIDGETS_DASHBOARD:
+        return jsonify({'error': f'Widget desconhecido: {widget}'}), 404
 
-        # Ativos por localização (top 5)
-        ativos_por_local = conn.execute("""
-            SELECT localizacao, COUNT(*) as count
-            FROM ativos
-            GROUP BY localizacao
-            ORDER BY count DESC
-            LIMIT 5
-        """).fetchall()
+    tabelas, calcular = WIDGETS_DASHBOARD[widget]
+    hoje = date.today().isoformat()
+    return jsonify(cache.cache.obter(('dashboard', widget, hoje), tabelas, lambda: calcular(hoje)))
 
-        # Últimos ativos adicionados
-        ultimos_ativos = conn.execute("""
-            SELECT * FROM ativos
-            ORDER BY id DESC
-            LIMIT 5
-        """).fetchall()
+@app.route('/api/analise/pivot')
+@login_required
+def api_analise_pivot():
+    """
+    Tabela cruzada de quantidade e valor dos ativos (JSON)
 
-    return render_template('dashboard.html',
-                         total_ativos=total_ativos,
-                         ativos_por_estado=ativos_por_estado,
-                         ativos_por_local=ativos_por_local,
-                         ultimos_ativos=ultimos_ativos)
+    ?linhas=estado&colunas=categoria&localizacao=Sala TI&localizacao=Armazém&de=2023-01-01&ate=2023-12-31
+    Cada dimensão pode ser repetida como filtro (valores aceitos).
+    """
+    import analise_colunar
 
-@app.route('/relatorios')
+    try:
+        filtros = {dim: request.args.getlist(dim) for dim in analise_colunar.DIMENSOES if dim in request.args}
+        de = date.fromisoformat(request.args['de']) if request.args.get('de') else None
+        ate = date.fromisoformat(request.args['ate']) if request.args.get('ate') else None
+        resultado = analise_colunar.analise.pivot(
+            request.args.get('linhas', 'estado'), request.args.get('colunas') or None, filtros, de, ate)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(resultado)
+
+@app.route('/api/depreciacao')
 @login_required
-def relatorios():
-    with sqlite3.connect(DB) as conn:
-        # Buscar estados únicos
-        estados = conn.execute("SELECT DISTINCT estado FROM ativos ORDER BY estado").fetchall()
+def api_depreciacao():
+    """
+    Valor contábil por categoria ou localização (JSON)
 
-        # Buscar localizações únicas
-        localizacoes = conn.execute("SELECT DISTINCT localizacao FROM ativos ORDER BY localizacao").fetchall()
+    ?por=categoria|localizacao&competencia=AAAA-MM (sem competência: posição de hoje)
+    """
+    import depreciacao
 
-        # Buscar responsáveis únicos
-        responsaveis = conn.execute("SELECT DISTINCT responsavel FROM ativos ORDER BY responsavel").fetchall()
+    try:
+        resultado = depreciacao.totais(request.args.get('por', 'categoria'), request.args.get('competencia'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if resultado is None:
+        return jsonify({'error': 'Fechamento não encontrado para a competência'}), 404
+    resultado['competencias'] = depreciacao.competencias()
+    return jsonify(resultado)
+
+@app.route('/relatorios')
+@login_required
+def relatorios():
+    # Valores únicos com o número de ativos em cada um
+    estados = valores_filtro.valores_distintos('estado')
+    localizacoes = valores_filtro.valores_distintos('localizacao')
+    responsaveis = valores_filtro.valores_distintos('responsavel')
 
     return render_template('relatorios.html',
                          estados=estados,
@@ -589,17 +846,9 @@ def relatorios():
 @login_required
 def relatorio_estado(estado):
     try:
-        with sqlite3.connect(DB) as conn:
-            df = pd.read_sql_query("SELECT * FROM ativos WHERE estado = ?", conn, params=(estado,))
-
-        if df.empty:
-            flash(f'Não há ativos no estado "{estado}"!', 'warning')
-            return redirect(url_for('relatorios'))
-
-        file_path = f"relatorio_estado_{estado}.xlsx"
-        df.to_excel(file_path, index=False)
-
-        return send_file(file_path, as_attachment=True, download_name=f'relatorio_{estado}_{pd.Timestamp.now().strftime("%Y%m%d")}.xlsx')
+        return pedir_relatorio('ativos', {'campo': 'estado', 'valor': estado},
+                               f'relatorio_{estado}_{datetime.now().strftime("%Y%m%d")}.xlsx',
+                               url_for('relatorios'), f'Não há ativos no estado "{estado}"!')
 
     except Exception as e:
         flash(f'Erro ao gerar relatório: {str(e)}', 'error')
@@ -609,17 +858,9 @@ def relatorio_estado(estado):
 @login_required
 def relatorio_localizacao(localizacao):
     try:
-        with sqlite3.connect(DB) as conn:
-            df = pd.read_sql_query("SELECT * FROM ativos WHERE localizacao = ?", conn, params=(localizacao,))
-
-        if df.empty:
-            flash(f'Não há ativos na localização "{localizacao}"!', 'warning')
-            return redirect(url_for('relatorios'))
-
-        file_path = f"relatorio_localizacao.xlsx"
-        df.to_excel(file_path, index=False)
-
-        return send_file(file_path, as_attachment=True, download_name=f'relatorio_{localizacao.replace(" ", "_")}_{pd.Timestamp.now().strftime("%Y%m%d")}.xlsx')
+        return pedir_relatorio('ativos', {'campo': 'localizacao', 'valor': localizacao},
+                               f'relatorio_{localizacao.replace(" ", "_")}_{datetime.now().strftime("%Y%m%d")}.xlsx',
+                               url_for('relatorios'), f'Não há ativos na localização "{localizacao}"!')
 
     except Exception as e:
         flash(f'Erro ao gerar relatório: {str(e)}', 'error')
@@ -629,17 +870,9 @@ def relatorio_localizacao(localizacao):
 @login_required
 def relatorio_responsavel(responsavel):
     try:
-        with sqlite3.connect(DB) as conn:
-            df = pd.read_sql_query("SELECT * FROM ativos WHERE responsavel = ?", conn, params=(responsavel,))
-
-        if df.empty:
-            flash(f'Não há ativos sob responsabilidade de "{responsavel}"!', 'warning')
-            return redirect(url_for('relatorios'))
-
-        file_path = f"relatorio_responsavel.xlsx"
-        df.to_excel(file_path, index=False)
-
-        return send_file(file_path, as_attachment=True, download_name=f'relatorio_{responsavel.replace(" ", "_")}_{pd.Timestamp.now().strftime("%Y%m%d")}.xlsx')
+        return pedir_relatorio('ativos', {'campo': 'responsavel', 'valor': responsavel},
+                               f'relatorio_{responsavel.replace(" ", "_")}_{datetime.now().strftime("%Y%m%d")}.xlsx',
+                               url_for('relatorios'), f'Não há ativos sob responsabilidade de "{responsavel}"!')
 
     except Exception as e:
         flash(f'Erro ao gerar relatório: {str(e)}', 'error')
@@ -648,17 +881,87 @@ def relatorio_responsavel(responsavel):
 @app.route('/relatorio/etiquetas')
 @login_required
 def relatorio_etiquetas():
-    with sqlite3.connect(DB) as conn:
-        ativos = conn.execute("SELECT * FROM ativos ORDER BY codigo_id").fetchall()
+    ativos = listar_ativos_etiquetas()
+
+    return render_template('etiquetas.html', ativos=ativos, spool_configurado=bool(etiquetas_zpl.ZPL_SPOOL_DIR))
+
+@app.route('/relatorio/etiquetas/zpl')
+@login_required
+def relatorio_etiquetas_zpl():
+    """Download das etiquetas em ZPL para impressoras térmicas"""
+    ativos = listar_ativos_etiquetas('id, codigo_id, nome, sn')
+
+    if not ativos:
+        flash('Nenhum ativo encontrado!', 'warning')
+        return redirect(url_for('relatorios'))
+
+    filename = f"etiquetas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zpl"
+    return Response(
+        stream_with_context(etiquetas_zpl.gerar_lote_zpl(ativos, BASE_URL)),
+        mimetype='application/x-zpl',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/relatorio/etiquetas/zpl/spool', methods=['POST'])
+@login_required
+def relatorio_etiquetas_zpl_spool():
+    """Envia as etiquetas em ZPL para o spool da impressora térmica"""
+    ativos = listar_ativos_etiquetas('id, codigo_id, nome, sn')
+
+    if not ativos:
+        flash('Nenhum ativo encontrado!', 'warning')
+        return redirect(url_for('relatorios'))
+
+    try:
+        caminho = etiquetas_zpl.gravar_spool(ativos, BASE_URL)
+        app.logger.info(f'Trabalho ZPL com {len(ativos)} etiquetas enviado para {caminho}')
+        flash(f'{len(ativos)} etiquetas enviadas para a impressora térmica.', 'success')
+    except Exception as e:
+        flash(f'Erro ao enviar etiquetas para impressão: {str(e)}', 'error')
+    return redirect(url_for('relatorios'))
 
-    return render_template('etiquetas.html', ativos=ativos)
+@app.route('/relatorio/job/<job_id>')
+@login_required
+def relatorio_job(job_id):
+    """Acompanhamento de um relatório gerado em segundo plano"""
+    job = relatorio_jobs.obter(job_id)
+    if not job:
+        flash('Relatório não encontrado ou expirado.', 'error')
+        return redirect(url_for('relatorios'))
+
+    voltar = destino_local(request.args.get('voltar'), url_for('relatorios'))
+
+    return render_template('relatorio_job.html', job=job, voltar=voltar,
+                           nome=secure_filename(request.args.get('nome', '')) or 'relatorio.xlsx')
+
+@app.route('/relatorio/job/<job_id>/status')
+@login_required
+def relatorio_job_status(job_id):
+    job = relatorio_jobs.obter(job_id)
+    if not job:
+        return jsonify({'error': 'Relatório não encontrado'}), 404
+    return jsonify({'status': job['status'], 'linhas': job['linhas'], 'erro': job['erro'],
+                    'arquivo': bool(job['arquivo'])})
+
+@app.route('/relatorio/job/<job_id>/download')
+@login_required
+def relatorio_job_download(job_id):
+    job = relatorio_jobs.obter(job_id)
+    if not job or job['status'] != 'concluido' or not job['arquivo'] or not os.path.exists(job['arquivo']):
+        flash('Relatório não disponível.', 'error')
+        return redirect(url_for('relatorios'))
+
+    nome = secure_filename(request.args.get('nome', '')) or 'relatorio.xlsx'
+    return send_file(os.path.abspath(job['arquivo']), as_attachment=True, download_name=nome)
+
+# ==================== ROTAS DE ADMINISTRAÇÃO ====================
 
 @app.route('/admin/regenerar-qrcodes', methods=['POST'])
 @login_required
 def regenerar_qrcodes():
     """Regenera todos os QR codes com o URL atual"""
     try:
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             ativos = conn.execute("SELECT id FROM ativos").fetchall()
 
             if not ativos:
@@ -666,11 +969,9 @@ def regenerar_qrcodes():
                 return redirect(url_for('dashboard'))
 
             # Regenerar QR code para cada ativo
+            import qr_service
             for ativo in ativos:
-                ativo_id = ativo[0]
-                url = f"{BASE_URL}/ver/{ativo_id}"
-                img = qrcode.make(url)
-                img.save(f"{QR_FOLDER}/ativo_{ativo_id}.png")
+                qr_service.salvar_qrcode_ativo(ativo[0], BASE_URL, QR_FOLDER)
 
             flash(f'{len(ativos)} QR codes regenerados com sucesso! Agora apontam para {BASE_URL}', 'success')
 
@@ -679,6 +980,46 @@ def regenerar_qrcodes():
 
     return redirect(url_for('dashboard'))
 
+@app.route('/admin/desempenho')
+@login_required
+def admin_desempenho():
+    """Percentis de tempo por rota deste processo (apenas admin)"""
+    if not current_user.is_admin():
+        flash('Acesso negado. Apenas administradores.', 'error')
+        return redirect(url_for('dashboard'))
+
+    return render_template('admin_desempenho.html',
+                           rotas=desempenho.estatisticas.resumo(),
+                           limiar_lento_ms=desempenho.LIMIAR_LENTO_MS,
+                           caches={'Consultas': cache.cache.estatisticas(),
+                                   'Relatórios': cache_relatorios.estatisticas()},
+                           pid=os.getpid())
+
+@app.route('/admin/consultas-lentas')
+@login_required
+def admin_consultas_lentas():
+    """Consultas SQL acima de CONSULTAS_LENTAS_MS, agrupadas (apenas admin)"""
+    if not current_user.is_admin():
+        flash('Acesso negado. Apenas administradores.', 'error')
+        return redirect(url_for('dashboard'))
+
+    registros = consultas_lentas.ler_registros()
+    return render_template('admin_consultas_lentas.html',
+                           grupos=consultas_lentas.agrupar(registros),
+                           total=len(registros),
+                           limiar_ms=consultas_lentas.LIMIAR_MS)
+
+@app.route('/admin/desempenho/limpar', methods=['POST'])
+@login_required
+def admin_desempenho_limpar():
+    if not current_user.is_admin():
+        flash('Acesso negado. Apenas administradores.', 'error')
+        return redirect(url_for('dashboard'))
+
+    desempenho.estatisticas.limpar()
+    flash('Estatísticas de desempenho zeradas.', 'success')
+    return redirect(url_for('admin_desempenho'))
+
 # ==================== ROTAS DE ANEXOS/FOTOS ====================
 
 @app.route('/ativo/<int:ativo_id>/upload', methods=['POST'])
@@ -711,9 +1052,10 @@ def upload_anexo(ativo_id):
 
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], pasta, filename)
             arquivo.save(filepath)
+            metricas.UPLOAD_BYTES.labels(tipo).inc(os.path.getsize(filepath))
 
             # Salvar no banco
-            with sqlite3.connect(DB) as conn:
+            with db.conectar() as conn:
                 conn.execute('''
                     INSERT INTO anexos (ativo_id, tipo, nome_arquivo, caminho, tamanho, mime_type, descricao, principal)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
@@ -737,7 +1079,7 @@ def upload_anexo(ativo_id):
 def deletar_anexo(ativo_id, anexo_id):
     """Deletar anexo"""
     try:
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             anexo = conn.execute('SELECT caminho, nome_arquivo FROM anexos WHERE id = ?', (anexo_id,)).fetchone()
 
             if anexo:
@@ -759,6 +1101,42 @@ def deletar_anexo(ativo_id, anexo_id):
 
 # ==================== ROTAS DE MANUTENÇÕES ====================
 
+def inserir_manutencao(conn, ativo_id, tipo, descricao, data_manutencao, proximo_agendamento=None,
+                       responsavel='', custo=None, status='Concluída', observacoes=''):
+    """
+    Grava uma manutenção e atualiza os resumos na mesma transação (sem commit)
+
+    Returns:
+        (id da manutenção, nome do ativo)
+    """
+    # Buscar nome do ativo para notificação
+    ativo = conn.execute('SELECT nome FROM ativos WHERE id = ?', (ativo_id,)).fetchone()
+    ativo_nome = ativo[0] if ativo else 'Ativo Desconhecido'
+
+    cursor = conn.execute('''
+        INSERT INTO manutencoes (ativo_id, tipo, descricao, data_manutencao,
+                               proximo_agendamento, responsavel, custo, status, observacoes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (ativo_id, tipo, descricao, data_manutencao, proximo_agendamento,
+          responsavel, custo, status, observacoes))
+    manutencao_resumo.registrar(conn, cursor.lastrowid)
+    return cursor.lastrowid, ativo_nome
+
+def notificar_manutencao(ativo_id, ativo_nome, tipo, descricao, data_manutencao, proximo_agendamento, responsavel):
+    """Registra no histórico e envia a notificação de manutenção registrada"""
+    registrar_historico(ativo_id, 'Manutenção registrada', 'manutenção', None, f'{tipo}: {descricao}')
+
+    # Enviar notificação por email
+    email_service.notificar_manutencao_adicionada({
+        'ativo_id': ativo_id,
+        'ativo_nome': ativo_nome,
+        'tipo': tipo,
+        'descricao': descricao,
+        'data_manutencao': data_manutencao,
+        'proximo_agendamento': proximo_agendamento,
+        'responsavel': responsavel
+    })
+
 @app.route('/ativo/<int:ativo_id>/manutencao/adicionar', methods=['POST'])
 @login_required
 def adicionar_manutencao(ativo_id):
@@ -773,32 +1151,13 @@ def adicionar_manutencao(ativo_id):
         status = request.form.get('status', 'Concluída')
         observacoes = request.form.get('observacoes', '')
 
-        with sqlite3.connect(DB) as conn:
-            # Buscar nome do ativo para notificação
-            ativo = conn.execute('SELECT nome FROM ativos WHERE id = ?', (ativo_id,)).fetchone()
-            ativo_nome = ativo[0] if ativo else 'Ativo Desconhecido'
-
-            conn.execute('''
-                INSERT INTO manutencoes (ativo_id, tipo, descricao, data_manutencao,
-                                       proximo_agendamento, responsavel, custo, status, observacoes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (ativo_id, tipo, descricao, data_manutencao, proximo_agendamento,
-                  responsavel, custo, status, observacoes))
+        with db.conectar() as conn:
+            ativo_nome = inserir_manutencao(conn, ativo_id, tipo, descricao, data_manutencao, proximo_agendamento,
+                                            responsavel, custo, status, observacoes)[1]
             conn.commit()
 
-        registrar_historico(ativo_id, 'Manutenção registrada', 'manutenção', None, f'{tipo}: {descricao}')
-
-        # Enviar notificação por email
-        email_service.notificar_manutencao_adicionada({
-            'ativo_id': ativo_id,
-            'ativo_nome': ativo_nome,
-            'tipo': tipo,
-            'descricao': descricao,
-            'data_manutencao': data_manutencao,
-            'proximo_agendamento': proximo_agendamento,
-            'responsavel': responsavel
-        })
-
+        notificar_manutencao(ativo_id, ativo_nome, tipo, descricao, data_manutencao, proximo_agendamento,
+                             responsavel)
         flash('Manutenção registrada com sucesso!', 'success')
 
     except Exception as e:
@@ -811,10 +1170,11 @@ def adicionar_manutencao(ativo_id):
 def deletar_manutencao(manutencao_id):
     """Deletar registro de manutenção"""
     try:
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             manutencao = conn.execute('SELECT ativo_id FROM manutencoes WHERE id = ?', (manutencao_id,)).fetchone()
 
             if manutencao:
+                manutencao_resumo.registrar(conn, manutencao_id, sinal=-1)
                 conn.execute('DELETE FROM manutencoes WHERE id = ?', (manutencao_id,))
                 conn.commit()
 
@@ -827,13 +1187,161 @@ def deletar_manutencao(manutencao_id):
 
     return redirect(url_for('dashboard'))
 
+@app.route('/api/manutencoes/custos')
+@login_required
+def api_manutencoes_custos():
+    """Custo e quantidade de manutenções por mês × categoria × tipo (?de=AAAA-MM&ate=AAAA-MM)"""
+    with db.conectar() as conn:
+        return jsonify(manutencao_resumo.custos_mensais(conn, request.args.get('de'), request.args.get('ate')))
+
+@app.route('/api/manutencoes/mais-caros')
+@login_required
+def api_manutencoes_mais_caros():
+    """Ativos com maior custo de manutenção (?de=AAAA-MM&ate=AAAA-MM&tipo=Corretiva&limite=10)"""
+    limite = min(request.args.get('limite', 10, type=int) or 10, 100)
+    with db.conectar() as conn:
+        return jsonify(manutencao_resumo.ativos_mais_caros(
+            conn, request.args.get('de'), request.args.get('ate'), request.args.get('tipo'), limite))
+
+@app.route('/api/manutencoes/mtbf')
+@login_required
+def api_manutencoes_mtbf():
+    """Dias médios entre manutenções corretivas por ativo e categoria (?categoria=<id>&limite=20)"""
+    limite = min(request.args.get('limite', 20, type=int) or 20, 100)
+    with db.conectar() as conn:
+        return jsonify(manutencao_resumo.intervalos_entre_falhas(
+            conn, request.args.get('categoria', type=int), limite))
+
+# ==================== PLANOS DE MANUTENÇÃO ====================
+
+@app.route('/planos-manutencao')
+@login_required
+def planos_manutencao_lista():
+    """Planos de manutenção recorrente e ocorrências vencendo"""
+    dias = min(request.args.get('dias', DASHBOARD_JANELA_DIAS, type=int) or DASHBOARD_JANELA_DIAS, 365)
+    with db.conectar() as conn:
+        planos = planos_manutencao.listar_planos(conn)
+        fila = planos_manutencao.vencendo(conn, date.today() + timedelta(days=dias))
+
+    return render_template('planos_manutencao.html',
+                         planos=planos,
+                         fila=fila,
+                         dias=dias,
+                         hoje=date.today().isoformat(),
+                         codigo_id=request.args.get('codigo_id', ''),
+                         categorias=listar_categorias())
+
+@app.route('/planos-manutencao/novo', methods=['POST'])
+@login_required
+def criar_plano_manutencao():
+    """Cria um plano para um ativo ou para uma categoria"""
+    try:
+        alvo = request.form.get('alvo', 'ativo')
+        with db.conectar() as conn:
+            ativo_id = None
+            if alvo == 'ativo':
+                ativo = conn.execute('SELECT id FROM ativos WHERE codigo_id = ?',
+                                     (request.form.get('codigo_id', '').strip(),)).fetchone()
+                if not ativo:
+                    raise ValueError('ativo não encontrado')
+                ativo_id = ativo[0]
+
+            planos_manutencao.criar_plano(
+                conn,
+                descricao=request.form['descricao'],
+                intervalo=int(request.form['intervalo']),
+                unidade=request.form.get('unidade', 'meses'),
+                inicio=request.form.get('inicio') or date.today(),
+                ativo_id=ativo_id,
+                categoria_id=request.form.get('categoria_id', type=int) if alvo == 'categoria' else None,
+                tipo=request.form.get('tipo') or 'Preventiva',
+                responsavel=request.form.get('responsavel') or None,
+                antecedencia_dias=request.form.get('antecedencia_dias', 7, type=int),
+                usuario=current_user.username,
+            )
+            conn.commit()
+        flash('Plano de manutenção criado com sucesso!', 'success')
+    except (KeyError, ValueError) as e:
+        flash(f'Erro ao criar plano: {str(e)}', 'error')
+
+    return redirect(url_for('planos_manutencao_lista'))
+
+@app.route('/planos-manutencao/<int:plano_id>/desabilitar', methods=['POST'])
+@login_required
+def desabilitar_plano_manutencao(plano_id):
+    """Desabilita um plano e cancela as ocorrências pendentes"""
+    if not current_user.is_admin():
+        flash('Acesso negado! Apenas administradores.', 'error')
+        return redirect(url_for('dashboard'))
+
+    with db.conectar() as conn:
+        planos_manutencao.desabilitar_plano(conn, plano_id)
+        conn.commit()
+    flash('Plano de manutenção desabilitado.', 'success')
+    return redirect(url_for('planos_manutencao_lista'))
+
+@app.route('/manutencao/planejada/<int:ocorrencia_id>/concluir', methods=['POST'])
+@login_required
+def concluir_manutencao_planejada(ocorrencia_id):
+    """Registra a manutenção de uma ocorrência planejada e agenda a próxima"""
+    with db.conectar() as conn:
+        ocorrencia = conn.execute('''
+            SELECT f.ativo_id, p.tipo, p.descricao, f.status
+            FROM manutencoes_fila f
+            JOIN planos_manutencao p ON p.id = f.plano_id
+            WHERE f.id = ?
+        ''', (ocorrencia_id,)).fetchone()
+
+        if not ocorrencia:
+            flash('Manutenção planejada não encontrada!', 'error')
+            return redirect(url_for('planos_manutencao_lista'))
+
+        ativo_id, tipo, descricao, status = ocorrencia
+        voltar = destino_local(request.form.get('voltar'), url_for('ativo', ativo_id=ativo_id))
+        if status != 'pendente':
+            flash('Esta manutenção planejada já foi concluída.', 'info')
+            return redirect(voltar)
+
+        try:
+            data_manutencao = request.form.get('data_manutencao') or date.today().isoformat()
+            responsavel = request.form.get('responsavel', '')
+            custo = request.form.get('custo') or None
+            observacoes = request.form.get('observacoes', '')
+
+            manutencao_id, ativo_nome = inserir_manutencao(conn, ativo_id, tipo, descricao, data_manutencao,
+                                                           None, responsavel, custo, 'Concluída', observacoes)
+            proximo = planos_manutencao.concluir(conn, ocorrencia_id, manutencao_id, data_manutencao)
+            conn.execute('UPDATE manutencoes SET proximo_agendamento = ? WHERE id = ?',
+                         (proximo.isoformat() if proximo else None, manutencao_id))
+            conn.commit()
+        except ValueError as e:
+            conn.rollback()
+            flash(f'Erro ao registrar manutenção: {str(e)}', 'error')
+            return redirect(voltar)
+
+    notificar_manutencao(ativo_id, ativo_nome, tipo, descricao, data_manutencao, proximo, responsavel)
+    if proximo:
+        flash(f'Manutenção registrada! Próxima em {proximo.strftime("%d/%m/%Y")}.', 'success')
+    else:
+        flash('Manutenção registrada com sucesso!', 'success')
+    return redirect(voltar)
+
+@app.route('/api/manutencoes/planejadas')
+@login_required
+def api_manutencoes_planejadas():
+    """Ocorrências pendentes dos planos com vencimento nos próximos dias (?dias=30), incluindo atrasadas"""
+    dias = min(request.args.get('dias', DASHBOARD_JANELA_DIAS, type=int) or DASHBOARD_JANELA_DIAS, 365)
+    limite = min(request.args.get('limite', 200, type=int) or 200, 1000)
+    with db.conectar() as conn:
+        return jsonify(planos_manutencao.vencendo(conn, date.today() + timedelta(days=dias), limite))
+
 # ==================== ROTAS DE CATEGORIAS ====================
 
 @app.route('/categorias')
 @login_required
 def categorias():
     """Listar todas as categorias"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         # Buscar todas as categorias
         cats = conn.execute('''
             SELECT id, nome, descricao, icone, cor
@@ -866,7 +1374,7 @@ def categorias():
 @login_required
 def categoria(categoria_id):
     """Listar ativos de uma categoria"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cat = conn.execute('SELECT id, nome, descricao, icone, cor FROM categorias WHERE id = ?', (categoria_id,)).fetchone()
         ativos_cat = conn.execute('SELECT * FROM ativos WHERE categoria_id = ? ORDER BY nome', (categoria_id,)).fetchall()
 
@@ -959,7 +1467,7 @@ def verificar_manutencoes():
 @login_required
 def inventarios():
     """Lista todos os inventários"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         inventarios_list = conn.execute('''
             SELECT i.*, c.nome as categoria_nome
             FROM inventarios i
@@ -973,10 +1481,10 @@ def inventarios():
 @login_required
 def novo_inventario():
     """Formulário para criar novo inventário"""
-    with sqlite3.connect(DB) as conn:
-        categorias = conn.execute('SELECT id, nome FROM categorias ORDER BY nome').fetchall()
-        localizacoes = conn.execute('SELECT DISTINCT localizacao FROM ativos WHERE localizacao IS NOT NULL ORDER BY localizacao').fetchall()
-        responsaveis = conn.execute('SELECT DISTINCT responsavel FROM ativos WHERE responsavel IS NOT NULL ORDER BY responsavel').fetchall()
+    totais = valores_filtro.totais_por_categoria()
+    categorias = [(cat[0], cat[1], totais.get(cat[0], 0)) for cat in listar_categorias()]
+    localizacoes = valores_filtro.valores_distintos('localizacao')
+    responsaveis = valores_filtro.valores_distintos('responsavel')
 
     return render_template('novo_inventario.html', categorias=categorias, localizacoes=localizacoes, responsaveis=responsaveis)
 
@@ -993,7 +1501,7 @@ def criar_inventario():
         filtro_localizacao = request.form.get('filtro_localizacao')
         filtro_responsavel = request.form.get('filtro_responsavel')
 
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             # Criar inventário
             cursor = conn.execute('''
                 INSERT INTO inventarios (titulo, descricao, tipo, filtro_categoria_id, filtro_localizacao, filtro_responsavel)
@@ -1043,7 +1551,7 @@ def criar_inventario():
 @login_required
 def executar_inventario(inventario_id):
     """Executa o inventário (checklist)"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         # Dados do inventário
         inventario = conn.execute('SELECT * FROM inventarios WHERE id = ?', (inventario_id,)).fetchone()
 
@@ -1075,7 +1583,7 @@ def conferir_item_inventario(inventario_id, ativo_id):
         observacao = request.form.get('observacao', '')
         usuario = current_user.username if current_user.is_authenticated else 'Sistema'
 
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             # Atualizar item
             conn.execute('''
                 UPDATE inventario_itens
@@ -1102,6 +1610,7 @@ def conferir_item_inventario(inventario_id, ativo_id):
 
             conn.commit()
 
+        metricas.INVENTARIO_CONFERENCIAS.labels(novo_status).inc()
         return jsonify({'success': True, 'status': novo_status})
 
     except Exception as e:
@@ -1112,7 +1621,7 @@ def conferir_item_inventario(inventario_id, ativo_id):
 def finalizar_inventario(inventario_id):
     """Finaliza o inventário"""
     try:
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             conn.execute('''
                 UPDATE inventarios
                 SET status = 'Concluído', data_conclusao = CURRENT_TIMESTAMP
@@ -1131,7 +1640,7 @@ def finalizar_inventario(inventario_id):
 @login_required
 def relatorio_inventario(inventario_id):
     """Relatório de divergências do inventário"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         # Dados do inventário
         inventario = conn.execute('SELECT * FROM inventarios WHERE id = ?', (inventario_id,)).fetchone()
 
@@ -1180,64 +1689,17 @@ def relatorio_inventario(inventario_id):
 def exportar_inventario(inventario_id):
     """Exporta o inventário para Excel"""
     try:
-        with sqlite3.connect(DB) as conn:
-            # Dados do inventário
-            inventario = conn.execute('SELECT * FROM inventarios WHERE id = ?', (inventario_id,)).fetchone()
+        with db.conectar() as conn:
+            inventario = conn.execute('SELECT id FROM inventarios WHERE id = ?', (inventario_id,)).fetchone()
 
-            if not inventario:
-                flash('Inventário não encontrado.', 'error')
-                return redirect(url_for('inventarios'))
+        if not inventario:
+            flash('Inventário não encontrado.', 'error')
+            return redirect(url_for('inventarios'))
 
-            # Todos os itens
-            itens = conn.execute('''
-                SELECT
-                    a.codigo_id as 'Código',
-                    a.nome as 'Nome',
-                    a.sn as 'SN',
-                    a.localizacao as 'Localização',
-                    a.responsavel as 'Responsável',
-                    c.nome as 'Categoria',
-                    ii.status as 'Status',
-                    ii.conferido_por as 'Conferido Por',
-                    ii.data_conferencia as 'Data Conferência',
-                    ii.observacao as 'Observação'
-                FROM inventario_itens ii
-                JOIN ativos a ON ii.ativo_id = a.id
-                LEFT JOIN categorias c ON a.categoria_id = c.id
-                WHERE ii.inventario_id = ?
-                ORDER BY ii.status, a.codigo_id
-            ''', (inventario_id,)).fetchall()
-
-        # Criar DataFrame
-        df = pd.DataFrame(itens, columns=['Código', 'Nome', 'SN', 'Localização', 'Responsável',
-                                         'Categoria', 'Status', 'Conferido Por', 'Data Conferência', 'Observação'])
-
-        # Salvar em Excel
-        filename = f"inventario_{inventario_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        filepath = os.path.join('static', 'exports', filename)
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            # Aba principal
-            df.to_excel(writer, sheet_name='Inventário Completo', index=False)
-
-            # Aba de resumo
-            resumo_data = {
-                'Métrica': ['Total de Ativos', 'Conferidos', 'Não Localizados', 'Pendentes',
-                           '% Conferidos', '% Não Localizados'],
-                'Valor': [
-                    inventario[8],  # total_ativos
-                    inventario[9],  # total_conferidos
-                    inventario[10], # total_nao_localizados
-                    inventario[8] - inventario[9] - inventario[10],  # pendentes
-                    f"{(inventario[9]/inventario[8]*100):.1f}%" if inventario[8] > 0 else "0%",
-                    f"{(inventario[10]/inventario[8]*100):.1f}%" if inventario[8] > 0 else "0%"
-                ]
-            }
-            df_resumo = pd.DataFrame(resumo_data)
-            df_resumo.to_excel(writer, sheet_name='Resumo', index=False)
-
-        return send_file(filepath, as_attachment=True, download_name=filename)
+        return pedir_relatorio('inventario', {'inventario_id': inventario_id},
+                               f"inventario_{inventario_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                               url_for('relatorio_inventario', inventario_id=inventario_id),
+                               'Inventário sem itens para exportar.')
 
     except Exception as e:
         flash(f'Erro ao exportar inventário: {str(e)}', 'error')
@@ -1261,7 +1723,7 @@ def login():
             return render_template('login.html')
 
         try:
-            with sqlite3.connect(DB) as conn:
+            with db.conectar() as conn:
                 user_data = conn.execute(
                     'SELECT id, username, email, nome, perfil, ativo, senha_hash FROM usuarios WHERE username = ?',
                     (username,)
@@ -1312,7 +1774,7 @@ def usuarios():
         flash('Acesso negado. Apenas administradores.', 'error')
         return redirect(url_for('dashboard'))
 
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         usuarios_list = conn.execute('''
             SELECT id, username, email, nome, perfil, ativo, ultimo_acesso, criado_em
             FROM usuarios
@@ -1348,7 +1810,7 @@ def novo_usuario():
 
             senha_hash = generate_password_hash(senha)
 
-            with sqlite3.connect(DB) as conn:
+            with db.conectar() as conn:
                 conn.execute('''
                     INSERT INTO usuarios (username, email, senha_hash, nome, perfil, ativo)
                     VALUES (?, ?, ?, ?, ?, ?)
@@ -1380,7 +1842,7 @@ def toggle_usuario(user_id):
         return redirect(url_for('usuarios'))
 
     try:
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             user = conn.execute('SELECT username, ativo FROM usuarios WHERE id = ?', (user_id,)).fetchone()
 
             if user:
@@ -1416,7 +1878,7 @@ def perfil():
                 flash('A senha deve ter pelo menos 6 caracteres', 'error')
                 return render_template('perfil.html')
 
-            with sqlite3.connect(DB) as conn:
+            with db.conectar() as conn:
                 user = conn.execute('SELECT senha_hash FROM usuarios WHERE id = ?', (current_user.id,)).fetchone()
 
                 if user and check_password_hash(user[0], senha_atual):
@@ -1454,29 +1916,138 @@ def forbidden_error(error):
 
 # ==================== SCHEDULER DE ALERTAS AUTOMÁTICOS ====================
 
-# Configurar scheduler para verificações automáticas
-scheduler = BackgroundScheduler()
-
-# Executar verificação de alertas diariamente às 9h
-scheduler.add_job(
-    func=email_service.executar_verificacao_alertas,
-    trigger="cron",
-    hour=9,
-    minute=0,
-    id='verificacao_alertas_diaria'
-)
-
-# Iniciar scheduler
-scheduler.start()
-
-# Desligar scheduler quando app terminar
-atexit.register(lambda: scheduler.shutdown())
-
-print("\n✅ Scheduler de alertas automáticos iniciado")
-print("   → Verificações diárias às 9h00")
-print("   → Alertas de garantias (30 dias)")
-print("   → Alertas de manutenções (7 dias)\n")
+def iniciar_agendador():
+    """
+    Inicia o agendador de alertas automáticos neste processo
+
+    Pode ser chamado em todos os workers: apenas o processo que detém a
+    liderança no banco executa as tarefas.
+    """
+    import agendador
+    import analise_colunar
+    import depreciacao
+
+    ag = agendador.Agendador(DB)
+
+    # Executar verificação de alertas diariamente às 9h
+    ag.adicionar_tarefa(
+        email_service.executar_verificacao_alertas,
+        'verificacao_alertas_diaria',
+        trigger='cron',
+        hour=9,
+        minute=0
+    )
+
+    # Remover relatórios antigos a cada hora
+    ag.adicionar_tarefa(
+        relatorio_jobs.limpar_antigos,
+        'limpeza_relatorios',
+        trigger='interval',
+        hours=1
+    )
+
+    # Podar o fluxo de mudanças do cache colunar a cada hora
+    ag.adicionar_tarefa(
+        analise_colunar.limpar_alteracoes,
+        'limpeza_alteracoes',
+        trigger='interval',
+        hours=1
+    )
+
+    # Trigramas da busca aproximada alterados fora das rotas (scripts, importações)
+    ag.adicionar_tarefa(
+        busca_trigramas.sincronizar_pendentes,
+        'sincronizacao_trigramas',
+        trigger='interval',
+        minutes=5
+    )
+
+    # Avisos de manutenções planejadas: acorda na próxima data de aviso da fila
+    ag.adicionar_tarefa_sob_demanda(
+        planos_manutencao.processar_vencidos,
+        'avisos_manutencoes_planejadas',
+        planos_manutencao.proximo_aviso
+    )
+
+    # Fechamento da depreciação do mês anterior, todo dia 1 às 2h00
+    ag.adicionar_tarefa(
+        depreciacao.fechar_mes,
+        'fechamento_depreciacao',
+        trigger='cron',
+        day=1,
+        hour=2,
+        minute=0
+    )
+
+    ag.iniciar()
+
+    app.logger.info('Scheduler de alertas iniciado: verificações diárias às 9h00 '
+                    '(garantias 30 dias, manutenções 7 dias)')
+    return ag
+
+# ==================== FÁBRICA DA APLICAÇÃO ====================
+
+def configurar_logging():
+    """Configura o log assíncrono em JSON (logs/sistema_ativos.log)"""
+    log_estruturado.configurar('logs/sistema_ativos.log', os.getenv('LOG_NIVEL', 'INFO').upper())
+    # Os registros do app seguem para a fila do logger raiz
+    app.logger.removeHandler(default_handler)
+
+def create_app(config=None, iniciar_tarefas=False):
+    """
+    Configura e retorna a aplicação
+
+    Importar este módulo não tem efeitos colaterais: logging, pastas,
+    banco de dados e agendador só são preparados aqui. Chamadas repetidas
+    retornam a mesma aplicação sem reconfigurá-la.
+
+    Args:
+        config: Dicionário com valores de configuração do Flask (opcional)
+        iniciar_tarefas: Inicia o agendador de alertas neste processo
+    """
+    global _app_configurada
+
+    if config:
+        app.config.update(config)
+
+    if not _app_configurada:
+        configurar_logging()
+
+        os.makedirs(QR_FOLDER, exist_ok=True)
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'fotos'), exist_ok=True)
+        os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'documentos'), exist_ok=True)
+
+        init_db()
+        relatorio_jobs.SEGREDO = app.secret_key.encode()
+        log_estruturado.registrar_requisicoes(app)
+        busca_trigramas.registrar_sincronizacao(app)
+        if os.getenv('DESEMPENHO_PERFIL', 'true').lower() == 'true':
+            desempenho.registrar_perfilamento(app)
+        metricas.registrar_metricas(app)
+        consultas_lentas.ativar()
+        versao_dados.registrar_get_condicional(app, ROTAS_CONDICIONAIS)
+        _app_configurada = True
+        app.logger.info('Sistema de Ativos iniciado')
+
+    if iniciar_tarefas:
+        iniciar_agendador()
+
+    return app
+
+def apos_fork():
+    """
+    Prepara um worker recém-criado pelo servidor WSGI (gunicorn post_fork)
+
+    Descarta conexões herdadas do processo mestre e inicia o agendador;
+    apenas o worker que obtiver a liderança executa as tarefas.
+
+    Returns:
+        Agendador iniciado neste worker
+    """
+    log_estruturado.reiniciar_apos_fork()
+    db.reabrir_conexoes()
+    return iniciar_agendador()
 
 if __name__ == '__main__':
-    init_db()
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app(iniciar_tarefas=True).run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,163 @@
+"""
+Autocompletar de campos de texto livre dos ativos
+Índice ordenado em memória, por processo, com busca por prefixo e
+ranking por frequência (número de ativos com o valor)
+"""
+
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+import cache
+import db
+import versao_dados
+
+# Campos com autocompletar
+CAMPOS_AUTOCOMPLETAR = ('localizacao', 'responsavel', 'fornecedor', 'codigo_id')
+
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 50
+
+# Prefixos até este tamanho (o vazio, enviado ao focar o campo, e a primeira
+# letra) cobrem quase todo o índice: o ranking deles fica guardado
+TAMANHO_PREFIXO_CURTO = 1
+
+
+def normalizar(texto):
+    """Chave de busca: minúsculas, sem acentos e sem espaços nas pontas"""
+    texto = unicodedata.normalize('NFKD', str(texto).strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+class IndiceCampo:
+    """
+    Valores de um campo ordenados pela chave normalizada
+
+    'chaves' é uma lista ordenada de (chave, valor): os valores que começam
+    com um prefixo ocupam uma faixa contígua, localizada por busca binária.
+    Para prefixos curtos a faixa é quase o índice inteiro, então os
+    LIMITE_MAXIMO melhores de cada um ficam em 'curtos' até o próximo
+    valor que os afete.
+    """
+
+    def __init__(self, totais=None):
+        self.totais = Counter(totais or {})
+        self.chaves = sorted((normalizar(v), v) for v in self.totais)
+        self.curtos = {}
+
+    def _descartar_curtos(self, valor):
+        chave = normalizar(valor)
+        for tamanho in range(TAMANHO_PREFIXO_CURTO + 1):
+            self.curtos.pop(chave[:tamanho], None)
+
+    def adicionar(self, valor):
+        if self.totais[valor] == 0:
+            insort(self.chaves, (normalizar(valor), valor))
+        self.totais[valor] += 1
+        self._descartar_curtos(valor)
+
+    def remover(self, valor):
+        if self.totais[valor] <= 0:
+            return
+        self.totais[valor] -= 1
+        self._descartar_curtos(valor)
+        if self.totais[valor] == 0:
+            del self.totais[valor]
+            chave = (normalizar(valor), valor)
+            posicao = bisect_left(self.chaves, chave)
+            if posicao < len(self.chaves) and self.chaves[posicao] == chave:
+                del self.chaves[posicao]
+
+    def buscar(self, prefixo, limite):
+        """Os 'limite' valores mais frequentes que começam com o prefixo"""
+        prefixo = normalizar(prefixo)
+        if len(prefixo) <= TAMANHO_PREFIXO_CURTO:
+            if prefixo not in self.curtos:
+                self.curtos[prefixo] = self._melhores(prefixo, LIMITE_MAXIMO)
+            return self.curtos[prefixo][:limite]
+        return self._melhores(prefixo, limite)
+
+    def _melhores(self, prefixo, limite):
+        inicio = bisect_left(self.chaves, (prefixo,))
+        # '\uffff' ordena depois de qualquer continuação do prefixo
+        fim = bisect_left(self.chaves, (prefixo + '\uffff',), inicio)
+
+        faixa = self.chaves[inicio:fim]
+        melhores = heapq.nsmallest(limite, faixa, key=lambda item: (-self.totais[item[1]], item[0]))
+        return [(valor, self.totais[valor]) for _, valor in melhores]
+
+
+class Indice:
+    """
+    Índices de todos os campos, sincronizados com a versão da tabela ativos
+
+    As escritas feitas por este processo são aplicadas incrementalmente
+    (registrar_alteracao). Se a versão de ativos mudar por qualquer outro
+    caminho (outro worker, scripts, rotas sem registro), o índice é
+    reconstruído na próxima busca.
+    """
+
+    def __init__(self):
+        self._campos = {}
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def _reconstruir(self, versao):
+        totais = {campo: Counter() for campo in CAMPOS_AUTOCOMPLETAR}
+        with db.conectar() as conn:
+            for linha in conn.execute(f"SELECT {', '.join(CAMPOS_AUTOCOMPLETAR)} FROM ativos"):
+                for campo, valor in zip(CAMPOS_AUTOCOMPLETAR, linha):
+                    if valor:
+                        totais[campo][valor] += 1
+        self._campos = {campo: IndiceCampo(totais[campo]) for campo in CAMPOS_AUTOCOMPLETAR}
+        self._versao = versao
+
+    def buscar(self, campo, prefixo, limite=LIMITE_PADRAO):
+        """
+        Sugestões para o campo a partir do prefixo digitado
+
+        Returns:
+            Lista de tuplas (valor, total), mais frequentes primeiro
+        """
+        if campo not in CAMPOS_AUTOCOMPLETAR:
+            raise ValueError(f"Campo sem autocompletar: {campo}")
+
+        versao = cache.cache.versoes_atuais().get('ativos')
+        with self._lock:
+            if versao != self._versao:
+                self._reconstruir(versao)
+            return self._campos[campo].buscar(prefixo, limite)
+
+    def registrar_alteracao(self, conn, antes=None, depois=None):
+        """
+        Aplica ao índice uma escrita de um único ativo feita em 'conn'
+
+        Chamar após o commit. Se a versão lida não for exatamente a seguinte
+        à do índice, houve outra escrita no meio e o índice é descartado.
+
+        Args:
+            conn: Conexão usada na escrita
+            antes: {campo: valor} do ativo antes da escrita (None ao criar)
+            depois: {campo: valor} do ativo após a escrita (None ao excluir)
+        """
+        versao = versao_dados.obter_versoes(conn).get('ativos')
+        with self._lock:
+            if self._versao is None or versao != self._versao + 1:
+                self._versao = None
+                return
+            for campo, indice in self._campos.items():
+                valor_antigo = (antes or {}).get(campo)
+                valor_novo = (depois or {}).get(campo)
+                if valor_antigo == valor_novo:
+                    continue
+                if valor_antigo:
+                    indice.remover(valor_antigo)
+                if valor_novo:
+                    indice.adicionar(valor_novo)
+            self._versao = versao
+
+
+# Índice padrão do processo
+indice = Indice()
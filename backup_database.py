@@ -4,11 +4,13 @@ Script de Backup Automático do Banco de Dados
 Mantém os últimos 7 backups e rotaciona automaticamente
 """
 import sqlite3
-import shutil
 import os
+import time
 from datetime import datetime
 import glob
 
+import metricas
+
 DB_FILE = "ativos.db"
 BACKUP_DIR = "backups"
 MAX_BACKUPS = 7
@@ -25,14 +27,25 @@ def criar_backup():
 
         # Copiar banco de dados
         if os.path.exists(DB_FILE):
-            # Usar VACUUM para compactar antes do backup
-            with sqlite3.connect(DB_FILE) as conn:
-                conn.execute('VACUUM')
-
-            # Copiar arquivo
-            shutil.copy2(DB_FILE, backup_file)
+            inicio = time.perf_counter()
+            # API de backup do SQLite: cópia consistente mesmo com o banco
+            # em uso e com páginas ainda no arquivo WAL (ativos.db-wal)
+            origem = sqlite3.connect(DB_FILE)
+            destino = sqlite3.connect(backup_file)
+            try:
+                origem.backup(destino)
+                # Compactar a cópia (não bloqueia o banco em uso)
+                destino.execute('VACUUM')
+            finally:
+                destino.close()
+                origem.close()
             file_size = os.path.getsize(backup_file) / (1024 * 1024)  # MB
 
+            metricas.BACKUPS.labels('sucesso').inc()
+            metricas.BACKUP_DURACAO.set(time.perf_counter() - inicio)
+            metricas.BACKUP_TAMANHO.set(os.path.getsize(backup_file))
+            metricas.BACKUP_ULTIMO_SUCESSO.set_to_current_time()
+
             print(f"✅ Backup criado com sucesso!")
             print(f"   📁 Arquivo: {backup_file}")
             print(f"   📊 Tamanho: {file_size:.2f} MB")
@@ -44,10 +57,12 @@ def criar_backup():
             return True
         else:
             print(f"❌ Erro: Banco de dados '{DB_FILE}' não encontrado")
+            metricas.BACKUPS.labels('falha').inc()
             return False
 
     except Exception as e:
         print(f"❌ Erro ao criar backup: {e}")
+        metricas.BACKUPS.labels('falha').inc()
         return False
 
 def rotacionar_backups():
@@ -104,11 +119,23 @@ def restaurar_backup(backup_file):
         # Criar backup do banco atual antes de restaurar
         if os.path.exists(DB_FILE):
             backup_atual = f"{DB_FILE}.before_restore"
-            shutil.copy2(DB_FILE, backup_atual)
+            origem = sqlite3.connect(DB_FILE)
+            destino = sqlite3.connect(backup_atual)
+            try:
+                origem.backup(destino)
+            finally:
+                destino.close()
+                origem.close()
             print(f"   ℹ️  Backup do banco atual salvo em: {backup_atual}")
 
-        # Restaurar backup
-        shutil.copy2(backup_file, DB_FILE)
+        # Restaurar backup (pela API de backup, para respeitar o WAL do banco atual)
+        origem = sqlite3.connect(backup_file)
+        destino = sqlite3.connect(DB_FILE)
+        try:
+            origem.backup(destino)
+        finally:
+            destino.close()
+            origem.close()
         print(f"✅ Backup restaurado com sucesso!")
         print(f"   📁 De: {backup_file}")
         print(f"   📁 Para: {DB_FILE}")
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks das funções principais com verificação de regressão
+Mede cada operação num banco em memória preenchido por gerar_dados.py e
+compara com a base gravada; termina com código 1 se alguma operação
+ficar mais lenta que a base além da tolerância
+
+Uso:
+  python benchmark_funcoes.py --gravar-base     # Mede e grava benchmark_base.json
+  python benchmark_funcoes.py                   # Compara com a base (falha se regredir)
+  python benchmark_funcoes.py --tolerancia 10   # Regressão máxima aceita em %
+  python benchmark_funcoes.py --filtro qr       # Apenas operações com 'qr' no nome
+
+A base depende da máquina: grave-a no mesmo ambiente em que a
+verificação vai rodar (ex: o runner de CI).
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+
+import db
+
+# Banco em memória compartilhado entre as conexões do processo
+BANCO_MEMORIA = 'file:benchmark_funcoes?mode=memory&cache=shared'
+
+ARQUIVO_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_base.json')
+TOLERANCIA_PADRAO = float(os.getenv('BENCHMARK_TOLERANCIA', '20'))
+
+# Novas medições de uma operação acima da tolerância antes de acusar regressão
+CONFIRMACOES = 2
+
+
+def preparar_banco(total_ativos, semente):
+    """
+    Cria o esquema da aplicação no banco em memória e o preenche
+
+    Returns:
+        Conexão que mantém o banco vivo (fechá-la descarta os dados)
+    """
+    db.DB = BANCO_MEMORIA
+    ancora = db.conectar()
+
+    import app
+    import gerar_dados
+    app.init_db()
+    with db.conectar() as conn:
+        gerar_dados.gerar(conn, total_ativos, semente, inventarios=1)
+    return ancora
+
+
+def operacoes(pasta):
+    """Operações medidas: nome -> função sem argumentos"""
+    import email_service
+    import exportacao
+    import qr_service
+    import utils
+
+    with db.conectar() as conn:
+        # Ativo com mais histórico (pior caso realista da página de detalhe)
+        ativo_id = conn.execute(
+            'SELECT ativo_id FROM historico GROUP BY ativo_id ORDER BY COUNT(*) DESC, ativo_id LIMIT 1'
+        ).fetchone()[0]
+        ativo_escrita = conn.execute('SELECT MAX(id) FROM ativos WHERE id != ?', (ativo_id,)).fetchone()[0]
+        inventario = conn.execute('SELECT * FROM inventarios ORDER BY id LIMIT 1').fetchone()
+        itens_inventario = conn.execute('''
+            SELECT a.codigo_id, a.nome, a.sn, a.localizacao, a.responsavel, c.nome,
+                   ii.status, ii.conferido_por, ii.data_conferencia, ii.observacao
+            FROM inventario_itens ii
+            JOIN ativos a ON ii.ativo_id = a.id
+            LEFT JOIN categorias c ON a.categoria_id = c.id
+            WHERE ii.inventario_id = ?
+            ORDER BY a.codigo_id
+        ''', (inventario[0],)).fetchall()
+
+    garantias = email_service.verificar_garantias_vencendo(90)
+    planilha = os.path.join(pasta, 'ativos.xlsx')
+    planilha_inventario = os.path.join(pasta, 'inventario.xlsx')
+
+    def exportar_ativos():
+        with db.conectar() as conn:
+            exportacao.exportar_consulta_excel(conn, 'SELECT * FROM ativos', (), planilha)
+
+    # Escritas por último e em outro ativo, para não alterar as leituras medidas
+    return {
+        'get_historico_ativo': lambda: utils.get_historico_ativo(ativo_id),
+        'get_proximas_manutencoes': lambda: utils.get_proximas_manutencoes(30),
+        'get_estatisticas_categorias': utils.get_estatisticas_categorias,
+        'verificar_garantias_vencendo': lambda: email_service.verificar_garantias_vencendo(30),
+        'criar_email_alerta_garantia': lambda: email_service.criar_email_alerta_garantia(garantias),
+        'qr_codificar': lambda: qr_service.criar_qrcode(f'http://localhost:5000/ver/{ativo_id}'),
+        'qr_codificar_etiqueta': lambda: qr_service.criar_qrcode(
+            f'http://localhost:5000/ver/{ativo_id}', perfil='etiqueta_pequena'),
+        'exportar_ativos_excel': exportar_ativos,
+        'exportar_inventario_excel': lambda: exportacao.exportar_inventario_excel(
+            inventario, itens_inventario, planilha_inventario),
+        'registrar_historico': lambda: utils.registrar_historico(
+            ativo_escrita, 'editado', 'localizacao', 'Sala TI - Maputo', 'Armazém - Beira', 'benchmark', '127.0.0.1'),
+    }
+
+
+def medir(funcao, repeticoes):
+    """
+    Tempo por chamada (segundos): o menor entre as repetições
+
+    O número de chamadas por repetição é escolhido para somar ~0,2 s; o
+    mínimo é o valor menos afetado por ruído do sistema.
+    """
+    timer = timeit.Timer(funcao)
+    chamadas, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeticoes, number=chamadas)) / chamadas
+
+
+def _formatar_tempo(segundos):
+    if segundos >= 1:
+        return f'{segundos:.2f} s'
+    if segundos >= 1e-3:
+        return f'{segundos * 1e3:.2f} ms'
+    return f'{segundos * 1e6:.1f} µs'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks com verificação de regressão')
+    parser.add_argument('--ativos', type=int, default=2000, help='Ativos no banco de teste (padrão: 2000)')
+    parser.add_argument('--repeticoes', type=int, default=5, help='Repetições por operação (padrão: 5)')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help=f'Regressão máxima em %% (padrão: {TOLERANCIA_PADRAO:g}, ou BENCHMARK_TOLERANCIA)')
+    parser.add_argument('--base', default=ARQUIVO_BASE, help='Arquivo da base (padrão: benchmark_base.json)')
+    parser.add_argument('--gravar-base', action='store_true', help='Grava os tempos medidos como nova base')
+    parser.add_argument('--filtro', help='Mede apenas as operações que contêm este texto')
+    args = parser.parse_args()
+
+    base = {}
+    if os.path.exists(args.base):
+        with open(args.base, encoding='utf-8') as f:
+            base = json.load(f)
+        if base.get('ativos') != args.ativos:
+            print(f"⚠ Base gravada com {base.get('ativos')} ativos; usando --ativos {base.get('ativos')}")
+            args.ativos = base.get('ativos') or args.ativos
+
+    print("=" * 80)
+    print("  MICRO-BENCHMARKS - Sistema de Gestão de Ativos")
+    print("=" * 80)
+    print(f"  Banco em memória com {args.ativos} ativos  |  Tolerância: {args.tolerancia:g}%")
+    print(f"  Python {platform.python_version()} em {platform.machine()}")
+    print()
+
+    ancora = preparar_banco(args.ativos, semente=42)
+    resultados = {}
+    regressoes = []
+
+    print(f"  {'Operação':<30} {'Atual':>12} {'Base':>12} {'Variação':>10}")
+    print("-" * 80)
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, funcao in operacoes(pasta).items():
+            if args.filtro and args.filtro not in nome:
+                continue
+            resultados[nome] = tempo = medir(funcao, args.repeticoes)
+
+            anterior = base.get('operacoes', {}).get(nome)
+            if anterior is None:
+                print(f"  {nome:<30} {_formatar_tempo(tempo):>12} {'-':>12} {'nova':>10}")
+                continue
+
+            # Confirma a regressão medindo de novo (picos de carga da máquina)
+            for _ in range(CONFIRMACOES):
+                if (tempo / anterior - 1) * 100 <= args.tolerancia:
+                    break
+                resultados[nome] = tempo = min(tempo, medir(funcao, args.repeticoes))
+
+            variacao = (tempo / anterior - 1) * 100
+            marcador = ''
+            if variacao > args.tolerancia:
+                marcador = '  ❌ regressão'
+                regressoes.append((nome, variacao))
+            elif variacao < -args.tolerancia:
+                marcador = '  ⚡ melhora'
+            print(f"  {nome:<30} {_formatar_tempo(tempo):>12} {_formatar_tempo(anterior):>12} "
+                  f"{variacao:>+9.1f}%{marcador}")
+    ancora.close()
+    print("-" * 80)
+
+    if args.gravar_base:
+        operacoes_base = dict(base.get('operacoes', {}), **resultados) if args.filtro else resultados
+        with open(args.base, 'w', encoding='utf-8') as f:
+            json.dump({
+                'ativos': args.ativos,
+                'python': platform.python_version(),
+                'maquina': platform.machine(),
+                'operacoes': operacoes_base,
+            }, f, indent=2, sort_keys=True)
+        print(f"💾 Base gravada em {args.base}")
+        return 0
+
+    if not base:
+        print("ℹ Nenhuma base encontrada: execute com --gravar-base para criá-la")
+        return 0
+
+    if regressoes:
+        print(f"❌ {len(regressoes)} operação(ões) acima da tolerância de {args.tolerancia:g}%:")
+        for nome, variacao in regressoes:
+            print(f"   {nome}: {variacao:+.1f}%")
+        return 1
+
+    print("✅ Nenhuma regressão acima da tolerância")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicialização da aplicação
+Mede o custo de 'import app' e de create_app() em processos novos,
+como acontece no boot de cada worker
+
+Uso:
+  python benchmark_inicializacao.py                    # Árvore atual
+  python benchmark_inicializacao.py --comparar <ref>   # Compara com um commit git
+  python benchmark_inicializacao.py --repeticoes 10
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+MODULOS_PESADOS = ('pandas', 'numpy', 'openpyxl', 'qrcode', 'PIL', 'apscheduler')
+
+CODIGO_MEDICAO = f'''
+import json, resource, sys, time
+inicio = time.perf_counter()
+import app
+importacao = time.perf_counter() - inicio
+memoria_import = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+inicio = time.perf_counter()
+if hasattr(app, 'create_app'):
+    app.create_app()
+fabrica = time.perf_counter() - inicio
+print(json.dumps({{
+    'importacao_ms': importacao * 1000,
+    'fabrica_ms': fabrica * 1000,
+    'memoria_import_mb': memoria_import / 1024,
+    'memoria_total_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'pesados': [m for m in {MODULOS_PESADOS!r} if m in sys.modules],
+}}))
+sys.stdout.flush()
+import os
+os._exit(0)
+'''
+
+
+def _executar(fonte, *args):
+    """Executa um processo Python novo com a fonte no PYTHONPATH, em pasta temporária"""
+    with tempfile.TemporaryDirectory() as pasta:
+        env = dict(os.environ, PYTHONPATH=fonte, PYTHONDONTWRITEBYTECODE='1')
+        return subprocess.run([sys.executable, *args], cwd=pasta, env=env,
+                              capture_output=True, text=True, check=True)
+
+
+def medir(fonte, repeticoes):
+    """Mede importação e create_app() em 'repeticoes' processos novos"""
+    # Primeira execução aquece o cache de bytecode e do sistema de arquivos
+    _executar(fonte, '-c', CODIGO_MEDICAO)
+
+    amostras = [json.loads(_executar(fonte, '-c', CODIGO_MEDICAO).stdout.strip().splitlines()[-1])
+                for _ in range(repeticoes)]
+
+    return {
+        'importacao_ms': statistics.median(a['importacao_ms'] for a in amostras),
+        'fabrica_ms': statistics.median(a['fabrica_ms'] for a in amostras),
+        'memoria_import_mb': statistics.median(a['memoria_import_mb'] for a in amostras),
+        'memoria_total_mb': statistics.median(a['memoria_total_mb'] for a in amostras),
+        'pesados': amostras[-1]['pesados'],
+    }
+
+
+def maiores_importacoes(fonte, limite=10):
+    """Importações diretas de app.py mais caras segundo 'python -X importtime'"""
+    saida = _executar(fonte, '-X', 'importtime', '-c', 'import app, os; os._exit(0)').stderr
+
+    custos = []
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or '|' not in linha:
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        if not acumulado.strip().isdigit():
+            continue
+        # Apenas módulos importados diretamente por app.py (um nível de recuo)
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        if nivel == 1:
+            custos.append((int(acumulado) / 1000, nome.strip()))
+
+    return sorted(custos, reverse=True)[:limite]
+
+
+def extrair_ref(ref):
+    """Extrai um commit git para uma pasta temporária"""
+    destino = tempfile.mkdtemp(prefix='benchmark_ref_')
+    arquivo = subprocess.run(['git', 'archive', ref], cwd=DIRETORIO, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', destino], input=arquivo, check=True)
+    return destino
+
+
+def imprimir(titulo, r):
+    print(f"\n{titulo}")
+    print("-" * 60)
+    print(f"  import app:         {r['importacao_ms']:8.1f} ms")
+    print(f"  create_app():       {r['fabrica_ms']:8.1f} ms")
+    print(f"  Memória após import:{r['memoria_import_mb']:8.1f} MB")
+    print(f"  Memória total:      {r['memoria_total_mb']:8.1f} MB")
+    print(f"  Módulos pesados:    {', '.join(r['pesados']) or 'nenhum'}")
+
+
+if __name__ == '__main__':
+    repeticoes = 5
+    if '--repeticoes' in sys.argv:
+        repeticoes = int(sys.argv[sys.argv.index('--repeticoes') + 1])
+
+    print("=" * 60)
+    print("  BENCHMARK DE INICIALIZAÇÃO - Sistema de Gestão de Ativos")
+    print("=" * 60)
+    print(f"  Repetições: {repeticoes} (mediana)")
+
+    atual = medir(DIRETORIO, repeticoes)
+    imprimir("Árvore atual", atual)
+
+    print("\n  Importações mais caras (acumulado):")
+    for custo_ms, nome in maiores_importacoes(DIRETORIO):
+        print(f"    {custo_ms:8.1f} ms  {nome}")
+
+    if '--comparar' in sys.argv:
+        ref = sys.argv[sys.argv.index('--comparar') + 1]
+        fonte_ref = extrair_ref(ref)
+        try:
+            anterior = medir(fonte_ref, repeticoes)
+        finally:
+            shutil.rmtree(fonte_ref, ignore_errors=True)
+        imprimir(f"Referência ({ref})", anterior)
+
+        print("\nDiferença (atual - referência)")
+        print("-" * 60)
+        for chave, rotulo, unidade in [('importacao_ms', 'import app', 'ms'),
+                                       ('memoria_import_mb', 'Memória após import', 'MB')]:
+            print(f"  {rotulo:<20} {atual[chave] - anterior[chave]:+8.1f} {unidade}")
+
+    print()
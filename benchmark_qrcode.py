@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark de codificação de QR Codes
+Mede tempo de geração, tamanho do arquivo e robustez de leitura para
+cada combinação de correção de erro, versão, formato e otimização
+
+Uso:
+  python benchmark_qrcode.py                 # Matriz completa
+  python benchmark_qrcode.py --perfis        # Apenas os perfis de qr_service
+  python benchmark_qrcode.py --repeticoes 50 # Mais repetições por medição
+
+A leitura usa OpenCV (cv2) ou pyzbar, se instalados; sem eles a coluna
+de robustez aparece como "n/d".
+"""
+
+import io
+import random
+import sys
+import time
+from itertools import product
+
+from PIL import Image, ImageDraw, ImageFilter
+import qrcode.image.svg
+
+import qr_service
+
+URL_EXEMPLO = "http://11.1.106.225:5000/ver/123456"
+
+# Tamanho impresso simulado (pixels) e degradações aplicadas antes da leitura
+TAMANHOS_LEITURA = [80, 120, 200]
+DEGRADACOES = [
+    ('limpo', 0.0, 0),
+    ('desfoque', 1.0, 0),
+    ('danificado', 0.6, 6),
+]
+
+
+def _carregar_decodificador():
+    """Retorna uma função decodificar(imagem_pil) -> texto ou None"""
+    try:
+        import cv2
+        import numpy as np
+
+        detector = cv2.QRCodeDetector()
+
+        def decodificar(img):
+            dados, _, _ = detector.detectAndDecode(np.array(img.convert('L')))
+            return dados or None
+
+        return decodificar
+    except ImportError:
+        pass
+
+    try:
+        from pyzbar.pyzbar import decode
+
+        def decodificar(img):
+            resultado = decode(img.convert('L'))
+            return resultado[0].data.decode() if resultado else None
+
+        return decodificar
+    except ImportError:
+        return None
+
+
+def _degradar(img, tamanho, desfoque, manchas, semente):
+    """Reduz a imagem ao tamanho impresso e aplica desfoque e manchas"""
+    img = img.convert('L').resize((tamanho, tamanho), Image.BILINEAR)
+    if desfoque:
+        img = img.filter(ImageFilter.GaussianBlur(desfoque))
+    if manchas:
+        rnd = random.Random(semente)
+        draw = ImageDraw.Draw(img)
+        lado = max(2, tamanho // 20)
+        for _ in range(manchas):
+            x, y = rnd.randrange(tamanho - lado), rnd.randrange(tamanho - lado)
+            draw.rectangle([x, y, x + lado, y + lado], fill=rnd.choice([0, 255]))
+    # Margem branca para o detector localizar os padrões de posição
+    fundo = Image.new('L', (tamanho + 40, tamanho + 40), 255)
+    fundo.paste(img, (20, 20))
+    return fundo
+
+
+def medir(ajustes, formato, repeticoes, decodificar):
+    """Mede uma configuração e retorna um dicionário de resultados"""
+    image_factory = qrcode.image.svg.SvgPathImage if formato == 'svg' else None
+    salvar_kwargs = {'optimize': True} if ajustes.get('png_otimizado') and formato == 'png' else {}
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        img = qr_service.criar_qrcode(URL_EXEMPLO, image_factory=image_factory, **ajustes)
+        buffer = io.BytesIO()
+        img.save(buffer, **salvar_kwargs)
+    tempo_ms = (time.perf_counter() - inicio) * 1000 / repeticoes
+
+    resultado = {
+        'tempo_ms': tempo_ms,
+        'bytes': len(buffer.getvalue()),
+        'versao': (img.width - 17) // 4,
+        'leitura': None,
+    }
+
+    if decodificar and formato == 'png':
+        base = img.get_image()
+        tentativas = sucessos = 0
+        for tamanho, (_, desfoque, manchas) in product(TAMANHOS_LEITURA, DEGRADACOES):
+            tentativas += 1
+            if decodificar(_degradar(base, tamanho, desfoque, manchas, tamanho)) == URL_EXEMPLO:
+                sucessos += 1
+        resultado['leitura'] = sucessos / tentativas
+
+    return resultado
+
+
+def _linha(nome, formato, r):
+    leitura = f"{r['leitura'] * 100:5.0f}%" if r['leitura'] is not None else '  n/d'
+    print(f"  {nome:<34} {formato:<4} {r['tempo_ms']:8.2f} ms {r['bytes']:8d} B  v{r['versao'] or '?':<3} {leitura}")
+
+
+def _cabecalho():
+    print(f"  {'Configuração':<34} {'Fmt':<4} {'Tempo':>11} {'Tamanho':>10}  {'Ver':<4} {'Leitura':>6}")
+    print("-" * 80)
+
+
+def benchmark_perfis(repeticoes, decodificar):
+    """Compara os perfis configurados em qr_service.PERFIS_QR"""
+    print("\nPerfis configurados:")
+    _cabecalho()
+    for nome, config in qr_service.PERFIS_QR.items():
+        _linha(nome, 'png', medir(dict(config), 'png', repeticoes, decodificar))
+
+
+def benchmark_matriz(repeticoes, decodificar):
+    """Matriz completa de parâmetros"""
+    print("\nMatriz de parâmetros:")
+    _cabecalho()
+    for correcao, versao, tamanho_modulo, otimizar, formato in product(
+            ['L', 'M', 'Q', 'H'], [None, 5], [4, 10], [0, 20], ['png', 'svg']):
+        ajustes = {
+            'correcao': correcao,
+            'versao': versao,
+            'tamanho_modulo': tamanho_modulo,
+            'borda': 4,
+            'otimizar': otimizar,
+            'png_otimizado': False,
+        }
+        nome = f"ec={correcao} v={versao or 'auto'} box={tamanho_modulo} opt={otimizar}"
+        _linha(nome, formato, medir(ajustes, formato, repeticoes, decodificar))
+
+
+if __name__ == '__main__':
+    repeticoes = 20
+    if '--repeticoes' in sys.argv:
+        repeticoes = int(sys.argv[sys.argv.index('--repeticoes') + 1])
+
+    print("=" * 80)
+    print("  BENCHMARK DE QR CODES - Sistema de Gestão de Ativos")
+    print("=" * 80)
+    print(f"  URL: {URL_EXEMPLO}")
+    print(f"  Repetições por medição: {repeticoes}")
+
+    decodificar = _carregar_decodificador()
+    if not decodificar:
+        print("  ⚠ OpenCV/pyzbar não instalados: robustez de leitura não será medida")
+
+    benchmark_perfis(repeticoes, decodificar)
+    if '--perfis' not in sys.argv:
+        benchmark_matriz(repeticoes, decodificar)
+
+    print()
@@ -0,0 +1,110 @@
+"""
+Busca de ativos com facetas
+Os filtros selecionados viram condições de igualdade (com índice) e as
+contagens por faceta são feitas na mesma passada que lê os resultados
+"""
+
+from collections import Counter
+
+import busca_trigramas
+
+# Campos de faceta e seus títulos
+FACETAS = (
+    ('estado', 'Estado'),
+    ('categoria_id', 'Categoria'),
+    ('localizacao', 'Localização'),
+    ('responsavel', 'Responsável'),
+)
+
+# Campos pesquisados pelo texto livre
+CAMPOS_BUSCA = ('codigo_id', 'nome', 'sn', 'descricao', 'localizacao', 'responsavel')
+
+# Índices usados pelos filtros de faceta
+INDICES = (
+    'CREATE INDEX IF NOT EXISTS idx_ativos_estado ON ativos(estado)',
+    'CREATE INDEX IF NOT EXISTS idx_ativos_categoria ON ativos(categoria_id)',
+    'CREATE INDEX IF NOT EXISTS idx_ativos_localizacao ON ativos(localizacao)',
+    'CREATE INDEX IF NOT EXISTS idx_ativos_responsavel ON ativos(responsavel)',
+)
+
+
+def criar_indices(conn):
+    """Cria os índices das colunas de faceta"""
+    for indice in INDICES:
+        conn.execute(indice)
+
+
+def filtros_da_requisicao(args):
+    """Extrai {campo: valor} das facetas selecionadas nos parâmetros da URL"""
+    return {campo: args[campo] for campo, _ in FACETAS if args.get(campo)}
+
+
+def buscar(conn, busca='', filtros=None):
+    """
+    Busca ativos e conta os resultados por faceta
+
+    Se o texto livre não encontrar nada, tenta a busca aproximada por
+    trigramas (erros de digitação, O/0, separadores em seriais).
+
+    Args:
+        conn: Conexão com o banco
+        busca: Texto livre (LIKE nos campos de CAMPOS_BUSCA)
+        filtros: {campo: valor} das facetas selecionadas
+
+    Returns:
+        dict com 'colunas', 'ativos' (linhas), 'facetas'
+        ({campo: [(valor, total), ...]}, mais frequentes primeiro) e
+        'aproximada' (True se vier da busca por trigramas)
+    """
+    condicoes = []
+    params = []
+
+    for campo, valor in (filtros or {}).items():
+        condicoes.append(f'{campo} = ?')
+        params.append(valor)
+
+    if not busca:
+        return _executar(conn, condicoes, params)
+
+    condicao_busca = '(' + ' OR '.join(f'{campo} LIKE ?' for campo in CAMPOS_BUSCA) + ')'
+    resultado = _executar(conn, condicoes + [condicao_busca], params + [f'%{busca}%'] * len(CAMPOS_BUSCA))
+    if resultado['ativos']:
+        return resultado
+
+    # Nada encontrado: busca aproximada, na ordem de similaridade
+    similares = busca_trigramas.buscar(conn, busca)
+    if not similares:
+        return resultado
+
+    ordem = {ativo_id: posicao for posicao, (ativo_id, _) in enumerate(similares)}
+    condicao_ids = f"id IN ({','.join('?' * len(ordem))})"
+    resultado = _executar(conn, condicoes + [condicao_ids], params + list(ordem))
+    resultado['ativos'].sort(key=lambda linha: ordem[linha[0]])
+    resultado['aproximada'] = True
+    return resultado
+
+
+def _executar(conn, condicoes, params):
+    """Executa a busca e conta as facetas na mesma passada pelas linhas"""
+    query = 'SELECT * FROM ativos'
+    if condicoes:
+        query += ' WHERE ' + ' AND '.join(condicoes)
+
+    cursor = conn.execute(query, params)
+    colunas = [d[0] for d in cursor.description]
+    posicoes = [(campo, colunas.index(campo)) for campo, _ in FACETAS]
+
+    contagens = {campo: Counter() for campo, _ in FACETAS}
+    ativos = []
+    for linha in cursor:
+        ativos.append(linha)
+        for campo, posicao in posicoes:
+            if linha[posicao] not in (None, ''):
+                contagens[campo][linha[posicao]] += 1
+
+    return {
+        'colunas': colunas,
+        'ativos': ativos,
+        'facetas': {campo: contagem.most_common() for campo, contagem in contagens.items()},
+        'aproximada': False,
+    }
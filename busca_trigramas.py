@@ -0,0 +1,264 @@
+"""
+Busca aproximada (tolerante a erros de digitação) por trigramas
+Nome, número de série, código e patrimônio de cada ativo são quebrados em
+trigramas na tabela ativos_trigramas; uma busca conta quantos trigramas
+do texto digitado cada ativo possui
+"""
+
+import logging
+import math
+import unicodedata
+
+import db
+
+# Caracteres que costumam ser trocados em números de série
+CONFUSOES_SERIAL = str.maketrans({'O': '0', 'Q': '0', 'I': '1', 'L': '1'})
+
+# Colunas de ativos indexadas (nome como texto, as demais como serial)
+COLUNAS_TEXTO = ('nome',)
+COLUNAS_SERIAL = ('sn', 'codigo_id', 'numero_patrimonio')
+
+# Fração mínima dos trigramas da busca que o ativo precisa ter
+SIMILARIDADE_MINIMA = 0.5
+
+# Máximo de ativos avaliados por busca (nas buscas vagas demais ficam os que
+# têm mais trigramas raros em comum com a busca)
+MAX_CANDIDATOS = 5000
+
+# Métodos HTTP que podem alterar ativos
+METODOS_ESCRITA = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+logger = logging.getLogger(__name__)
+
+
+def _sem_acentos(texto):
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sem acentos e apenas letras/números separados por espaço"""
+    texto = _sem_acentos(str(texto or '')).lower()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in texto).split())
+
+
+def normalizar_serial(serial):
+    """
+    Maiúsculas, sem separadores e com O/Q→0 e I/L→1
+
+    'sn-12o4 5' e 'SN1204S' passam a diferir apenas no último caractere.
+    """
+    serial = _sem_acentos(str(serial or '')).upper()
+    return ''.join(c for c in serial if c.isalnum()).translate(CONFUSOES_SERIAL)
+
+
+def trigramas_texto(texto):
+    """Trigramas de cada palavra, com bordas marcadas por espaço"""
+    trigramas = set()
+    for palavra in normalizar_texto(texto).split():
+        palavra = f'  {palavra} '
+        trigramas.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return trigramas
+
+
+def trigramas_serial(serial):
+    """Trigramas do serial normalizado (vazio se tiver menos de 3 caracteres)"""
+    serial = normalizar_serial(serial)
+    return {serial[i:i + 3] for i in range(len(serial) - 2)}
+
+
+def _trigramas_consulta(texto):
+    """Trigramas da busca, com prefixo de tipo: 'n' (nome) e 's' (serial)"""
+    return ({'n' + t for t in trigramas_texto(texto)},
+            {'s' + t for t in trigramas_serial(texto)})
+
+
+def criar_tabelas(conn):
+    """
+    Cria as tabelas de trigramas e os triggers que marcam ativos pendentes
+
+    Os triggers apenas enfileiram o id do ativo alterado; os trigramas são
+    calculados em Python por sincronizar(), que roda ao fim das requisições
+    de escrita e periodicamente no agendador. Assim qualquer escrita
+    (rotas, scripts, migrações) é coberta sem pesar nas buscas.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ativos_trigramas (
+            trigrama TEXT NOT NULL,
+            ativo_id INTEGER NOT NULL,
+            PRIMARY KEY (trigrama, ativo_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ativos_trigramas_ativo ON ativos_trigramas(ativo_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ativos_trigramas_docs (
+            ativo_id INTEGER PRIMARY KEY,
+            total_nome INTEGER NOT NULL,
+            total_serial INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ativos_trigramas_pendentes (
+            ativo_id INTEGER PRIMARY KEY
+        )
+    ''')
+
+    colunas = ', '.join(COLUNAS_TEXTO + COLUNAS_SERIAL)
+    for nome, evento, origem in [('insert', 'INSERT', 'NEW'),
+                                 ('update', f'UPDATE OF {colunas}', 'NEW'),
+                                 ('delete', 'DELETE', 'OLD')]:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS ativos_trigramas_{nome} AFTER {evento} ON ativos
+            BEGIN
+                INSERT OR IGNORE INTO ativos_trigramas_pendentes (ativo_id) VALUES ({origem}.id);
+            END
+        ''')
+
+    # Primeira execução: indexa todos os ativos existentes
+    if not conn.execute('SELECT 1 FROM ativos_trigramas_docs LIMIT 1').fetchone():
+        conn.execute('INSERT OR IGNORE INTO ativos_trigramas_pendentes (ativo_id) SELECT id FROM ativos')
+        sincronizar(conn)
+
+
+def sincronizar(conn):
+    """
+    Recalcula os trigramas dos ativos pendentes
+
+    Returns:
+        Número de ativos processados
+    """
+    pendentes = [linha[0] for linha in conn.execute('SELECT ativo_id FROM ativos_trigramas_pendentes')]
+    if not pendentes:
+        return 0
+
+    colunas = COLUNAS_TEXTO + COLUNAS_SERIAL
+    for inicio in range(0, len(pendentes), 500):
+        lote = pendentes[inicio:inicio + 500]
+        marcadores = ','.join('?' * len(lote))
+
+        conn.execute(f'DELETE FROM ativos_trigramas WHERE ativo_id IN ({marcadores})', lote)
+        conn.execute(f'DELETE FROM ativos_trigramas_docs WHERE ativo_id IN ({marcadores})', lote)
+
+        linhas = conn.execute(
+            f"SELECT id, {', '.join(colunas)} FROM ativos WHERE id IN ({marcadores})", lote).fetchall()
+
+        trigramas = []
+        documentos = []
+        for linha in linhas:
+            ativo_id, valores = linha[0], dict(zip(colunas, linha[1:]))
+            nome = set().union(*(trigramas_texto(valores[c]) for c in COLUNAS_TEXTO))
+            serial = set().union(*(trigramas_serial(valores[c]) for c in COLUNAS_SERIAL))
+            trigramas.extend(('n' + t, ativo_id) for t in nome)
+            trigramas.extend(('s' + t, ativo_id) for t in serial)
+            documentos.append((ativo_id, len(nome), len(serial)))
+
+        conn.executemany('INSERT INTO ativos_trigramas (trigrama, ativo_id) VALUES (?, ?)', trigramas)
+        conn.executemany('INSERT INTO ativos_trigramas_docs (ativo_id, total_nome, total_serial) VALUES (?, ?, ?)',
+                         documentos)
+        conn.execute(f'DELETE FROM ativos_trigramas_pendentes WHERE ativo_id IN ({marcadores})', lote)
+
+    return len(pendentes)
+
+
+def sincronizar_pendentes():
+    """Sincroniza os ativos pendentes em uma conexão própria (tarefa do agendador)"""
+    with db.conectar() as conn:
+        processados = sincronizar(conn)
+    if processados:
+        logger.info(f"Trigramas recalculados para {processados} ativo(s)")
+    return processados
+
+
+def registrar_sincronizacao(app):
+    """Sincroniza os trigramas ao fim de cada requisição de escrita"""
+    from flask import request
+
+    @app.after_request
+    def _sincronizar_trigramas(resposta):
+        if request.method in METODOS_ESCRITA:
+            try:
+                sincronizar_pendentes()
+            except Exception as e:
+                # Fica na fila para a próxima escrita ou para o agendador
+                logger.error(f"Erro ao sincronizar trigramas: {e}")
+        return resposta
+
+
+def _frequencia(conn, trigrama):
+    """Número de ativos com o trigrama (limitado a MAX_CANDIDATOS + 1)"""
+    return conn.execute(
+        'SELECT COUNT(*) FROM (SELECT 1 FROM ativos_trigramas WHERE trigrama = ? LIMIT ?)',
+        (trigrama, MAX_CANDIDATOS + 1)).fetchone()[0]
+
+
+def _mais_raros(conn, consulta, similaridade_minima):
+    """
+    Trigramas da consulta suficientes para encontrar todos os candidatos
+
+    Um ativo com pelo menos ceil(s * q) dos q trigramas da consulta possui
+    obrigatoriamente um dos (q - ceil(s * q) + 1) trigramas mais raros,
+    então os demais (os mais comuns) não precisam ser percorridos.
+    """
+    if not consulta:
+        return []
+    necessarios = len(consulta) - math.ceil(similaridade_minima * len(consulta)) + 1
+    return sorted(consulta, key=lambda t: _frequencia(conn, t))[:max(necessarios, 1)]
+
+
+def buscar(conn, texto, limite=50, similaridade_minima=SIMILARIDADE_MINIMA):
+    """
+    Ativos parecidos com o texto, do mais para o menos similar
+
+    A similaridade de um ativo é a fração dos trigramas da busca que ele
+    possui (no nome ou nos seriais); empates são decididos pela proporção
+    em relação ao total de trigramas do ativo, favorecendo textos curtos.
+
+    Returns:
+        Lista de tuplas (ativo_id, similaridade)
+    """
+    consulta_nome, consulta_serial = _trigramas_consulta(texto)
+    todos = list(consulta_nome | consulta_serial)
+    if not todos:
+        return []
+
+    # 1. Candidatos: ativos com algum dos trigramas mais raros; acima de
+    #    MAX_CANDIDATOS ficam os que têm mais deles, não os primeiros do índice
+    raros = (_mais_raros(conn, consulta_nome, similaridade_minima)
+             + _mais_raros(conn, consulta_serial, similaridade_minima))
+    candidatos = [linha[0] for linha in conn.execute(f'''
+        SELECT ativo_id FROM ativos_trigramas
+        WHERE trigrama IN ({','.join('?' * len(raros))})
+        GROUP BY ativo_id
+        ORDER BY COUNT(*) DESC, ativo_id
+        LIMIT ?
+    ''', raros + [MAX_CANDIDATOS])]
+    if not candidatos:
+        return []
+
+    # 2. Pontuação dos candidatos com todos os trigramas da busca
+    linhas = conn.execute(f'''
+        SELECT t.ativo_id,
+               SUM(substr(t.trigrama, 1, 1) = 'n'),
+               SUM(substr(t.trigrama, 1, 1) = 's'),
+               d.total_nome, d.total_serial
+        FROM ativos_trigramas t
+        JOIN ativos_trigramas_docs d ON d.ativo_id = t.ativo_id
+        WHERE t.trigrama IN ({','.join('?' * len(todos))})
+          AND t.ativo_id IN ({','.join('?' * len(candidatos))})
+        GROUP BY t.ativo_id
+    ''', todos + candidatos).fetchall()
+    resultados = []
+    for ativo_id, comuns_nome, comuns_serial, total_nome, total_serial in linhas:
+        pontuados = []
+        if consulta_nome:
+            pontuados.append((comuns_nome / len(consulta_nome),
+                              comuns_nome / (len(consulta_nome) + total_nome - comuns_nome)))
+        if consulta_serial:
+            pontuados.append((comuns_serial / len(consulta_serial),
+                              comuns_serial / (len(consulta_serial) + total_serial - comuns_serial)))
+        cobertura, jaccard = max(pontuados)
+        if cobertura >= similaridade_minima:
+            resultados.append((cobertura, jaccard, ativo_id))
+
+    resultados.sort(reverse=True)
+    return [(ativo_id, round(cobertura, 3)) for cobertura, _, ativo_id in resultados[:limite]]
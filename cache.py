@@ -0,0 +1,190 @@
+"""
+Cache em memória por processo, seguro entre workers
+Entradas expiram por tempo (TTL), são descartadas por LRU e ficam inválidas
+assim que outro processo grava em uma das tabelas de que dependem.
+Cálculos simultâneos da mesma entrada são feitos uma única vez (single-flight)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import db
+import versao_dados
+
+# Tempo máximo que uma requisição espera pelo cálculo de outra (segundos);
+# depois disso calcula por conta própria
+ESPERA_MAXIMA = 120
+
+
+class _Calculo:
+    """Cálculo em andamento compartilhado pelas threads que pediram a mesma entrada"""
+
+    def __init__(self):
+        self._pronto = threading.Event()
+        self.valor = None
+        self.erro = None
+
+    def concluir(self, valor=None, erro=None):
+        self.valor = valor
+        self.erro = erro
+        self._pronto.set()
+
+    def aguardar(self, timeout):
+        """True se o cálculo terminou dentro do prazo"""
+        return self._pronto.wait(timeout)
+
+
+class Cache:
+    """
+    Cache LRU com TTL e dependência de tabelas
+
+    Cada entrada guarda as versões (versao_dados) das tabelas de que
+    depende no momento em que foi calculada. A cada leitura, o cache
+    consulta 'PRAGMA data_version' na conexão da thread: o valor só muda
+    quando outra conexão (de qualquer processo) faz commit, e só então a
+    tabela versao_dados é relida. Sem escritas, uma leitura do cache
+    custa um PRAGMA e uma comparação de inteiros.
+
+    Se várias threads pedem a mesma entrada ausente ao mesmo tempo (ex: o
+    dashboard aberto por toda a equipe às 9h), apenas a primeira executa o
+    cálculo; as demais esperam e recebem o mesmo resultado. O cálculo em
+    andamento é identificado pela chave e pelas versões das tabelas, então
+    uma requisição que já enxerga dados mais novos não reaproveita um
+    cálculo iniciado antes da escrita.
+    """
+
+    def __init__(self, max_itens=512, ttl=300):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()  # chave -> (valor, expira_em, {tabela: versao})
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._versoes = {}
+        self._em_andamento = {}  # (chave, versões) -> _Calculo
+        self.acertos = 0
+        self.faltas = 0
+        self.compartilhados = 0
+
+    def versoes_atuais(self):
+        """Versões das tabelas, relidas apenas se outra conexão fez commit"""
+        conn = db.conexao_persistente()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+
+        # data_version é por conexão: compara apenas com a mesma conexão
+        if getattr(self._local, 'conexao', None) is not conn or self._local.data_version != data_version:
+            versoes = versao_dados.obter_versoes(conn)
+            self._local.conexao = conn
+            self._local.data_version = data_version
+            with self._lock:
+                if versoes != self._versoes:
+                    self._versoes = versoes
+                    self._descartar_invalidas()
+        return self._versoes
+
+    def _descartar_invalidas(self):
+        """Remove entradas cujas tabelas mudaram (chamado com o lock)"""
+        for chave in [c for c, (_, _, dep) in self._itens.items() if not self._valida(dep)]:
+            del self._itens[chave]
+
+    def _valida(self, dependencias):
+        return all(self._versoes.get(t) == v for t, v in dependencias.items())
+
+    def obter(self, chave, tabelas, calcular, ttl=None):
+        """
+        Retorna o valor em cache ou calcula e armazena
+
+        Args:
+            chave: Chave da entrada (hashable)
+            tabelas: Tabelas das quais o valor depende
+            calcular: Função sem argumentos que produz o valor
+            ttl: Validade em segundos (padrão: self.ttl)
+        """
+        versoes = self.versoes_atuais()
+        agora = time.monotonic()
+
+        # Versões lidas antes do cálculo: uma escrita concorrente invalida o resultado
+        dependencias = {t: versoes.get(t) for t in tabelas}
+        voo = (chave, tuple(sorted(dependencias.items())))
+
+        with self._lock:
+            item = self._itens.get(chave)
+            if item and item[1] > agora and self._valida(item[2]):
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return item[0]
+
+            calculo = self._em_andamento.get(voo)
+            if calculo is None:
+                self.faltas += 1
+                calculo = self._em_andamento[voo] = _Calculo()
+                lider = True
+            else:
+                self.compartilhados += 1
+                lider = False
+
+        if not lider:
+            if calculo.aguardar(ESPERA_MAXIMA):
+                if calculo.erro is not None:
+                    raise calculo.erro
+                return calculo.valor
+            return calcular()
+
+        try:
+            valor = calcular()
+        except BaseException as e:
+            with self._lock:
+                self._em_andamento.pop(voo, None)
+            calculo.concluir(erro=e)
+            raise
+
+        # Entrada gravada e cálculo encerrado juntos: ninguém recalcula no intervalo
+        with self._lock:
+            self._itens[chave] = (valor, agora + (ttl or self.ttl), dependencias)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+            self._em_andamento.pop(voo, None)
+        calculo.concluir(valor)
+
+        return valor
+
+    def invalidar(self, *tabelas):
+        """Remove as entradas que dependem das tabelas (todas, se nenhuma for informada)"""
+        with self._lock:
+            if not tabelas:
+                self._itens.clear()
+                return
+            for chave in [c for c, (_, _, dep) in self._itens.items() if set(dep) & set(tabelas)]:
+                del self._itens[chave]
+
+    def estatisticas(self):
+        """Contadores de uso do cache"""
+        with self._lock:
+            return {'itens': len(self._itens), 'acertos': self.acertos, 'faltas': self.faltas,
+                    'compartilhados': self.compartilhados, 'em_andamento': len(self._em_andamento)}
+
+
+# Cache padrão do processo
+cache = Cache()
+
+
+def em_cache(tabelas, ttl=None):
+    """
+    Decorador: guarda o resultado da função no cache padrão
+
+    A chave é o nome da função e seus argumentos (que devem ser hashable).
+
+    Exemplo:
+        @em_cache(('categorias',))
+        def listar_categorias():
+            ...
+    """
+    def decorador(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            chave = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            return cache.obter(chave, tabelas, lambda: func(*args, **kwargs), ttl)
+        return wrapper
+    return decorador
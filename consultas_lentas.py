@@ -0,0 +1,162 @@
+"""
+Log de consultas lentas com plano de execução (opcional)
+
+Ativado por CONSULTAS_LENTAS_MS: cada comando SQL que passar do limite é
+gravado em CONSULTAS_LENTAS_ARQUIVO (uma linha JSON por comando, com
+rotação) junto com o formato dos parâmetros, o EXPLAIN QUERY PLAN e a
+rota ou thread que o executou. A escrita passa pela fila do
+log_estruturado, fora da thread da requisição.
+
+O tempo medido é o de execute(): preparação e primeiro passo do comando,
+o que inclui ordenações, agrupamentos e agregações; as linhas lidas depois
+com fetch não entram na conta.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import db
+import log_estruturado
+
+# Limite em milissegundos (0 ou vazio desativa)
+LIMIAR_MS = float(os.getenv('CONSULTAS_LENTAS_MS') or 0)
+ARQUIVO = os.getenv('CONSULTAS_LENTAS_ARQUIVO', 'logs/consultas_lentas.log')
+
+# Comandos para os quais o plano de execução é capturado
+COMANDOS_COM_PLANO = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+logger = logging.getLogger('consultas_lentas')
+
+
+def _formato(valor):
+    if valor is None:
+        return 'null'
+    if isinstance(valor, (str, bytes)):
+        return f'{type(valor).__name__}({len(valor)})'
+    return type(valor).__name__
+
+
+def formato_parametros(parametros):
+    """Tipos (e tamanhos) dos parâmetros, sem os valores"""
+    if parametros is None:
+        return None
+    if isinstance(parametros, dict):
+        return {chave: _formato(valor) for chave, valor in parametros.items()}
+    return [_formato(valor) for valor in parametros]
+
+
+def plano_execucao(conn, sql, parametros=()):
+    """
+    EXPLAIN QUERY PLAN do comando, como lista de linhas indentadas
+
+    Usa um cursor sqlite3 comum, então o EXPLAIN não passa pelos monitores.
+    """
+    partes = sql.lstrip().split(None, 1)
+    if not partes or partes[0].upper() not in COMANDOS_COM_PLANO:
+        return None
+
+    try:
+        linhas = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, parametros or ()).fetchall()
+    except sqlite3.Error as e:
+        return [f'(plano indisponível: {e})']
+
+    niveis = {0: -1}
+    plano = []
+    for id_no, pai, _, detalhe in linhas:
+        niveis[id_no] = niveis.get(pai, -1) + 1
+        plano.append('  ' * niveis[id_no] + detalhe)
+    return plano
+
+
+def _origem():
+    """Rota da requisição atual ou nome da thread (agendador, scripts)"""
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            return f'{request.method} {request.endpoint or request.path}'
+    except ImportError:
+        pass
+    return f'thread {threading.current_thread().name}'
+
+
+def _verificar(sql, duracao, erro=None, cursor=None, parametros=None, **contexto):
+    if sql is None or duracao * 1000 < LIMIAR_MS:
+        return
+
+    registro = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ms': round(duracao * 1000, 1),
+        'origem': _origem(),
+        'sql': ' '.join(sql.split()),
+        'parametros': formato_parametros(parametros),
+        'plano': plano_execucao(cursor.connection, sql, parametros) if cursor is not None else None,
+    }
+    if erro is not None:
+        registro['erro'] = str(erro)
+    logger.warning(json.dumps(registro, ensure_ascii=False))
+
+
+def ativar():
+    """
+    Começa a registrar as consultas lentas se CONSULTAS_LENTAS_MS estiver definido
+
+    Returns:
+        True se o log foi ativado
+    """
+    if LIMIAR_MS <= 0:
+        return False
+
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(ARQUIVO) or '.', exist_ok=True)
+        handler = RotatingFileHandler(ARQUIVO, maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.setLevel(logging.WARNING)
+        log_estruturado.arquivo_proprio(logger, handler)
+
+    db.adicionar_monitor(_verificar)
+    return True
+
+
+def ler_registros(limite=500):
+    """Registros mais recentes do log (de todos os processos), do mais novo ao mais antigo"""
+    registros = []
+    for arquivo in (ARQUIVO, f'{ARQUIVO}.1'):
+        if not os.path.exists(arquivo):
+            continue
+        with open(arquivo, encoding='utf-8') as f:
+            linhas = f.readlines()
+        for linha in reversed(linhas):
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                continue
+            if len(registros) >= limite:
+                return registros
+    return registros
+
+
+def agrupar(registros):
+    """Agrupa os registros pelo texto do comando, do maior tempo total ao menor"""
+    grupos = defaultdict(list)
+    for registro in registros:
+        grupos[registro['sql']].append(registro)
+
+    resumo = []
+    for sql, itens in grupos.items():
+        tempos = [item['ms'] for item in itens]
+        resumo.append({
+            'sql': sql,
+            'ocorrencias': len(itens),
+            'total_ms': sum(tempos),
+            'maximo_ms': max(tempos),
+            'media_ms': sum(tempos) / len(tempos),
+            'origens': sorted({item['origem'] for item in itens}),
+            'ultimo': itens[0],
+        })
+    return sorted(resumo, key=lambda grupo: grupo['total_ms'], reverse=True)
@@ -0,0 +1,136 @@
+"""
+Conexões com o banco de dados SQLite
+Centraliza os parâmetros usados por todos os processos (web, agendador, scripts)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+DB = "ativos.db"
+
+# Tempo máximo de espera por um lock de escrita de outro processo (segundos)
+DB_TIMEOUT = float(os.getenv('DB_TIMEOUT', '15'))
+
+_local = threading.local()
+_pid = os.getpid()
+
+# Funções chamadas a cada comando executado (ver adicionar_monitor)
+_monitores = []
+
+
+class _CursorMonitorado(sqlite3.Cursor):
+    """Cursor que informa cada comando e seu tempo ao monitor"""
+
+    def execute(self, sql, parameters=()):
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            return super().execute(sql, parameters)
+        except sqlite3.Error as e:
+            erro = e
+            raise
+        finally:
+            _notificar(sql, time.perf_counter() - inicio, erro, cursor=self, parametros=parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as e:
+            erro = e
+            raise
+        finally:
+            _notificar(sql, time.perf_counter() - inicio, erro, cursor=self)
+
+
+class _ConexaoMonitorada(sqlite3.Connection):
+    """Conexão cujos comandos passam sempre por _CursorMonitorado"""
+
+    def cursor(self, factory=_CursorMonitorado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _notificar(sql, duracao, erro=None, **contexto):
+    for monitor in _monitores:
+        monitor(sql, duracao, erro, **contexto)
+
+
+def adicionar_monitor(func):
+    """
+    Registra func(sql, duracao, erro, **contexto) para cada comando SQL
+
+    'erro' é a exceção sqlite3 do comando (ou None) e 'sql' é None para a
+    abertura da conexão. 'contexto' traz o cursor usado e, em execute(),
+    os parâmetros. Vale para as conexões abertas depois da chamada; sem
+    monitores, conectar() devolve conexões sqlite3 comuns, sem custo
+    adicional.
+    """
+    if func not in _monitores:
+        _monitores.append(func)
+
+
+def conectar(caminho=None):
+    """
+    Abre uma conexão com o banco
+
+    Use como sqlite3.connect: 'with conectar() as conn:' faz commit ao
+    final do bloco (ou rollback em caso de erro). Caminhos 'file:...' são
+    tratados como URI (ex: banco em memória compartilhado nos benchmarks).
+    """
+    caminho = caminho or DB
+    uri = caminho.startswith('file:')
+    if not _monitores:
+        return sqlite3.connect(caminho, timeout=DB_TIMEOUT, uri=uri)
+
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(caminho, timeout=DB_TIMEOUT, uri=uri, factory=_ConexaoMonitorada)
+    _notificar(None, time.perf_counter() - inicio)
+    return conn
+
+
+def conexao_persistente():
+    """
+    Conexão reutilizada pela thread atual
+
+    Indicada para consultas curtas e frequentes (ex: carregar o usuário
+    a cada requisição). Após um fork, o processo filho abre as suas
+    próprias conexões em vez de usar as herdadas do pai.
+    """
+    if os.getpid() != _pid:
+        reabrir_conexoes()
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = conectar()
+    return conn
+
+
+def reabrir_conexoes():
+    """
+    Descarta as conexões persistentes herdadas do processo pai
+
+    Conexões SQLite não podem ser usadas nos dois lados de um fork; as
+    próximas chamadas a conexao_persistente() abrem conexões novas.
+    """
+    global _local, _pid
+    _local = threading.local()
+    _pid = os.getpid()
+
+
+def configurar_banco(conn):
+    """
+    Ativa o modo WAL (persistente no arquivo do banco)
+
+    Com WAL, leituras não bloqueiam a escrita de outro worker e vice-versa.
+    """
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
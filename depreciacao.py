@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Depreciação e valor contábil dos ativos
+Calcula o valor contábil de todos os ativos de uma vez com pandas/NumPy
+(linear ou saldo decrescente, com vida útil e valor residual por
+categoria) e guarda um fechamento mensal agregado por categoria e
+localização. pandas e NumPy só são importados nos cálculos, para que o
+init_db e o agendador não os carreguem na inicialização
+
+Uso:
+  python depreciacao.py                       # Fecha o mês anterior
+  python depreciacao.py --competencia 2025-06 # Fecha (ou refaz) um mês específico
+"""
+
+import argparse
+import calendar
+import sqlite3
+from datetime import date, datetime
+
+import cache
+import db
+
+# Valores aceitos em categorias.metodo_depreciacao
+METODOS = ('linear', 'saldo_decrescente')
+
+# Usados quando a categoria não define os seus (ou o ativo não tem categoria)
+METODO_PADRAO = 'linear'
+VIDA_UTIL_PADRAO = 5
+
+# Saldo decrescente duplo: taxa mensal = FATOR / vida útil em meses; passa a
+# linear sobre o restante da vida útil quando a quota linear fica maior
+FATOR_SALDO_DECRESCENTE = 2.0
+
+# Vida útil (anos) inicial das categorias padrão
+VIDA_UTIL_CATEGORIAS = {
+    'Hardware': 4,
+    'Móveis': 10,
+    'Periféricos': 4,
+    'Impressoras': 5,
+    'Telefonia': 4,
+    'Rede': 5,
+    'Áudio/Vídeo': 5,
+    'Outros': 5,
+}
+
+# Colunas de valores dos fechamentos
+VALORES = ('quantidade', 'valor_aquisicao', 'depreciacao_acumulada', 'depreciacao_mes', 'valor_contabil')
+
+
+def criar_tabelas(conn):
+    """
+    Adiciona a configuração de depreciação às categorias e cria a tabela
+    de fechamentos mensais
+
+    valor_residual é a fração do custo que resta ao fim da vida útil (0 a 1).
+    """
+    for campo, tipo in [('metodo_depreciacao', f"TEXT DEFAULT '{METODO_PADRAO}'"),
+                        ('vida_util_anos', 'REAL'),
+                        ('valor_residual', 'REAL DEFAULT 0')]:
+        try:
+            conn.execute(f'ALTER TABLE categorias ADD COLUMN {campo} {tipo}')
+        except sqlite3.OperationalError as e:
+            if 'duplicate column name' not in str(e):
+                raise
+
+    for nome, anos in VIDA_UTIL_CATEGORIAS.items():
+        conn.execute('UPDATE categorias SET vida_util_anos = ? WHERE nome = ? AND vida_util_anos IS NULL',
+                     (anos, nome))
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS depreciacao_mensal (
+            competencia TEXT NOT NULL,
+            categoria_id INTEGER,
+            localizacao TEXT,
+            quantidade INTEGER NOT NULL,
+            valor_aquisicao REAL NOT NULL,
+            depreciacao_acumulada REAL NOT NULL,
+            depreciacao_mes REAL NOT NULL,
+            valor_contabil REAL NOT NULL,
+            calculado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_depreciacao_mensal_competencia ON depreciacao_mensal(competencia)')
+
+
+def _mes_da_troca(vida, fracao_residual):
+    """
+    Primeiro mês em que a quota linear sobre o restante da vida útil
+    alcança a do saldo decrescente
+
+    Com saldo S = custo × q^m, a troca ocorre quando
+    (S - residual) / (vida - m) >= taxa × S, o que não depende do custo:
+    basta calcular uma vez por par (vida, fração residual).
+    """
+    taxa = min(FATOR_SALDO_DECRESCENTE / vida, 1.0)
+    fator, mes = 1.0, 0
+    while mes < vida:
+        if fator <= fracao_residual or fator * (1 - taxa * (vida - mes)) >= fracao_residual:
+            return mes
+        fator *= 1 - taxa
+        mes += 1
+    return vida
+
+
+def _valor_contabil(custo, fracao_residual, vida, metodo, meses):
+    """Valor contábil após 'meses' meses de uso (arrays NumPy)"""
+    import numpy as np
+
+    residual = custo * fracao_residual
+    decorridos = np.clip(meses, 0, vida)
+    linear = custo - (custo - residual) * decorridos / vida
+
+    # Saldo decrescente até o mês da troca, linear do saldo até o residual depois dele
+    pares = np.stack([vida, fracao_residual], axis=1)
+    unicos, indices = np.unique(pares, axis=0, return_inverse=True)
+    troca = np.array([_mes_da_troca(v, f) for v, f in unicos])[indices.reshape(-1)]
+
+    taxa = np.minimum(FATOR_SALDO_DECRESCENTE / vida, 1.0)
+    saldo = np.maximum(custo * (1 - taxa) ** np.minimum(decorridos, troca), residual)
+    restante = np.maximum(vida - troca, 1)
+    apos_troca = saldo - (saldo - residual) * np.clip(decorridos - troca, 0, None) / restante
+    decrescente = np.where(decorridos > troca, apos_troca, saldo)
+
+    return np.where(metodo == 'saldo_decrescente', decrescente, linear)
+
+
+def calcular(conn, referencia=None):
+    """
+    Valor contábil de cada ativo na data de referência
+
+    A depreciação começa no mês seguinte ao da aquisição e é contada em
+    meses inteiros. Ativos sem valor ou data de aquisição, ou adquiridos
+    depois da referência, ficam de fora.
+
+    Returns:
+        DataFrame com id, categoria_id, localizacao, valor_aquisicao,
+        depreciacao_acumulada, depreciacao_mes e valor_contabil
+
+    Raises:
+        ValueError: se alguma categoria tiver um método fora de METODOS
+    """
+    import numpy as np
+    import pandas as pd
+
+    invalidos = conn.execute(f'''
+        SELECT nome, metodo_depreciacao FROM categorias
+        WHERE metodo_depreciacao IS NOT NULL AND metodo_depreciacao NOT IN ({','.join('?' * len(METODOS))})
+    ''', METODOS).fetchall()
+    if invalidos:
+        raise ValueError('Método de depreciação inválido: ' +
+                         ', '.join(f'{metodo} (categoria {nome})' for nome, metodo in invalidos))
+
+    referencia = referencia or date.today()
+    ativos = pd.read_sql_query('''
+        SELECT a.id, a.categoria_id, a.localizacao, a.valor_aquisicao, a.data_aquisicao,
+               c.metodo_depreciacao, c.vida_util_anos, c.valor_residual
+        FROM ativos a
+        LEFT JOIN categorias c ON c.id = a.categoria_id
+        WHERE a.valor_aquisicao > 0 AND a.data_aquisicao IS NOT NULL
+    ''', conn)
+
+    aquisicao = pd.to_datetime(ativos['data_aquisicao'].str[:10], format='%Y-%m-%d', errors='coerce')
+    meses = (referencia.year * 12 + referencia.month) - (aquisicao.dt.year * 12 + aquisicao.dt.month)
+    validos = (meses >= 0).to_numpy()
+    ativos = ativos[validos]
+    meses = meses[validos].to_numpy(dtype=np.float64)
+
+    custo = ativos['valor_aquisicao'].to_numpy(dtype=np.float64)
+    fracao_residual = ativos['valor_residual'].fillna(0).clip(0, 1).to_numpy(dtype=np.float64)
+    vida = np.maximum(ativos['vida_util_anos'].fillna(VIDA_UTIL_PADRAO).to_numpy(dtype=np.float64) * 12, 1)
+    metodo = ativos['metodo_depreciacao'].fillna(METODO_PADRAO).to_numpy()
+
+    valor_contabil = _valor_contabil(custo, fracao_residual, vida, metodo, meses)
+    valor_mes_anterior = _valor_contabil(custo, fracao_residual, vida, metodo, meses - 1)
+
+    return pd.DataFrame({
+        'id': ativos['id'].to_numpy(),
+        'categoria_id': ativos['categoria_id'].to_numpy(),
+        'localizacao': ativos['localizacao'].to_numpy(),
+        'valor_aquisicao': custo,
+        'depreciacao_acumulada': custo - valor_contabil,
+        'depreciacao_mes': valor_mes_anterior - valor_contabil,
+        'valor_contabil': valor_contabil,
+    })
+
+
+def _agregar(valores):
+    """Soma por (categoria_id, localizacao) no formato dos fechamentos"""
+    return (valores.assign(quantidade=1)
+            .groupby(['categoria_id', 'localizacao'], dropna=False, as_index=False)[list(VALORES)]
+            .sum())
+
+
+def _fim_do_mes(competencia):
+    """Último dia do mês 'AAAA-MM' (ValueError se o formato for inválido)"""
+    try:
+        inicio = datetime.strptime(competencia, '%Y-%m')
+    except ValueError:
+        raise ValueError(f'Competência inválida (use AAAA-MM): {competencia}')
+    return date(inicio.year, inicio.month, calendar.monthrange(inicio.year, inicio.month)[1])
+
+
+def competencia_anterior(hoje=None):
+    """'AAAA-MM' do mês anterior a hoje"""
+    hoje = hoje or date.today()
+    return f'{hoje.year - 1}-12' if hoje.month == 1 else f'{hoje.year}-{hoje.month - 1:02d}'
+
+
+def fechar_mes(competencia=None):
+    """
+    Grava o fechamento do mês (substitui um fechamento anterior do mesmo mês)
+
+    Args:
+        competencia: 'AAAA-MM' (padrão: mês anterior)
+
+    Returns:
+        Número de linhas (categoria × localização) gravadas
+    """
+    import pandas as pd
+
+    competencia = competencia or competencia_anterior()
+    with db.conectar() as conn:
+        agregado = _agregar(calcular(conn, _fim_do_mes(competencia)))
+        conn.execute('DELETE FROM depreciacao_mensal WHERE competencia = ?', (competencia,))
+        conn.executemany(f'''
+            INSERT INTO depreciacao_mensal (competencia, categoria_id, localizacao, {', '.join(VALORES)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (competencia, None if pd.isna(linha.categoria_id) else int(linha.categoria_id),
+             None if pd.isna(linha.localizacao) else linha.localizacao,
+             int(linha.quantidade), *(round(float(getattr(linha, v)), 2) for v in VALORES[1:]))
+            for linha in agregado.itertuples(index=False)
+        ])
+    return len(agregado)
+
+
+def competencias():
+    """Meses com fechamento gravado, do mais recente ao mais antigo"""
+    with db.conectar() as conn:
+        return [linha[0] for linha in conn.execute(
+            'SELECT DISTINCT competencia FROM depreciacao_mensal ORDER BY competencia DESC')]
+
+
+def _atual():
+    with db.conectar() as conn:
+        return _agregar(calcular(conn))
+
+
+def totais(por='categoria', competencia=None):
+    """
+    Totais de valor contábil agrupados por categoria ou localização
+
+    Args:
+        por: 'categoria' ou 'localizacao'
+        competencia: 'AAAA-MM' de um fechamento gravado, ou None para a
+            posição de hoje (calculada uma vez por dia e versão dos dados)
+
+    Returns:
+        dict com 'grupos' (lista de dicts, maior valor contábil primeiro)
+        e 'total'; None se não houver fechamento da competência
+    """
+    import pandas as pd
+
+    if por not in ('categoria', 'localizacao'):
+        raise ValueError(f'Agrupamento inválido: {por}')
+
+    if competencia:
+        referencia = _fim_do_mes(competencia)
+        with db.conectar() as conn:
+            agregado = pd.read_sql_query(
+                f"SELECT categoria_id, localizacao, {', '.join(VALORES)} FROM depreciacao_mensal WHERE competencia = ?",
+                conn, params=(competencia,))
+        if agregado.empty:
+            return None
+    else:
+        referencia = date.today()
+        agregado = cache.cache.obter(('depreciacao', referencia.isoformat()), ('ativos', 'categorias'), _atual)
+
+    coluna = 'categoria_id' if por == 'categoria' else 'localizacao'
+    grupos = (agregado.groupby(coluna, dropna=False, as_index=False)[list(VALORES)].sum()
+              .sort_values('valor_contabil', ascending=False))
+
+    if por == 'categoria':
+        with db.conectar() as conn:
+            nomes = dict(conn.execute('SELECT id, nome FROM categorias').fetchall())
+        rotulos = [nomes.get(int(c), f'Categoria {int(c)}') if pd.notna(c) else 'Sem categoria'
+                   for c in grupos[coluna]]
+    else:
+        rotulos = [local if pd.notna(local) else 'Sem localização' for local in grupos[coluna]]
+
+    def _linha(valores):
+        return {'quantidade': int(valores['quantidade']),
+                **{v: round(float(valores[v]), 2) for v in VALORES[1:]}}
+
+    return {
+        'competencia': competencia,
+        'referencia': referencia.isoformat(),
+        'por': por,
+        'grupos': [dict(grupo=rotulo, **_linha(valores))
+                   for rotulo, (_, valores) in zip(rotulos, grupos.iterrows())],
+        'total': _linha(grupos[list(VALORES)].sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fechamento mensal da depreciação dos ativos')
+    parser.add_argument('--competencia', help='Mês no formato AAAA-MM (padrão: mês anterior)')
+    args = parser.parse_args()
+
+    competencia = args.competencia or competencia_anterior()
+    linhas = fechar_mes(competencia)
+    resumo = totais('categoria', competencia) or {'grupos': [], 'total': {}}
+
+    print(f"📉 Fechamento de depreciação {competencia}: {linhas} linha(s) gravada(s)")
+    for grupo in resumo['grupos']:
+        print(f"   {grupo['grupo']:<20} {grupo['quantidade']:>7} ativos  "
+              f"contábil {grupo['valor_contabil']:>16,.2f}  mês {grupo['depreciacao_mes']:>14,.2f}")
+    if resumo['total']:
+        print(f"   {'TOTAL':<20} {resumo['total']['quantidade']:>7} ativos  "
+              f"contábil {resumo['total']['valor_contabil']:>16,.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Perfil de desempenho por requisição
+Mede tempo total, comandos SQL, renderização de templates, envio de
+email e geração de QR Code; publica no cabeçalho Server-Timing, registra
+requisições lentas e mantém percentis por rota
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import db
+
+# Requisições acima deste tempo vão para o log com as suas consultas
+LIMIAR_LENTO_MS = float(os.getenv('DESEMPENHO_LENTO_MS', '500'))
+
+# Amostras mantidas por rota para os percentis (janela móvel)
+AMOSTRAS_POR_ROTA = int(os.getenv('DESEMPENHO_AMOSTRAS', '500'))
+
+# Comandos SQL guardados por requisição (para o log de lentas)
+MAX_SQL_POR_REQUISICAO = 200
+
+
+class Medicao:
+    """Tempos acumulados durante uma requisição"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.sql_total = 0
+        self.sql_tempo = 0.0
+        self.consultas = []
+        self.tempos = defaultdict(float)
+        self.templates = []
+
+
+_atual = ContextVar('desempenho_medicao', default=None)
+
+
+def _registrar_sql(sql, duracao, erro=None, **contexto):
+    medicao = _atual.get()
+    if medicao is None or sql is None:
+        return
+    medicao.sql_total += 1
+    medicao.sql_tempo += duracao
+    if len(medicao.consultas) < MAX_SQL_POR_REQUISICAO:
+        medicao.consultas.append((' '.join(sql.split()), duracao))
+
+
+@contextmanager
+def medir(categoria):
+    """
+    Soma o tempo do bloco à categoria na requisição atual
+
+    Fora de uma requisição perfilada não faz nada.
+
+    Exemplo:
+        with desempenho.medir('email'):
+            enviar(...)
+    """
+    medicao = _atual.get()
+    if medicao is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.tempos[categoria] += time.perf_counter() - inicio
+
+
+def medido(categoria):
+    """Decorador: mede cada chamada da função na categoria informada"""
+    def decorador(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with medir(categoria):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+class EstatisticasRotas:
+    """Janela móvel de tempos por rota (por processo)"""
+
+    def __init__(self, amostras=AMOSTRAS_POR_ROTA):
+        self._amostras = amostras
+        self._rotas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, rota, total_ms, sql_total, sql_ms):
+        with self._lock:
+            janela = self._rotas.get(rota)
+            if janela is None:
+                janela = self._rotas[rota] = deque(maxlen=self._amostras)
+            janela.append((total_ms, sql_total, sql_ms))
+
+    def resumo(self):
+        """Lista de dicts por rota, da mais lenta (p95) para a mais rápida"""
+        with self._lock:
+            rotas = {rota: list(janela) for rota, janela in self._rotas.items()}
+
+        linhas = []
+        for rota, amostras in rotas.items():
+            tempos = sorted(a[0] for a in amostras)
+            linhas.append({
+                'rota': rota,
+                'amostras': len(amostras),
+                'p50': _percentil(tempos, 50),
+                'p95': _percentil(tempos, 95),
+                'p99': _percentil(tempos, 99),
+                'maximo': tempos[-1],
+                'sql_media': sum(a[1] for a in amostras) / len(amostras),
+                'sql_ms_media': sum(a[2] for a in amostras) / len(amostras),
+            })
+        return sorted(linhas, key=lambda linha: linha['p95'], reverse=True)
+
+    def limpar(self):
+        with self._lock:
+            self._rotas.clear()
+
+
+# Estatísticas do processo
+estatisticas = EstatisticasRotas()
+
+
+def registrar_perfilamento(app):
+    """
+    Ativa o perfil de desempenho em todas as requisições da aplicação
+
+    Deve ser chamada antes dos demais before_request, para que a medição
+    cubra também as respostas 304 e os redirecionamentos de login.
+    """
+    from flask import before_render_template, g, request, template_rendered
+
+    db.adicionar_monitor(_registrar_sql)
+
+    @app.before_request
+    def _iniciar_medicao():
+        g._desempenho_token = _atual.set(Medicao())
+
+    def _antes_template(sender, template, context, **extra):
+        medicao = _atual.get()
+        if medicao is not None:
+            medicao.templates.append(time.perf_counter())
+
+    def _depois_template(sender, template, context, **extra):
+        medicao = _atual.get()
+        if medicao is not None and medicao.templates:
+            medicao.tempos['template'] += time.perf_counter() - medicao.templates.pop()
+
+    # weak=False: as funções locais não têm outra referência
+    before_render_template.connect(_antes_template, app, weak=False)
+    template_rendered.connect(_depois_template, app, weak=False)
+
+    @app.after_request
+    def _finalizar_medicao(resposta):
+        medicao = _atual.get()
+        if medicao is None:
+            return resposta
+
+        total = time.perf_counter() - medicao.inicio
+        metricas = [f'sql;dur={medicao.sql_tempo * 1000:.1f};desc="{medicao.sql_total} consultas"']
+        metricas.extend(f'{categoria};dur={tempo * 1000:.1f}' for categoria, tempo in medicao.tempos.items())
+        metricas.append(f'total;dur={total * 1000:.1f}')
+        resposta.headers['Server-Timing'] = ', '.join(metricas)
+
+        rota = request.endpoint or 'desconhecida'
+        if rota != 'static':
+            estatisticas.registrar(rota, total * 1000, medicao.sql_total, medicao.sql_tempo * 1000)
+
+        if total * 1000 >= LIMIAR_LENTO_MS:
+            consultas = '\n'.join(f'    {duracao * 1000:8.1f} ms  {sql[:300]}'
+                                  for sql, duracao in medicao.consultas)
+            app.logger.warning(
+                f"Requisição lenta: {request.method} {request.full_path.rstrip('?')} "
+                f'{total * 1000:.0f} ms ({medicao.sql_total} consultas, '
+                f'{medicao.sql_tempo * 1000:.0f} ms em SQL)\n{consultas}'
+            )
+        return resposta
+
+    @app.teardown_request
+    def _encerrar_medicao(exc):
+        token = g.pop('_desempenho_token', None)
+        if token is not None:
+            _atual.reset(token)
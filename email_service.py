@@ -3,14 +3,20 @@ Serviço de Email para Sistema de Gestão de Ativos
 Envia alertas sobre garantias, manutenções e outros eventos
 """
 
-import sqlite3
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
+import logging
 import os
 
-DB = "ativos.db"
+import db
+import desempenho
+import metricas
+
+DB = db.DB
+
+logger = logging.getLogger(__name__)
 
 # Configurações de email (podem ser sobrescritas por variáveis de ambiente)
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -36,6 +42,7 @@ def get_configuracao_email():
     }
 
 
+@desempenho.medido('email')
 def enviar_email(destinatarios, assunto, corpo_html, corpo_texto=None):
     """
     Envia email usando configurações SMTP
@@ -50,11 +57,13 @@ def enviar_email(destinatarios, assunto, corpo_html, corpo_texto=None):
         True se enviado com sucesso, False caso contrário
     """
     if not ALERTAS_HABILITADOS:
-        print("⚠ Alertas por email desabilitados")
+        logger.warning("Alertas por email desabilitados")
+        metricas.EMAILS.labels('desabilitado').inc()
         return False
 
     if not SMTP_USER or not SMTP_PASSWORD:
-        print("⚠ Credenciais SMTP não configuradas")
+        logger.warning("Credenciais SMTP não configuradas")
+        metricas.EMAILS.labels('sem_configuracao').inc()
         return False
 
     # Garantir que destinatarios seja uma lista
@@ -65,7 +74,8 @@ def enviar_email(destinatarios, assunto, corpo_html, corpo_texto=None):
     destinatarios = [d.strip() for d in destinatarios if d.strip()]
 
     if not destinatarios:
-        print("⚠ Nenhum destinatário válido")
+        logger.warning("Nenhum destinatário válido")
+        metricas.EMAILS.labels('sem_destinatario').inc()
         return False
 
     try:
@@ -85,16 +95,20 @@ def enviar_email(destinatarios, assunto, corpo_html, corpo_texto=None):
         msg.attach(part2)
 
         # Conectar ao servidor SMTP
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.send_message(msg)
-
-        print(f"✓ Email enviado para: {', '.join(destinatarios)}")
+        with metricas.EMAIL_DURACAO.time():
+            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+                server.starttls()
+                server.login(SMTP_USER, SMTP_PASSWORD)
+                server.send_message(msg)
+
+        logger.info(f"Email enviado para: {', '.join(destinatarios)}",
+                    extra={'assunto': assunto, 'destinatarios': len(destinatarios)})
+        metricas.EMAILS.labels('enviado').inc()
         return True
 
     except Exception as e:
-        print(f"✗ Erro ao enviar email: {str(e)}")
+        logger.error(f"Erro ao enviar email: {str(e)}", extra={'assunto': assunto})
+        metricas.EMAILS.labels('falha').inc()
         return False
 
 
@@ -224,7 +238,7 @@ def verificar_garantias_vencendo(dias=30):
     Returns:
         Lista de ativos com garantia vencendo
     """
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
 
         ativos = cursor.execute('''
@@ -251,7 +265,7 @@ def verificar_manutencoes_proximas(dias=7):
     Returns:
         Lista de manutenções agendadas
     """
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
 
         manutencoes = cursor.execute('''
@@ -263,6 +277,8 @@ def verificar_manutencoes_proximas(dias=7):
             WHERE m.proximo_agendamento IS NOT NULL
               AND m.proximo_agendamento >= date('now')
               AND m.proximo_agendamento <= date('now', '+' || ? || ' days')
+              -- Manutenções de planos são avisadas pela fila de ocorrências
+              AND NOT EXISTS (SELECT 1 FROM manutencoes_fila f WHERE f.manutencao_id = m.id)
             ORDER BY m.proximo_agendamento ASC
         ''', (dias,)).fetchall()
 
@@ -274,7 +290,7 @@ def enviar_alerta_garantias(destinatarios=None):
     ativos = verificar_garantias_vencendo(30)
 
     if not ativos:
-        print("✓ Nenhuma garantia vencendo nos próximos 30 dias")
+        logger.info("Nenhuma garantia vencendo nos próximos 30 dias")
         return False
 
     if destinatarios is None:
@@ -291,7 +307,7 @@ def enviar_alerta_manutencoes(destinatarios=None):
     manutencoes = verificar_manutencoes_proximas(7)
 
     if not manutencoes:
-        print("✓ Nenhuma manutenção agendada para os próximos 7 dias")
+        logger.info("Nenhuma manutenção agendada para os próximos 7 dias")
         return False
 
     if destinatarios is None:
@@ -355,27 +371,27 @@ def executar_verificacao_alertas():
     """
     Executa verificação de todos os alertas e envia emails necessários
     Deve ser chamado periodicamente (ex: via cron job ou scheduler)
+
+    Envia apenas os itens que cruzaram um limiar de antecedência desde a
+    última verificação e que o destinatário ainda não recebeu (estado_alertas).
     """
-    print(f"\n{'='*60}")
-    print(f"  VERIFICAÇÃO DE ALERTAS - {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-    print(f"{'='*60}\n")
+    import estado_alertas
+
+    logger.info(f"Verificação de alertas - {datetime.now().strftime('%d/%m/%Y %H:%M')}")
 
     if not ALERTAS_HABILITADOS:
-        print("⚠ Sistema de alertas desabilitado")
-        print("   Configure ALERTAS_EMAIL=true no .env\n")
+        logger.warning("Sistema de alertas desabilitado (configure ALERTAS_EMAIL=true no .env)")
         return
 
     # Verificar garantias
-    print("1. Verificando garantias vencendo...")
-    enviar_alerta_garantias()
+    logger.info("Verificando garantias vencendo...")
+    estado_alertas.verificar('garantia')
 
     # Verificar manutenções
-    print("\n2. Verificando manutenções agendadas...")
-    enviar_alerta_manutencoes()
+    logger.info("Verificando manutenções agendadas...")
+    estado_alertas.verificar('manutencao')
 
-    print(f"\n{'='*60}")
-    print("  VERIFICAÇÃO CONCLUÍDA")
-    print(f"{'='*60}\n")
+    logger.info("Verificação de alertas concluída")
 
 
 def notificar_novo_ativo(ativo_dados):
@@ -0,0 +1,218 @@
+"""
+Estado das notificações de alerta
+Registra o que foi avisado, a quem e em qual limiar de antecedência
+(30/15/7/1 dias). A verificação diária busca, por faixas no índice da
+data (garantia_ate / proximo_agendamento), apenas os itens que cruzaram
+um limiar desde a última verificação, e cada destinatário recebe só o
+que ainda não recebeu naquele limiar
+"""
+
+import logging
+from datetime import date, timedelta
+
+import db
+import email_service
+
+# Dias de antecedência em que cada tipo de alerta é enviado (o maior é o
+# horizonte do alerta, o mesmo dos emails de garantias e manutenções)
+LIMIARES = {
+    'garantia': (30, 15, 7, 1),
+    'manutencao': (7, 1),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def criar_tabelas(conn):
+    """
+    Cria as tabelas de estado dos alertas e os índices das datas de vencimento
+
+    alertas_enviados: um registro por item × data de referência × limiar ×
+        destinatário (mudar a data do item gera novos avisos)
+    alertas_verificacoes: última verificação concluída de cada tipo
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alertas_enviados (
+            tipo TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            referencia DATE NOT NULL,
+            limiar INTEGER NOT NULL,
+            destinatario TEXT NOT NULL,
+            enviado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tipo, item_id, referencia, limiar, destinatario)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alertas_verificacoes (
+            tipo TEXT PRIMARY KEY,
+            ultima DATE NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ativos_garantia_ate ON ativos(garantia_ate)
+        WHERE garantia_ate IS NOT NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_manutencoes_proximo_agendamento ON manutencoes(proximo_agendamento)
+        WHERE proximo_agendamento IS NOT NULL
+    ''')
+
+
+# ==================== ITENS POR FAIXA DE DATA ====================
+
+def _garantias(conn, depois_de, ate):
+    """Ativos com garantia_ate em (depois_de, ate]: (item_id, referencia, linha do email)"""
+    linhas = conn.execute('''
+        SELECT id, codigo_id, nome, sn, garantia_ate, responsavel
+        FROM ativos
+        WHERE garantia_ate IS NOT NULL AND garantia_ate > ? AND garantia_ate <= ?
+    ''', (depois_de.isoformat(), ate.isoformat())).fetchall()
+    return [(linha[0], linha[4], linha) for linha in linhas]
+
+
+def _manutencoes(conn, depois_de, ate):
+    """
+    Manutenções com proximo_agendamento em (depois_de, ate]: (item_id, referencia, linha do email)
+
+    As registradas ao concluir uma ocorrência de plano ficam de fora: a
+    próxima ocorrência já é avisada pela fila (planos_manutencao).
+    """
+    linhas = conn.execute('''
+        SELECT m.id, m.ativo_id, m.tipo, a.codigo_id, a.nome, m.proximo_agendamento, m.descricao, m.responsavel
+        FROM manutencoes m
+        JOIN ativos a ON m.ativo_id = a.id
+        WHERE m.proximo_agendamento IS NOT NULL AND m.proximo_agendamento > ? AND m.proximo_agendamento <= ?
+          AND NOT EXISTS (SELECT 1 FROM manutencoes_fila f WHERE f.manutencao_id = m.id)
+    ''', (depois_de.isoformat(), ate.isoformat())).fetchall()
+    return [(linha[0], linha[5], linha) for linha in linhas]
+
+
+def _linha_garantia(linha, dias):
+    # Formato de email_service.verificar_garantias_vencendo
+    id_, codigo_id, nome, sn, garantia_ate, responsavel = linha
+    return (id_, codigo_id, nome, sn, garantia_ate, dias, responsavel)
+
+
+def _linha_manutencao(linha, dias):
+    # Formato de email_service.verificar_manutencoes_proximas
+    return (*linha[:6], dias, *linha[6:])
+
+
+def _email_garantias(linhas):
+    html, texto = email_service.criar_email_alerta_garantia(linhas)
+    return f"⚠️ Alerta: {len(linhas)} garantia(s) vencendo nos próximos 30 dias", html, texto
+
+
+def _email_manutencoes(linhas):
+    html, texto = email_service.criar_email_alerta_manutencao(linhas)
+    return f"🔧 Lembrete: {len(linhas)} manutenção(ões) agendada(s) para os próximos 7 dias", html, texto
+
+
+# tipo -> (consulta por faixa, linha no formato do email, montagem do email,
+#          a data de hoje entra na faixa?)
+TIPOS = {
+    'garantia': (_garantias, _linha_garantia, _email_garantias, False),
+    'manutencao': (_manutencoes, _linha_manutencao, _email_manutencoes, True),
+}
+
+
+def itens_cruzando(conn, tipo, desde, hoje):
+    """
+    Itens que cruzaram um limiar depois de 'desde' e até 'hoje'
+
+    Um item vencendo em D cruzou o limiar L no dia D - L; para cada limiar
+    a busca é a faixa (desde + L, hoje + L] no índice da data. Um item que
+    cruzou mais de um limiar (verificação atrasada) fica com o menor.
+
+    Returns:
+        Lista de (item_id, referencia, limiar, dias restantes, linha do email)
+    """
+    consultar, formatar, _, inclui_hoje = TIPOS[tipo]
+    limite_inferior = hoje - timedelta(days=1) if inclui_hoje else hoje
+
+    itens, vistos = [], set()
+    for limiar in sorted(LIMIARES[tipo]):
+        depois_de = max(desde + timedelta(days=limiar), limite_inferior)
+        for item_id, referencia, linha in consultar(conn, depois_de, hoje + timedelta(days=limiar)):
+            if item_id in vistos:
+                continue
+            vistos.add(item_id)
+            dias = (date.fromisoformat(str(referencia)[:10]) - hoje).days
+            itens.append((item_id, referencia, limiar, dias, formatar(linha, dias)))
+
+    itens.sort(key=lambda item: item[3])
+    return itens
+
+
+def _ja_enviados(conn, tipo, item_id, referencia, limiar):
+    return {linha[0] for linha in conn.execute('''
+        SELECT destinatario FROM alertas_enviados
+        WHERE tipo = ? AND item_id = ? AND referencia = ? AND limiar = ?
+    ''', (tipo, item_id, referencia, limiar))}
+
+
+def verificar(tipo, hoje=None, destinatarios=None):
+    """
+    Envia os alertas de um tipo que ainda não foram enviados
+
+    Destinatários com a mesma lista de itens novos recebem um único email.
+    A verificação só avança se todos os envios derem certo; os itens de um
+    envio que falhou voltam na próxima.
+
+    Returns:
+        Número de itens avisados (a pelo menos um destinatário)
+    """
+    hoje = hoje or date.today()
+    destinatarios = [d.strip() for d in (destinatarios or email_service.DESTINATARIOS_ALERTAS) if d.strip()]
+    if not destinatarios:
+        logger.warning(f"Nenhum destinatário configurado para alertas de {tipo}")
+        return 0
+
+    horizonte = max(LIMIARES[tipo])
+    with db.conectar() as conn:
+        ultima = conn.execute('SELECT ultima FROM alertas_verificacoes WHERE tipo = ?', (tipo,)).fetchone()
+        # Primeira verificação (ou parada há muito tempo): tudo dentro do horizonte
+        desde = hoje - timedelta(days=horizonte + 1)
+        if ultima:
+            desde = max(desde, date.fromisoformat(ultima[0]))
+
+        # Itens novos de cada destinatário, agrupados por lista idêntica
+        itens = itens_cruzando(conn, tipo, desde, hoje)
+        grupos = {}
+        for indice, (item_id, referencia, limiar, _, _) in enumerate(itens):
+            enviados = _ja_enviados(conn, tipo, item_id, referencia, limiar)
+            for destinatario in destinatarios:
+                if destinatario not in enviados:
+                    grupos.setdefault(destinatario, []).append(indice)
+
+    por_lista = {}
+    for destinatario, indices in grupos.items():
+        por_lista.setdefault(tuple(indices), []).append(destinatario)
+
+    _, _, montar_email, _ = TIPOS[tipo]
+    avisados, sucesso = set(), True
+    for indices, grupo in por_lista.items():
+        assunto, html, texto = montar_email([itens[i][4] for i in indices])
+        if not email_service.enviar_email(grupo, assunto, html, texto):
+            sucesso = False
+            continue
+        with db.conectar() as conn:
+            conn.executemany('''
+                INSERT OR IGNORE INTO alertas_enviados (tipo, item_id, referencia, limiar, destinatario)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(tipo, itens[i][0], itens[i][1], itens[i][2], destinatario)
+                  for i in indices for destinatario in grupo])
+        avisados.update(indices)
+
+    if sucesso:
+        with db.conectar() as conn:
+            conn.execute('''
+                INSERT INTO alertas_verificacoes (tipo, ultima) VALUES (?, ?)
+                ON CONFLICT (tipo) DO UPDATE SET ultima = excluded.ultima
+            ''', (tipo, hoje.isoformat()))
+
+    logger.info(f"Alertas de {tipo}: {len(itens)} item(ns) cruzando limiar, {len(avisados)} avisado(s) "
+                f"em {len(por_lista)} email(s)")
+    return len(avisados)
+
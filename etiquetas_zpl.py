@@ -0,0 +1,106 @@
+"""
+Geração de etiquetas em ZPL para impressoras térmicas Zebra
+A própria impressora desenha o QR Code (^BQ), sem rasterizar PNGs
+"""
+
+import os
+from datetime import datetime
+
+# Dimensões da etiqueta em dots (203 dpi: 8 dots/mm). Padrão: 50 x 30 mm
+ZPL_LARGURA = int(os.getenv('ZPL_LARGURA', '400'))
+ZPL_ALTURA = int(os.getenv('ZPL_ALTURA', '240'))
+
+# Ampliação do QR Code (1 a 10) e nível de correção de erro (L, M, Q, H)
+ZPL_QR_AMPLIACAO = int(os.getenv('ZPL_QR_AMPLIACAO', '4'))
+ZPL_QR_CORRECAO = os.getenv('ZPL_QR_CORRECAO', 'M').upper()
+
+# Pasta de spool monitorada pelo servidor de impressão (opcional)
+ZPL_SPOOL_DIR = os.getenv('ZPL_SPOOL_DIR', '')
+
+
+def escapar_zpl(texto):
+    """
+    Escapa caracteres de controle do ZPL usando ^FH (hexadecimal)
+
+    Os caracteres ^ e ~ iniciam comandos ZPL e não podem aparecer
+    diretamente em um campo. O indicador hexadecimal é o '_'.
+    """
+    if texto is None:
+        return ''
+    texto = str(texto)
+    return texto.replace('_', '_5F').replace('^', '_5E').replace('~', '_7E')
+
+
+def gerar_etiqueta_zpl(ativo_id, codigo_id, nome, sn, url):
+    """
+    Gera o ZPL de uma etiqueta
+
+    Args:
+        ativo_id: ID do ativo
+        codigo_id: Código do ativo
+        nome: Nome do ativo
+        sn: Número de série
+        url: URL codificada no QR Code
+
+    Returns:
+        String ZPL da etiqueta (^XA ... ^XZ)
+    """
+    # O texto fica à direita do QR Code
+    x_texto = 25 + ZPL_QR_AMPLIACAO * 33
+    nome = (nome or '')[:28]
+
+    return (
+        '^XA'
+        '^CI28'
+        f'^PW{ZPL_LARGURA}'
+        f'^LL{ZPL_ALTURA}'
+        f'^FO15,10^BQN,2,{ZPL_QR_AMPLIACAO}'
+        f'^FH^FD{ZPL_QR_CORRECAO}A,{escapar_zpl(url)}^FS'
+        f'^FO{x_texto},30^A0N,30,30^FH^FD{escapar_zpl(codigo_id)}^FS'
+        f'^FO{x_texto},75^A0N,20,20^FB{ZPL_LARGURA - x_texto - 10},2,0,L^FH^FD{escapar_zpl(nome)}^FS'
+        f'^FO{x_texto},130^A0N,18,18^FH^FDSN: {escapar_zpl(sn)}^FS'
+        f'^FO{x_texto},160^A0N,16,16^FDID {ativo_id}^FS'
+        '^XZ\n'
+    )
+
+
+def gerar_lote_zpl(ativos, base_url):
+    """
+    Gera as etiquetas de vários ativos em um único trabalho de impressão
+
+    Args:
+        ativos: Lista de tuplas (id, codigo_id, nome, sn)
+        base_url: URL base do sistema para o QR Code
+
+    Yields:
+        Strings ZPL, uma por etiqueta
+    """
+    for ativo_id, codigo_id, nome, sn in ativos:
+        yield gerar_etiqueta_zpl(ativo_id, codigo_id, nome, sn, f"{base_url}/ver/{ativo_id}")
+
+
+def gravar_spool(ativos, base_url, pasta=None):
+    """
+    Grava o trabalho de impressão na pasta de spool
+
+    O arquivo é escrito com extensão temporária e renomeado no final,
+    para que o servidor de impressão nunca leia um trabalho incompleto.
+
+    Returns:
+        Caminho do arquivo gravado
+    """
+    pasta = pasta or ZPL_SPOOL_DIR
+    if not pasta:
+        raise ValueError('Pasta de spool não configurada (ZPL_SPOOL_DIR)')
+
+    os.makedirs(pasta, exist_ok=True)
+    nome_arquivo = f"etiquetas_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.zpl"
+    caminho = os.path.join(pasta, nome_arquivo)
+    temporario = caminho + '.tmp'
+
+    with open(temporario, 'w', encoding='utf-8') as f:
+        for etiqueta in gerar_lote_zpl(ativos, base_url):
+            f.write(etiqueta)
+
+    os.replace(temporario, caminho)
+    return caminho
@@ -0,0 +1,68 @@
+"""
+Exportação de dados para Excel
+Importado sob demanda pelas rotas: pandas e openpyxl só são carregados
+quando um relatório é efetivamente gerado
+"""
+
+import pandas as pd
+
+COLUNAS_INVENTARIO = ['Código', 'Nome', 'SN', 'Localização', 'Responsável',
+                      'Categoria', 'Status', 'Conferido Por', 'Data Conferência', 'Observação']
+
+
+def exportar_consulta_excel(conn, query, params, caminho):
+    """
+    Executa uma consulta e grava o resultado em uma planilha
+
+    Args:
+        conn: Conexão SQLite
+        query: Consulta SQL
+        params: Parâmetros da consulta
+        caminho: Arquivo .xlsx de destino (caminho ou arquivo em memória, ex: BytesIO)
+
+    Returns:
+        Número de linhas exportadas (0 = nada foi gravado)
+    """
+    df = pd.read_sql_query(query, conn, params=params)
+
+    if df.empty:
+        return 0
+
+    df.to_excel(caminho, index=False)
+    return len(df)
+
+
+def exportar_inventario_excel(inventario, itens, caminho):
+    """
+    Grava o inventário em Excel com as abas 'Inventário Completo' e 'Resumo'
+
+    Args:
+        inventario: Linha da tabela inventarios
+        itens: Itens do inventário (colunas de COLUNAS_INVENTARIO)
+        caminho: Arquivo .xlsx de destino
+    """
+    df = pd.DataFrame(itens, columns=COLUNAS_INVENTARIO)
+
+    total_ativos = inventario[8]
+    total_conferidos = inventario[9]
+    total_nao_localizados = inventario[10]
+
+    with pd.ExcelWriter(caminho, engine='openpyxl') as writer:
+        # Aba principal
+        df.to_excel(writer, sheet_name='Inventário Completo', index=False)
+
+        # Aba de resumo
+        resumo_data = {
+            'Métrica': ['Total de Ativos', 'Conferidos', 'Não Localizados', 'Pendentes',
+                       '% Conferidos', '% Não Localizados'],
+            'Valor': [
+                total_ativos,
+                total_conferidos,
+                total_nao_localizados,
+                total_ativos - total_conferidos - total_nao_localizados,
+                f"{(total_conferidos/total_ativos*100):.1f}%" if total_ativos > 0 else "0%",
+                f"{(total_nao_localizados/total_ativos*100):.1f}%" if total_ativos > 0 else "0%"
+            ]
+        }
+        df_resumo = pd.DataFrame(resumo_data)
+        df_resumo.to_excel(writer, sheet_name='Resumo', index=False)
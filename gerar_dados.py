@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Gerador de dados sintéticos para testes de carga
+Preenche o banco com ativos, histórico, manutenções, anexos (apenas os
+metadados) e inventários em distribuições próximas às de uma empresa
+real: poucas localizações e responsáveis concentram a maior parte dos
+ativos, valores com cauda longa e garantias espalhadas no tempo
+
+Uso:
+  python gerar_dados.py                        # 10.000 ativos em ativos.db
+  python gerar_dados.py --ativos 100000        # Base grande
+  python gerar_dados.py --banco carga.db       # Outro arquivo
+  python gerar_dados.py --limpar --semente 7   # Apaga os dados antes (reprodutível)
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import db
+import manutencao_resumo
+
+# Modelos por categoria: (subcategoria, nomes, faixa de valor em MZN)
+MODELOS = {
+    'Hardware': [
+        ('Desktop', ['Desktop HP EliteDesk 800', 'Desktop Dell OptiPlex 7090', 'Desktop Lenovo ThinkCentre M70'], (25000, 60000)),
+        ('Notebook', ['Notebook Dell Latitude 5420', 'Notebook HP ProBook 450', 'Notebook Lenovo ThinkPad E14'], (35000, 90000)),
+        ('Servidor', ['Servidor Dell PowerEdge R740', 'Servidor HPE ProLiant DL380'], (250000, 900000)),
+        ('Monitor', ['Monitor Dell P2422H 24"', 'Monitor LG 27UL500', 'Monitor Samsung S24R350'], (8000, 25000)),
+    ],
+    'Móveis': [
+        ('Cadeira', ['Cadeira Ergonómica Giratória', 'Cadeira Fixa Visitante'], (3000, 15000)),
+        ('Secretária', ['Secretária em L 160cm', 'Secretária Simples 120cm'], (6000, 20000)),
+        ('Armário', ['Armário Arquivo 4 Gavetas', 'Armário Alto 2 Portas'], (5000, 18000)),
+    ],
+    'Periféricos': [
+        ('Teclado', ['Teclado Logitech K120', 'Teclado Dell KB216'], (500, 2500)),
+        ('Rato', ['Rato Logitech M90', 'Rato Dell MS116'], (300, 1500)),
+        ('Webcam', ['Webcam Logitech C920'], (3000, 7000)),
+    ],
+    'Impressoras': [
+        ('Impressora', ['Impressora HP LaserJet Pro M404', 'Impressora Epson EcoTank L3250'], (12000, 45000)),
+        ('Scanner', ['Scanner Fujitsu fi-7160'], (40000, 80000)),
+        ('Etiquetadora', ['Impressora Zebra ZD421'], (25000, 50000)),
+    ],
+    'Telefonia': [
+        ('Telefone IP', ['Telefone IP Yealink T46U', 'Telefone IP Grandstream GRP2614'], (5000, 15000)),
+        ('Smartphone', ['Smartphone Samsung Galaxy A54', 'Smartphone iPhone 13'], (18000, 70000)),
+    ],
+    'Rede': [
+        ('Switch', ['Switch Cisco Catalyst 2960', 'Switch HPE Aruba 2530'], (30000, 120000)),
+        ('Access Point', ['Access Point Ubiquiti U6-Lite', 'Access Point Cisco Meraki MR36'], (7000, 40000)),
+        ('Router', ['Router MikroTik RB4011', 'Firewall Fortinet FortiGate 60F'], (15000, 90000)),
+    ],
+    'Áudio/Vídeo': [
+        ('Projetor', ['Projetor Epson PowerLite X49', 'Projetor BenQ MW560'], (25000, 60000)),
+        ('Televisor', ['Smart TV Samsung 55"', 'Smart TV LG 43"'], (20000, 55000)),
+    ],
+    'Outros': [
+        ('Ar Condicionado', ['Ar Condicionado Split 12000 BTU', 'Ar Condicionado Split 18000 BTU'], (20000, 45000)),
+        ('UPS', ['UPS APC Smart-UPS 1500VA', 'UPS Eaton 5E 850VA'], (8000, 40000)),
+    ],
+}
+
+# Peso de cada categoria no parque de ativos
+PESO_CATEGORIAS = {
+    'Hardware': 35, 'Móveis': 25, 'Periféricos': 15, 'Impressoras': 5,
+    'Telefonia': 8, 'Rede': 4, 'Áudio/Vídeo': 3, 'Outros': 5,
+}
+
+# Prefixo do código por subcategoria (como em "PC001, NB002")
+PREFIXOS = {
+    'Desktop': 'PC', 'Notebook': 'NB', 'Servidor': 'SRV', 'Monitor': 'MON', 'Cadeira': 'CAD',
+    'Secretária': 'SEC', 'Armário': 'ARM', 'Teclado': 'TEC', 'Rato': 'RAT', 'Webcam': 'CAM',
+    'Impressora': 'IMP', 'Scanner': 'SCN', 'Etiquetadora': 'ETQ', 'Telefone IP': 'TEL',
+    'Smartphone': 'CEL', 'Switch': 'SW', 'Access Point': 'AP', 'Router': 'RT', 'Projetor': 'PRJ',
+    'Televisor': 'TV', 'Ar Condicionado': 'AC', 'UPS': 'UPS',
+}
+
+ESTADOS = [('Ativo', 82), ('Em manutenção', 6), ('Inativo', 12)]
+
+FORNECEDORES = ['Dell Moçambique', 'HP Store Maputo', 'Infocom', 'Teledata', 'Vodacom Business',
+                'Mozambique Office Supplies', 'TechnoSolutions', 'Mundo Digital', 'Casa dos Móveis',
+                'Lenovo Partner Maputo', 'Redes & Cia', 'ElectroSul']
+
+CIDADES = ['Maputo', 'Matola', 'Beira', 'Nampula', 'Tete', 'Quelimane', 'Pemba', 'Inhambane']
+SETORES = ['Sala TI', 'Financeiro', 'Recursos Humanos', 'Armazém', 'Direção', 'Comercial',
+           'Logística', 'Receção', 'Sala de Reuniões', 'Produção', 'Laboratório', 'Compras']
+
+NOMES = ['João', 'Maria', 'Carlos', 'Ana', 'Paulo', 'Fátima', 'Manuel', 'Isabel', 'António', 'Luísa',
+         'José', 'Helena', 'Pedro', 'Rosa', 'Alberto', 'Teresa', 'Fernando', 'Graça', 'Samuel', 'Lúcia']
+APELIDOS = ['Silva', 'Macuácua', 'Nhantumbo', 'Cossa', 'Sitoe', 'Mondlane', 'Langa', 'Chissano',
+            'Tembe', 'Matsinhe', 'Machava', 'Santos', 'Ferreira', 'Mabunda', 'Muianga', 'Pereira']
+
+TIPOS_MANUTENCAO = [('Preventiva', 45), ('Corretiva', 30), ('Limpeza', 10), ('Atualização', 8),
+                    ('Calibração', 4), ('Preditiva', 3)]
+
+EDICOES = [('localizacao', 40), ('responsavel', 35), ('estado', 20), ('observacoes', 5)]
+
+DIAS_HISTORICO = 8 * 365
+
+
+def _pesos_zipf(total, expoente=1.1):
+    """Pesos 1/k^s: os primeiros valores concentram a maior parte dos ativos"""
+    return [1 / (k ** expoente) for k in range(1, total + 1)]
+
+
+class Gerador:
+    """Valores aleatórios reprodutíveis para uma base com 'total' ativos"""
+
+    def __init__(self, total, semente=None):
+        self.rnd = random.Random(semente)
+        self.hoje = date.today()
+
+        # Número de valores distintos cresce com a base, como numa empresa real
+        total_locais = max(5, int(math.sqrt(total) * 2))
+        total_pessoas = max(10, total // 15)
+
+        self.localizacoes = [f'{SETORES[i % len(SETORES)]} - {CIDADES[(i // len(SETORES)) % len(CIDADES)]}'
+                             + (f' {i // (len(SETORES) * len(CIDADES)) + 1}º Andar'
+                                if i >= len(SETORES) * len(CIDADES) else '')
+                             for i in range(total_locais)]
+        self.pesos_localizacoes = _pesos_zipf(total_locais)
+
+        pessoas = set()
+        while len(pessoas) < total_pessoas:
+            nome = f'{self.rnd.choice(NOMES)} {self.rnd.choice(APELIDOS)}'
+            if len(pessoas) >= len(NOMES) * len(APELIDOS):
+                nome += f' {len(pessoas)}'
+            pessoas.add(nome)
+        self.responsaveis = sorted(pessoas)
+        self.rnd.shuffle(self.responsaveis)
+        self.pesos_responsaveis = _pesos_zipf(total_pessoas, 0.8)
+
+    def escolher(self, opcoes_com_peso):
+        valores, pesos = zip(*opcoes_com_peso)
+        return self.rnd.choices(valores, weights=pesos)[0]
+
+    def localizacao(self):
+        return self.rnd.choices(self.localizacoes, weights=self.pesos_localizacoes)[0]
+
+    def responsavel(self):
+        return self.rnd.choices(self.responsaveis, weights=self.pesos_responsaveis)[0]
+
+    def data_passada(self, dias=DIAS_HISTORICO):
+        return self.hoje - timedelta(days=self.rnd.randint(0, dias))
+
+    def serial(self, nome):
+        marca = ''.join(c for c in nome.split()[1] if c.isalpha())[:3].upper() or 'GEN'
+        return marca + ''.join(self.rnd.choice('0123456789ABCDEFGHJKMNPRSTUVWXYZ') for _ in range(9))
+
+    def valor(self, faixa):
+        """Valor com cauda longa dentro da faixa do modelo"""
+        minimo, maximo = faixa
+        fator = min(1.0, self.rnd.lognormvariate(-1.2, 0.6))
+        return round(minimo + (maximo - minimo) * fator, 2)
+
+
+def _ativos(gerador, total, categorias):
+    """Linhas da tabela ativos (sem id) e a data de aquisição de cada uma"""
+    contadores = {}
+    nomes_categorias = list(PESO_CATEGORIAS)
+    pesos_categorias = [PESO_CATEGORIAS[c] for c in nomes_categorias]
+
+    for _ in range(total):
+        categoria = gerador.rnd.choices(nomes_categorias, weights=pesos_categorias)[0]
+        subcategoria, nomes, faixa = gerador.rnd.choice(MODELOS[categoria])
+        nome = gerador.rnd.choice(nomes)
+
+        prefixo = PREFIXOS[subcategoria]
+        contadores[prefixo] = contadores.get(prefixo, 0) + 1
+
+        aquisicao = gerador.data_passada()
+        garantia = aquisicao + timedelta(days=365 * gerador.rnd.choice([1, 1, 2, 3, 5]))
+
+        yield aquisicao, (
+            f'{prefixo}{contadores[prefixo]:05d}',
+            nome,
+            gerador.serial(nome),
+            f'{subcategoria} {nome.split()[1]} em uso',
+            gerador.localizacao(),
+            gerador.responsavel(),
+            gerador.escolher(ESTADOS),
+            categorias.get(categoria),
+            subcategoria,
+            f'PAT-{aquisicao.year}-{gerador.rnd.randint(1, 999999):06d}',
+            aquisicao.isoformat(),
+            gerador.valor(faixa),
+            gerador.rnd.choice(FORNECEDORES),
+            garantia.isoformat(),
+            '' if gerador.rnd.random() < 0.8 else 'Verificar estado na próxima auditoria',
+        )
+
+
+def _historico(gerador, ativo_id, codigo, nome, aquisicao):
+    """Criação do ativo seguida de edições espalhadas desde a aquisição"""
+    quando = datetime.combine(aquisicao, datetime.min.time()) + timedelta(hours=9)
+    linhas = [(ativo_id, 'Ativo criado', None, None, f'{codigo} - {nome}', 'admin', '127.0.0.1',
+               quando.strftime('%Y-%m-%d %H:%M:%S'))]
+
+    dias_desde = (gerador.hoje - aquisicao).days
+    for _ in range(min(20, int(gerador.rnd.expovariate(1 / 2.5)))):
+        campo = gerador.escolher(EDICOES)
+        novo = {'localizacao': gerador.localizacao, 'responsavel': gerador.responsavel,
+                'estado': lambda: gerador.escolher(ESTADOS),
+                'observacoes': lambda: 'Atualizado na auditoria'}[campo]()
+        momento = quando + timedelta(days=gerador.rnd.randint(0, max(dias_desde, 0)),
+                                     minutes=gerador.rnd.randint(0, 600))
+        linhas.append((ativo_id, 'editado', campo, None, novo, gerador.responsavel(), '10.0.0.1',
+                       momento.strftime('%Y-%m-%d %H:%M:%S')))
+    return linhas
+
+
+def _manutencoes(gerador, ativo_id, aquisicao, valor):
+    """0 a 6 manutenções por ativo; algumas agendadas para os próximos dias"""
+    linhas = []
+    for _ in range(min(6, int(gerador.rnd.expovariate(1 / 0.8)))):
+        tipo = gerador.escolher(TIPOS_MANUTENCAO)
+        data = aquisicao + timedelta(days=gerador.rnd.randint(0, max((gerador.hoje - aquisicao).days, 0)))
+        proxima = None
+        if tipo == 'Preventiva':
+            proxima = (data + timedelta(days=gerador.rnd.choice([90, 180, 365]))).isoformat()
+        custo = round((valor or 1000) * gerador.rnd.uniform(0.01, 0.15 if tipo == 'Corretiva' else 0.04), 2)
+        linhas.append((ativo_id, tipo, f'Manutenção {tipo.lower()}', data.isoformat(), proxima,
+                       gerador.responsavel(), custo, 'Concluída', None))
+
+    if gerador.rnd.random() < 0.03:
+        data = gerador.hoje + timedelta(days=gerador.rnd.randint(1, 30))
+        linhas.append((ativo_id, 'Preventiva', 'Manutenção preventiva agendada', data.isoformat(), None,
+                       gerador.responsavel(), None, 'Agendada', None))
+    return linhas
+
+
+def _anexos(gerador, ativo_id):
+    """Metadados de fotos e documentos (os arquivos não são criados)"""
+    linhas = []
+    if gerador.rnd.random() < 0.45:
+        linhas.append((ativo_id, 'foto', f'foto_{ativo_id}.jpg', f'uploads/fotos/{ativo_id}_foto.jpg',
+                       gerador.rnd.randint(150_000, 3_000_000), 'image/jpeg', None, 1))
+    if gerador.rnd.random() < 0.25:
+        linhas.append((ativo_id, 'documento', f'fatura_{ativo_id}.pdf', f'uploads/documentos/{ativo_id}_fatura.pdf',
+                       gerador.rnd.randint(50_000, 900_000), 'application/pdf', 'Fatura de compra', 0))
+    return linhas
+
+
+def limpar(conn):
+    """Apaga os dados gerados (ativos e tabelas dependentes); usuários e categorias são mantidos"""
+    for tabela in ('inventario_itens', 'inventarios', 'anexos', 'manutencoes', 'historico', 'ativos'):
+        conn.execute(f'DELETE FROM {tabela}')
+    manutencao_resumo.reconstruir(conn)
+    conn.commit()
+
+
+def gerar(conn, total, semente=None, inventarios=5, lote=5000):
+    """
+    Insere 'total' ativos e os dados relacionados
+
+    Returns:
+        Dict com o número de linhas inseridas por tabela
+    """
+    gerador = Gerador(total, semente)
+    categorias = dict((nome, id_) for id_, nome in conn.execute('SELECT id, nome FROM categorias'))
+    contagem = dict.fromkeys(['ativos', 'historico', 'manutencoes', 'anexos', 'inventarios', 'inventario_itens'], 0)
+
+    proximo_id = (conn.execute('SELECT MAX(id) FROM ativos').fetchone()[0] or 0) + 1
+    ids_gerados = []
+    pendentes = []
+
+    def gravar(pendentes):
+        conn.executemany('''
+            INSERT INTO ativos (id, codigo_id, nome, sn, descricao, localizacao, responsavel, estado,
+                                categoria_id, subcategoria, numero_patrimonio, data_aquisicao,
+                                valor_aquisicao, fornecedor, garantia_ate, observacoes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(ativo_id,) + linha for ativo_id, _, linha in pendentes])
+
+        historico, manutencoes, anexos = [], [], []
+        for ativo_id, aquisicao, linha in pendentes:
+            historico.extend(_historico(gerador, ativo_id, linha[0], linha[1], aquisicao))
+            manutencoes.extend(_manutencoes(gerador, ativo_id, aquisicao, linha[11]))
+            anexos.extend(_anexos(gerador, ativo_id))
+
+        conn.executemany('''
+            INSERT INTO historico (ativo_id, acao, campo, valor_anterior, valor_novo, usuario, ip_address, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', historico)
+        conn.executemany('''
+            INSERT INTO manutencoes (ativo_id, tipo, descricao, data_manutencao, proximo_agendamento,
+                                     responsavel, custo, status, observacoes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', manutencoes)
+        conn.executemany('''
+            INSERT INTO anexos (ativo_id, tipo, nome_arquivo, caminho, tamanho, mime_type, descricao, principal)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', anexos)
+        conn.commit()
+
+        contagem['ativos'] += len(pendentes)
+        contagem['historico'] += len(historico)
+        contagem['manutencoes'] += len(manutencoes)
+        contagem['anexos'] += len(anexos)
+
+    for aquisicao, linha in _ativos(gerador, total, categorias):
+        pendentes.append((proximo_id, aquisicao, linha))
+        ids_gerados.append((proximo_id, linha[4]))
+        proximo_id += 1
+        if len(pendentes) >= lote:
+            gravar(pendentes)
+            pendentes = []
+            print(f"  {contagem['ativos']:>8} ativos...", end='\r', flush=True)
+    if pendentes:
+        gravar(pendentes)
+
+    # Inventários: um completo em andamento e outros por localização, parcialmente conferidos
+    for i in range(inventarios):
+        if i == 0:
+            titulo, tipo, localizacao = 'Inventário geral (carga)', 'completo', None
+            itens = [ativo_id for ativo_id, _ in ids_gerados]
+        else:
+            localizacao = gerador.localizacao()
+            titulo, tipo = f'Inventário {localizacao} (carga)', 'localizacao'
+            itens = [ativo_id for ativo_id, local in ids_gerados if local == localizacao]
+
+        cursor = conn.execute('''
+            INSERT INTO inventarios (titulo, descricao, tipo, filtro_localizacao, total_ativos, iniciado_por)
+            VALUES (?, 'Gerado por gerar_dados.py', ?, ?, ?, 'admin')
+        ''', (titulo, tipo, localizacao, len(itens)))
+        inventario_id = cursor.lastrowid
+
+        progresso = gerador.rnd.uniform(0.1, 0.9)
+        linhas = []
+        for ativo_id in itens:
+            if gerador.rnd.random() < progresso:
+                status = 'Conferido' if gerador.rnd.random() < 0.97 else 'Não Localizado'
+                linhas.append((inventario_id, ativo_id, status, 'admin', datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            else:
+                linhas.append((inventario_id, ativo_id, 'Pendente', None, None))
+        conn.executemany('''
+            INSERT INTO inventario_itens (inventario_id, ativo_id, status, conferido_por, data_conferencia)
+            VALUES (?, ?, ?, ?, ?)
+        ''', linhas)
+        conn.execute('''
+            UPDATE inventarios SET
+                total_conferidos = (SELECT COUNT(*) FROM inventario_itens WHERE inventario_id = ? AND status = 'Conferido'),
+                total_nao_localizados = (SELECT COUNT(*) FROM inventario_itens
+                                         WHERE inventario_id = ? AND status = 'Não Localizado')
+            WHERE id = ?
+        ''', (inventario_id, inventario_id, inventario_id))
+        conn.commit()
+
+        contagem['inventarios'] += 1
+        contagem['inventario_itens'] += len(linhas)
+
+    # Manutenções inseridas direto na tabela: resumos refeitos de uma vez
+    manutencao_resumo.reconstruir(conn)
+    conn.commit()
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera dados sintéticos para testes de carga')
+    parser.add_argument('--ativos', type=int, default=10000, help='Número de ativos (padrão: 10000)')
+    parser.add_argument('--inventarios', type=int, default=5, help='Inventários a criar (padrão: 5)')
+    parser.add_argument('--banco', default=db.DB, help=f'Arquivo do banco (padrão: {db.DB})')
+    parser.add_argument('--semente', type=int, help='Semente aleatória (dados reprodutíveis)')
+    parser.add_argument('--limpar', action='store_true', help='Apaga ativos e dados relacionados antes')
+    args = parser.parse_args()
+
+    db.DB = args.banco
+
+    # Cria as tabelas, triggers e índices da aplicação, se ainda não existirem
+    import app
+    import busca_trigramas
+    import create_users_table
+    app.init_db()
+    create_users_table.DB = db.DB
+    create_users_table.criar_tabela_usuarios()
+
+    print("=" * 60)
+    print("  GERADOR DE DADOS SINTÉTICOS - Sistema de Gestão de Ativos")
+    print("=" * 60)
+    print(f"  Banco: {os.path.abspath(db.DB)}")
+    print(f"  Ativos: {args.ativos}  |  Inventários: {args.inventarios}  |  Semente: {args.semente}")
+    print()
+
+    inicio = time.perf_counter()
+    with db.conectar() as conn:
+        if args.limpar:
+            limpar(conn)
+            print("🗑  Dados anteriores removidos")
+
+        contagem = gerar(conn, args.ativos, args.semente, args.inventarios)
+
+        # Índice de trigramas pronto antes do teste (senão a primeira busca paga a indexação)
+        print("  Indexando trigramas da busca aproximada...", end='\r', flush=True)
+        busca_trigramas.sincronizar(conn)
+        conn.commit()
+        conn.execute('ANALYZE')
+
+    print(" " * 60, end='\r')
+    for tabela, total in contagem.items():
+        print(f"  ✓ {tabela:<18} {total:>10}")
+    print(f"\n✅ Concluído em {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Configuração do gunicorn para produção
+
+  gunicorn -c gunicorn.conf.py
+
+Variáveis de ambiente:
+  GUNICORN_BIND      Endereço (padrão: 0.0.0.0:5000)
+  GUNICORN_WORKERS   Processos (padrão: 2 x núcleos + 1)
+  GUNICORN_THREADS   Threads por processo (padrão: 2)
+  PROMETHEUS_MULTIPROC_DIR  Pasta das métricas compartilhadas entre os
+                            workers (padrão: <tmp>/ativos_metricas)
+
+Recarga sem derrubar conexões:
+  kill -HUP <pid do mestre>    recria os workers com a configuração atual
+  kill -USR2 <pid do mestre>   inicia um novo mestre com o código novo;
+                               depois 'kill -TERM <pid antigo>'
+Com preload_app o código é carregado no mestre, então apenas USR2
+aplica uma nova versão do código.
+
+Os workers não rotacionam logs/sistema_ativos.log nem o log de consultas
+lentas (todos escrevem neles); use uma rotação externa, ex. logrotate sem
+copytruncate.
+"""
+
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Definida antes do preload: prometheus_client lê a variável ao ser importado
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'ativos_metricas'))
+
+wsgi_app = 'wsgi:app'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Processos para usar todos os núcleos; threads cobrem a espera de I/O (SMTP, disco)
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '2'))
+worker_class = 'gthread'
+
+# Importa a aplicação no mestre antes do fork: boot mais rápido e
+# páginas de memória compartilhadas entre os workers
+preload_app = True
+
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Recicla workers periodicamente para conter crescimento de memória
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+
+def on_starting(server):
+    """Descarta métricas de execuções anteriores do servidor"""
+    pasta = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    for arquivo in glob.glob(os.path.join(pasta, '*.db')):
+        os.remove(arquivo)
+
+
+def post_fork(server, worker):
+    """Reabre conexões e inicia o agendador no worker recém-criado"""
+    import app
+
+    worker.agendador = app.apos_fork()
+    server.log.info(f"Worker {worker.pid} pronto (líder do agendador: {worker.agendador.lider})")
+
+
+def worker_exit(server, worker):
+    """Libera a liderança do agendador para outro worker assumir imediatamente"""
+    agendador = getattr(worker, 'agendador', None)
+    if agendador:
+        agendador.parar()
+
+
+def child_exit(server, worker):
+    """Remove as métricas 'live' do worker encerrado (contadores são mantidos)"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,238 @@
+"""
+Logging assíncrono em JSON
+As requisições apenas enfileiram os registros (QueueHandler); uma thread
+(QueueListener) grava no arquivo e no console, então lentidão de disco
+não atrasa as respostas. Cada linha do arquivo é um objeto JSON com o
+id da requisição, usuário, rota e duração quando disponíveis.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+
+# Registros DEBUG: apenas 1 a cada N de cada ponto do código é mantido
+AMOSTRA_DEBUG = max(1, int(os.getenv('LOG_AMOSTRA_DEBUG', '100')))
+
+# Atributos padrão de LogRecord (o restante vem de 'extra' e do contexto)
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_fila_handler = None
+_ouvinte = None
+
+# [QueueHandler, QueueListener] dos loggers com arquivo próprio
+_separados = []
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro, incluindo os campos de contexto e 'extra'"""
+
+    def format(self, record):
+        dados = {
+            'data': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith('_') and valor is not None:
+                dados[chave] = valor
+        if record.exc_info:
+            dados['excecao'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            dados['excecao'] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FiltroContexto(logging.Filter):
+    """
+    Anexa id da requisição, usuário e rota ao registro
+
+    Roda na thread que gerou o registro (antes da fila), onde o contexto
+    da requisição Flask ainda existe.
+    """
+
+    def filter(self, record):
+        try:
+            from flask import g, has_request_context, request
+        except ImportError:
+            return True
+
+        if has_request_context():
+            record.request_id = getattr(record, 'request_id', None) or g.get('request_id')
+            record.rota = getattr(record, 'rota', None) or request.endpoint
+            if getattr(record, 'usuario', None) is None:
+                usuario = g.get('_login_user')
+                record.usuario = getattr(usuario, 'username', None) if usuario is not None else None
+        return True
+
+
+class FiltroAmostragem(logging.Filter):
+    """Mantém 1 a cada N registros DEBUG por ponto do código (logger + linha)"""
+
+    def __init__(self, taxa=AMOSTRA_DEBUG):
+        super().__init__()
+        self.taxa = taxa
+        self._contagens = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG or self.taxa <= 1:
+            return True
+        chave = (record.name, record.pathname, record.lineno)
+        with self._lock:
+            contagem = self._contagens.get(chave, 0)
+            self._contagens[chave] = contagem + 1
+        if contagem % self.taxa:
+            return False
+        record.amostragem = self.taxa
+        return True
+
+
+def _criar_ouvinte(handlers):
+    global _ouvinte
+    _ouvinte = QueueListener(_fila_handler.queue, *handlers, respect_handler_level=True)
+    _ouvinte.start()
+
+
+def configurar(arquivo='logs/sistema_ativos.log', nivel=logging.INFO):
+    """
+    Direciona o logging de todo o processo para a fila
+
+    Os handlers de arquivo (JSON, com rotação) e de console (texto) rodam
+    na thread do QueueListener. Chamadas repetidas não duplicam handlers.
+    A rotação é feita pelo próprio processo apenas enquanto ele é o único
+    a escrever no arquivo (ver reiniciar_apos_fork).
+    """
+    global _fila_handler
+    if _fila_handler is not None:
+        return
+
+    os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+
+    arquivo_handler = RotatingFileHandler(arquivo, maxBytes=10240000, backupCount=10, encoding='utf-8')
+    arquivo_handler.setFormatter(FormatadorJSON())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    _fila_handler = QueueHandler(queue.SimpleQueue())
+    _fila_handler.addFilter(FiltroAmostragem())
+    _fila_handler.addFilter(FiltroContexto())
+
+    raiz = logging.getLogger()
+    raiz.addHandler(_fila_handler)
+    raiz.setLevel(nivel)
+
+    _criar_ouvinte([arquivo_handler, console_handler])
+    atexit.register(parar)
+
+
+def arquivo_proprio(logger, handler):
+    """
+    Grava os registros do logger apenas em 'handler', fora do log principal
+
+    Como no log principal, quem gera o registro só o enfileira; a escrita
+    roda em uma thread própria e, após o fork, segue as mesmas regras de
+    rotação (ver reiniciar_apos_fork).
+    """
+    fila_handler = QueueHandler(queue.SimpleQueue())
+    logger.addHandler(fila_handler)
+    logger.propagate = False
+    ouvinte = QueueListener(fila_handler.queue, handler, respect_handler_level=True)
+    ouvinte.start()
+    _separados.append([fila_handler, ouvinte])
+    atexit.register(parar)
+
+
+def _arquivo_compartilhado(handler):
+    """WatchedFileHandler no mesmo arquivo e com o mesmo formato do handler"""
+    compartilhado = WatchedFileHandler(handler.baseFilename, encoding=handler.encoding)
+    compartilhado.setFormatter(handler.formatter)
+    compartilhado.setLevel(handler.level)
+    handler.close()
+    return compartilhado
+
+
+def _handlers_apos_fork(ouvinte):
+    return [_arquivo_compartilhado(h) if isinstance(h, RotatingFileHandler) else h
+            for h in ouvinte.handlers]
+
+
+def reiniciar_apos_fork():
+    """
+    Recria a fila e a thread de escrita no processo filho
+
+    A thread do QueueListener não sobrevive ao fork; sem isso os registros
+    do worker ficariam presos na fila herdada do mestre.
+
+    Com vários workers no mesmo arquivo, cada um rotacionaria por conta
+    própria e perderia registros dos outros: o arquivo passa a ser só
+    acrescentado (WatchedFileHandler) e a rotação fica a cargo de uma
+    ferramenta externa, como o logrotate; o arquivo é reaberto sozinho
+    quando é movido.
+    """
+    for separado in _separados:
+        fila_handler, ouvinte = separado
+        fila_handler.queue = queue.SimpleQueue()
+        separado[1] = QueueListener(fila_handler.queue, *_handlers_apos_fork(ouvinte),
+                                    respect_handler_level=True)
+        separado[1].start()
+
+    if _fila_handler is None:
+        return
+    handlers = _handlers_apos_fork(_ouvinte)
+    _fila_handler.queue = queue.SimpleQueue()
+    _criar_ouvinte(handlers)
+
+
+def parar():
+    """Grava os registros pendentes e encerra as threads de escrita"""
+    global _ouvinte
+    for _, ouvinte in _separados:
+        if ouvinte._thread is not None:
+            ouvinte.stop()
+    if _ouvinte is not None and _ouvinte._thread is not None:
+        _ouvinte.stop()
+    _ouvinte = None
+
+
+def registrar_requisicoes(app):
+    """
+    Atribui um id a cada requisição e registra um resumo JSON ao final
+
+    O id vem do cabeçalho X-Request-ID (proxy) ou é gerado, e é devolvido
+    no mesmo cabeçalho da resposta.
+    """
+    from flask import g, request
+
+    logger = logging.getLogger('ativos.requisicoes')
+
+    @app.before_request
+    def _iniciar_requisicao():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+        g._log_inicio = time.perf_counter()
+
+    @app.after_request
+    def _registrar_requisicao(resposta):
+        resposta.headers['X-Request-ID'] = g.get('request_id', '')
+        inicio = g.pop('_log_inicio', None)
+        if inicio is not None and request.endpoint != 'static':
+            logger.info(
+                f'{request.method} {request.path} {resposta.status_code}',
+                extra={
+                    'metodo': request.method,
+                    'caminho': request.path,
+                    'status': resposta.status_code,
+                    'duracao_ms': round((time.perf_counter() - inicio) * 1000, 1),
+                },
+            )
+        return resposta
@@ -0,0 +1,231 @@
+"""
+Resumos de custo e frequência das manutenções
+Tabelas pré-agregadas, atualizadas a cada manutenção registrada ou
+removida, das quais saem os relatórios de custo por mês, os ativos mais
+caros e os intervalos entre falhas (MTBF), sem varrer o histórico
+completo de manutenções
+"""
+
+# Tipos de manutenção que contam como falha no cálculo do MTBF
+TIPOS_FALHA = ('Corretiva',)
+
+# Chave (mês, ativo, tipo) e categoria de uma manutenção, e seu custo: iguais no registro e na reconstrução
+_CAMPOS_MENSAL = '''
+    substr(m.data_manutencao, 1, 7), m.ativo_id, m.tipo, a.categoria_id
+'''
+_CUSTO = 'COALESCE(CAST(m.custo AS REAL), 0)'
+
+
+def criar_tabelas(conn):
+    """
+    Cria as tabelas de resumo
+
+    manutencoes_mensal: quantidade e custo por ativo × mês × tipo, com a
+        categoria do ativo no momento do registro
+    manutencoes_intervalos: por ativo, número de falhas e datas da
+        primeira e da última (MTBF = intervalo / (falhas - 1))
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS manutencoes_mensal (
+            mes TEXT NOT NULL,
+            ativo_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            categoria_id INTEGER,
+            quantidade INTEGER NOT NULL,
+            custo REAL NOT NULL,
+            PRIMARY KEY (ativo_id, mes, tipo)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_manutencoes_mensal_mes ON manutencoes_mensal(mes, categoria_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS manutencoes_intervalos (
+            ativo_id INTEGER PRIMARY KEY,
+            falhas INTEGER NOT NULL,
+            primeira_falha DATE NOT NULL,
+            ultima_falha DATE NOT NULL
+        )
+    ''')
+
+    # Leitura das manutenções de um ativo ao recalcular seus intervalos
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_manutencoes_ativo ON manutencoes(ativo_id)')
+
+    # Primeira execução num banco com manutenções: monta os resumos
+    vazio = not conn.execute('SELECT 1 FROM manutencoes_mensal LIMIT 1').fetchone()
+    if vazio and conn.execute('SELECT 1 FROM manutencoes LIMIT 1').fetchone():
+        reconstruir(conn)
+
+
+def _atualizar_intervalos(conn, ativo_id, ignorar_id=None):
+    """
+    Recalcula os intervalos entre falhas de um ativo (usa o índice por ativo)
+
+    ignorar_id: manutenção que está sendo excluída e ainda não saiu da tabela
+    """
+    marcadores = ','.join('?' * len(TIPOS_FALHA))
+    conn.execute('DELETE FROM manutencoes_intervalos WHERE ativo_id = ?', (ativo_id,))
+    conn.execute(f'''
+        INSERT INTO manutencoes_intervalos (ativo_id, falhas, primeira_falha, ultima_falha)
+        SELECT ativo_id, COUNT(*), MIN(data_manutencao), MAX(data_manutencao)
+        FROM manutencoes
+        WHERE ativo_id = ? AND tipo IN ({marcadores}) AND id IS NOT ?
+        GROUP BY ativo_id
+    ''', (ativo_id, *TIPOS_FALHA, ignorar_id))
+
+
+def registrar(conn, manutencao_id, sinal=1):
+    """
+    Aplica aos resumos uma manutenção incluída (sinal=1) ou a ser excluída (sinal=-1)
+
+    Chamar na mesma transação da escrita: após o INSERT ou antes do DELETE.
+    """
+    linha = conn.execute('SELECT ativo_id, tipo FROM manutencoes WHERE id = ?', (manutencao_id,)).fetchone()
+    if not linha:
+        return
+    ativo_id, tipo = linha
+
+    conn.execute(f'''
+        INSERT INTO manutencoes_mensal (mes, ativo_id, tipo, categoria_id, quantidade, custo)
+        SELECT {_CAMPOS_MENSAL}, ?, ? * {_CUSTO}
+        FROM manutencoes m
+        LEFT JOIN ativos a ON a.id = m.ativo_id
+        WHERE m.id = ?
+        ON CONFLICT (ativo_id, mes, tipo) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            custo = custo + excluded.custo
+    ''', (sinal, sinal, manutencao_id))
+
+    if sinal < 0:
+        conn.execute('DELETE FROM manutencoes_mensal WHERE ativo_id = ? AND tipo = ? AND quantidade <= 0',
+                     (ativo_id, tipo))
+
+    if tipo in TIPOS_FALHA:
+        _atualizar_intervalos(conn, ativo_id, manutencao_id if sinal < 0 else None)
+
+
+def reconstruir(conn):
+    """Refaz os resumos a partir de todas as manutenções (scripts e cargas em lote)"""
+    conn.execute('DELETE FROM manutencoes_mensal')
+    conn.execute(f'''
+        INSERT INTO manutencoes_mensal (mes, ativo_id, tipo, categoria_id, quantidade, custo)
+        SELECT {_CAMPOS_MENSAL}, COUNT(*), SUM({_CUSTO})
+        FROM manutencoes m
+        LEFT JOIN ativos a ON a.id = m.ativo_id
+        WHERE m.data_manutencao IS NOT NULL
+        GROUP BY m.ativo_id, substr(m.data_manutencao, 1, 7), m.tipo
+    ''')
+
+    marcadores = ','.join('?' * len(TIPOS_FALHA))
+    conn.execute('DELETE FROM manutencoes_intervalos')
+    conn.execute(f'''
+        INSERT INTO manutencoes_intervalos (ativo_id, falhas, primeira_falha, ultima_falha)
+        SELECT ativo_id, COUNT(*), MIN(data_manutencao), MAX(data_manutencao)
+        FROM manutencoes
+        WHERE tipo IN ({marcadores})
+        GROUP BY ativo_id
+    ''', TIPOS_FALHA)
+
+
+# ==================== RELATÓRIOS ====================
+
+def _periodo(de, ate):
+    """Condição e parâmetros do período em meses 'AAAA-MM' (inclusive)"""
+    condicoes, params = [], []
+    if de:
+        condicoes.append('r.mes >= ?')
+        params.append(de)
+    if ate:
+        condicoes.append('r.mes <= ?')
+        params.append(ate)
+    return condicoes, params
+
+
+def custos_mensais(conn, de=None, ate=None):
+    """
+    Custo e quantidade por mês × categoria × tipo
+
+    Returns:
+        Lista de dicts (mes, categoria, tipo, quantidade, custo) em ordem de mês
+    """
+    condicoes, params = _periodo(de, ate)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    linhas = conn.execute(f'''
+        SELECT r.mes, COALESCE(c.nome, 'Sem categoria'), r.tipo, SUM(r.quantidade), ROUND(SUM(r.custo), 2)
+        FROM manutencoes_mensal r
+        LEFT JOIN categorias c ON c.id = r.categoria_id
+        {where}
+        GROUP BY r.mes, r.categoria_id, r.tipo
+        ORDER BY r.mes, SUM(r.custo) DESC
+    ''', params).fetchall()
+    return [dict(zip(('mes', 'categoria', 'tipo', 'quantidade', 'custo'), linha)) for linha in linhas]
+
+
+def ativos_mais_caros(conn, de=None, ate=None, tipo=None, limite=10):
+    """
+    Ativos com maior custo de manutenção no período
+
+    Returns:
+        Lista de dicts (ativo_id, codigo_id, nome, categoria, quantidade,
+        custo, valor_aquisicao), maior custo primeiro
+    """
+    condicoes, params = _periodo(de, ate)
+    if tipo:
+        condicoes.append('r.tipo = ?')
+        params.append(tipo)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    linhas = conn.execute(f'''
+        SELECT t.ativo_id, a.codigo_id, a.nome, c.nome, t.quantidade, t.custo, a.valor_aquisicao
+        FROM (
+            SELECT ativo_id, SUM(quantidade) AS quantidade, ROUND(SUM(custo), 2) AS custo
+            FROM manutencoes_mensal r
+            {where}
+            GROUP BY ativo_id
+            ORDER BY SUM(custo) DESC
+            LIMIT ?
+        ) t
+        LEFT JOIN ativos a ON a.id = t.ativo_id
+        LEFT JOIN categorias c ON c.id = a.categoria_id
+        ORDER BY t.custo DESC
+    ''', (*params, limite)).fetchall()
+    return [dict(zip(('ativo_id', 'codigo_id', 'nome', 'categoria', 'quantidade', 'custo', 'valor_aquisicao'),
+                     linha)) for linha in linhas]
+
+
+def intervalos_entre_falhas(conn, categoria_id=None, limite=20):
+    """
+    MTBF (dias médios entre falhas) por ativo e por categoria
+
+    Considera apenas ativos com ao menos duas falhas. O MTBF da categoria
+    soma os intervalos e as falhas de todos os seus ativos.
+
+    Returns:
+        dict com 'ativos' (menor MTBF primeiro, até 'limite') e 'categorias'
+    """
+    filtro, params = ('AND a.categoria_id = ?', [categoria_id]) if categoria_id else ('', [])
+    ativos = conn.execute(f'''
+        SELECT i.ativo_id, a.codigo_id, a.nome, c.nome, i.falhas,
+               ROUND((julianday(i.ultima_falha) - julianday(i.primeira_falha)) / (i.falhas - 1), 1) AS mtbf,
+               i.ultima_falha
+        FROM manutencoes_intervalos i
+        JOIN ativos a ON a.id = i.ativo_id
+        LEFT JOIN categorias c ON c.id = a.categoria_id
+        WHERE i.falhas >= 2 {filtro}
+        ORDER BY mtbf ASC
+        LIMIT ?
+    ''', (*params, limite)).fetchall()
+
+    categorias = conn.execute(f'''
+        SELECT COALESCE(c.nome, 'Sem categoria'), COUNT(*), SUM(i.falhas),
+               ROUND(SUM(julianday(i.ultima_falha) - julianday(i.primeira_falha)) / SUM(i.falhas - 1), 1)
+        FROM manutencoes_intervalos i
+        JOIN ativos a ON a.id = i.ativo_id
+        LEFT JOIN categorias c ON c.id = a.categoria_id
+        WHERE i.falhas >= 2 {filtro}
+        GROUP BY a.categoria_id
+        ORDER BY 4 ASC
+    ''', params).fetchall()
+
+    return {
+        'ativos': [dict(zip(('ativo_id', 'codigo_id', 'nome', 'categoria', 'falhas', 'mtbf_dias', 'ultima_falha'),
+                            linha)) for linha in ativos],
+        'categorias': [dict(zip(('categoria', 'ativos', 'falhas', 'mtbf_dias'), linha)) for linha in categorias],
+    }
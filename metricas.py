@@ -0,0 +1,142 @@
+"""
+Métricas da aplicação no formato Prometheus (endpoint /metrics)
+
+Com o gunicorn, cada worker grava suas métricas em arquivos na pasta
+PROMETHEUS_MULTIPROC_DIR (definida em gunicorn.conf.py) e o /metrics de
+qualquer worker soma os valores de todos. Sem essa variável (servidor de
+desenvolvimento, scripts), as métricas ficam apenas no próprio processo.
+"""
+
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+
+import db
+
+# Token opcional exigido no cabeçalho 'Authorization: Bearer <token>'
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')
+
+# No modo multiprocesso cada métrica abre seu arquivo ao ser criada
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# HTTP
+REQUISICAO_DURACAO = Histogram(
+    'ativos_http_requisicao_duracao_segundos', 'Duração das requisições HTTP',
+    ['endpoint', 'metodo'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+REQUISICOES = Counter(
+    'ativos_http_requisicoes_total', 'Requisições HTTP respondidas',
+    ['endpoint', 'metodo', 'status'],
+)
+
+# Banco de dados
+SQL_DURACAO = Histogram(
+    'ativos_sql_duracao_segundos',
+    'Tempo dos comandos SQL, incluindo a espera por lock de outro processo',
+    ['operacao'],
+    buckets=(.0005, .001, .005, .01, .05, .1, .5, 1, 5, 15),
+)
+CONEXAO_DURACAO = Histogram(
+    'ativos_db_conexao_duracao_segundos', 'Tempo para abrir uma conexão com o banco',
+    buckets=(.0001, .0005, .001, .005, .01, .05, .1),
+)
+SQLITE_OCUPADO = Counter(
+    'ativos_sqlite_ocupado_total',
+    'Comandos que falharam com SQLITE_BUSY (banco bloqueado além de DB_TIMEOUT)',
+    ['operacao'],
+)
+
+# Email
+EMAILS = Counter('ativos_emails_total', 'Emails processados por resultado', ['resultado'])
+EMAIL_DURACAO = Histogram(
+    'ativos_email_envio_duracao_segundos', 'Tempo de envio SMTP',
+    buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30),
+)
+
+# Agendador
+TAREFA_DURACAO = Histogram(
+    'ativos_tarefa_duracao_segundos', 'Duração das tarefas agendadas',
+    ['tarefa', 'status'],
+    buckets=(.1, .5, 1, 5, 15, 60, 300, 900),
+)
+
+# Operações
+QRCODES = Counter('ativos_qrcodes_gerados_total', 'QR Codes gerados')
+UPLOAD_BYTES = Counter('ativos_upload_bytes_total', 'Bytes recebidos em uploads de anexos', ['tipo'])
+INVENTARIO_CONFERENCIAS = Counter(
+    'ativos_inventario_conferencias_total', 'Itens conferidos em inventários', ['status'],
+)
+
+# Backup (script backup_database.py)
+BACKUPS = Counter('ativos_backups_total', 'Backups executados por resultado', ['resultado'])
+BACKUP_ULTIMO_SUCESSO = Gauge(
+    'ativos_backup_ultimo_sucesso_timestamp', 'Horário (epoch) do último backup concluído',
+    multiprocess_mode='max',
+)
+BACKUP_DURACAO = Gauge(
+    'ativos_backup_duracao_segundos', 'Duração do último backup',
+    multiprocess_mode='mostrecent',
+)
+BACKUP_TAMANHO = Gauge(
+    'ativos_backup_tamanho_bytes', 'Tamanho do último arquivo de backup',
+    multiprocess_mode='mostrecent',
+)
+
+OPERACOES_SQL = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'PRAGMA', 'CREATE', 'BEGIN', 'COMMIT', 'VACUUM'}
+
+
+def _operacao(sql):
+    partes = sql.lstrip().split(None, 1)
+    operacao = partes[0].upper() if partes else ''
+    return operacao.lower() if operacao in OPERACOES_SQL else 'outro'
+
+
+def _observar_sql(sql, duracao, erro=None, **contexto):
+    if sql is None:
+        CONEXAO_DURACAO.observe(duracao)
+        return
+    operacao = _operacao(sql)
+    SQL_DURACAO.labels(operacao).observe(duracao)
+    if erro is not None and ('locked' in str(erro) or 'busy' in str(erro)):
+        SQLITE_OCUPADO.labels(operacao).inc()
+
+
+def gerar():
+    """Texto das métricas (de todos os workers, no modo multiprocesso)"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro)
+
+
+def registrar_metricas(app):
+    """Mede as requisições da aplicação e publica o endpoint /metrics"""
+    from flask import g, request
+
+    db.adicionar_monitor(_observar_sql)
+
+    @app.before_request
+    def _iniciar_metricas():
+        g._metricas_inicio = time.perf_counter()
+
+    @app.after_request
+    def _registrar_requisicao(resposta):
+        inicio = g.pop('_metricas_inicio', None)
+        endpoint = request.endpoint or 'nao_encontrado'
+        if inicio is not None and endpoint != 'metricas':
+            REQUISICAO_DURACAO.labels(endpoint, request.method).observe(time.perf_counter() - inicio)
+            REQUISICOES.labels(endpoint, request.method, str(resposta.status_code)).inc()
+        return resposta
+
+    def metricas():
+        if METRICAS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICAS_TOKEN}':
+            return app.response_class('Não autorizado\n', status=401, mimetype='text/plain')
+        return app.response_class(gerar(), mimetype=CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/metrics', 'metricas', metricas)
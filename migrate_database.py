@@ -155,7 +155,10 @@ def migrate_database():
             'CREATE INDEX IF NOT EXISTS idx_anexos_ativo ON anexos(ativo_id)',
             'CREATE INDEX IF NOT EXISTS idx_manutencoes_ativo ON manutencoes(ativo_id)',
             'CREATE INDEX IF NOT EXISTS idx_manutencoes_data ON manutencoes(data_manutencao)',
-            'CREATE INDEX IF NOT EXISTS idx_ativos_categoria ON ativos(categoria_id)'
+            'CREATE INDEX IF NOT EXISTS idx_ativos_categoria ON ativos(categoria_id)',
+            'CREATE INDEX IF NOT EXISTS idx_ativos_estado ON ativos(estado)',
+            'CREATE INDEX IF NOT EXISTS idx_ativos_localizacao ON ativos(localizacao)',
+            'CREATE INDEX IF NOT EXISTS idx_ativos_responsavel ON ativos(responsavel)'
         ]
 
         for idx in indices:
@@ -0,0 +1,330 @@
+"""
+Planos de manutenção recorrente
+Um plano (a cada N dias ou meses, para um ativo ou para todos os ativos
+de uma categoria) mantém apenas a próxima ocorrência de cada ativo na
+fila manutencoes_fila, indexada pela data de vencimento e pela data de
+aviso. Concluir uma ocorrência grava a seguinte; os avisos são enviados
+quando a data de aviso mais próxima chega, sem varrer as manutenções
+"""
+
+import calendar
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+
+import db
+import email_service
+
+UNIDADES = ('dias', 'meses')
+
+# Hora do dia em que os avisos de manutenção vencendo são enviados
+HORA_AVISOS = int(os.getenv('MANUTENCAO_AVISO_HORA', '8'))
+
+COLUNAS_FILA = ('id', 'plano_id', 'ativo_id', 'codigo_id', 'nome', 'tipo', 'descricao', 'responsavel',
+                'vencimento', 'avisar_em', 'notificada_em')
+
+logger = logging.getLogger(__name__)
+
+
+def criar_tabelas(conn):
+    """
+    Cria as tabelas de planos e a fila de ocorrências
+
+    O índice único parcial garante uma única ocorrência pendente por plano
+    e ativo; os índices parciais por vencimento e por data de aviso cobrem
+    apenas as pendentes, então a fila não cresce com o histórico.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS planos_manutencao (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ativo_id INTEGER,
+            categoria_id INTEGER,
+            tipo TEXT NOT NULL DEFAULT 'Preventiva',
+            descricao TEXT NOT NULL,
+            responsavel TEXT,
+            intervalo INTEGER NOT NULL CHECK (intervalo > 0),
+            unidade TEXT NOT NULL CHECK (unidade IN ('dias', 'meses')),
+            antecedencia_dias INTEGER NOT NULL DEFAULT 7,
+            inicio DATE NOT NULL,
+            habilitado INTEGER NOT NULL DEFAULT 1,
+            criado_por TEXT,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CHECK ((ativo_id IS NULL) <> (categoria_id IS NULL))
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_planos_manutencao_categoria ON planos_manutencao(categoria_id)')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS manutencoes_fila (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plano_id INTEGER NOT NULL,
+            ativo_id INTEGER NOT NULL,
+            vencimento DATE NOT NULL,
+            avisar_em DATE NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            notificada_em TIMESTAMP,
+            concluida_em DATE,
+            manutencao_id INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_manutencoes_fila_pendente ON manutencoes_fila(plano_id, ativo_id)
+        WHERE status = 'pendente'
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_manutencoes_fila_vencimento ON manutencoes_fila(vencimento)
+        WHERE status = 'pendente'
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_manutencoes_fila_aviso ON manutencoes_fila(avisar_em)
+        WHERE status = 'pendente' AND notificada_em IS NULL
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_manutencoes_fila_ativo ON manutencoes_fila(ativo_id, status)')
+    # Manutenções registradas pela fila (seus avisos saem da fila, não do proximo_agendamento)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_manutencoes_fila_manutencao ON manutencoes_fila(manutencao_id)
+        WHERE manutencao_id IS NOT NULL
+    ''')
+
+
+def somar(data, intervalo, unidade):
+    """Data somada de 'intervalo' dias ou meses (31/01 + 1 mês = 28 ou 29/02)"""
+    if unidade == 'dias':
+        return data + timedelta(days=intervalo)
+    meses = data.year * 12 + data.month - 1 + intervalo
+    ano, mes = divmod(meses, 12)
+    mes += 1
+    return date(ano, mes, min(data.day, calendar.monthrange(ano, mes)[1]))
+
+
+def _data(valor):
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+
+
+def _enfileirar(conn, plano_id, ativo_ids, vencimento, antecedencia):
+    """Grava a ocorrência pendente dos ativos (ignora os que já têm uma)"""
+    avisar_em = vencimento - timedelta(days=antecedencia)
+    conn.executemany('''
+        INSERT OR IGNORE INTO manutencoes_fila (plano_id, ativo_id, vencimento, avisar_em)
+        VALUES (?, ?, ?, ?)
+    ''', [(plano_id, ativo_id, vencimento.isoformat(), avisar_em.isoformat()) for ativo_id in ativo_ids])
+
+
+def criar_plano(conn, descricao, intervalo, unidade, inicio, ativo_id=None, categoria_id=None,
+                tipo='Preventiva', responsavel=None, antecedencia_dias=7, usuario=None):
+    """
+    Cria um plano e a primeira ocorrência (em 'inicio') de cada ativo coberto
+
+    Returns:
+        id do plano
+    """
+    if unidade not in UNIDADES:
+        raise ValueError(f'Unidade inválida: {unidade}')
+    if int(intervalo) <= 0:
+        raise ValueError('O intervalo deve ser maior que zero')
+    if (ativo_id is None) == (categoria_id is None):
+        raise ValueError('Informe um ativo ou uma categoria para o plano')
+
+    inicio = _data(inicio)
+    cursor = conn.execute('''
+        INSERT INTO planos_manutencao (ativo_id, categoria_id, tipo, descricao, responsavel,
+                                       intervalo, unidade, antecedencia_dias, inicio, criado_por)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (ativo_id, categoria_id, tipo, descricao, responsavel, int(intervalo), unidade,
+          int(antecedencia_dias), inicio.isoformat(), usuario))
+    plano_id = cursor.lastrowid
+
+    if ativo_id is not None:
+        ativo_ids = [ativo_id]
+    else:
+        ativo_ids = [linha[0] for linha in conn.execute('SELECT id FROM ativos WHERE categoria_id = ?',
+                                                         (categoria_id,))]
+    _enfileirar(conn, plano_id, ativo_ids, inicio, int(antecedencia_dias))
+    return plano_id
+
+
+def desabilitar_plano(conn, plano_id):
+    """Desabilita o plano e cancela suas ocorrências pendentes"""
+    conn.execute('UPDATE planos_manutencao SET habilitado = 0 WHERE id = ?', (plano_id,))
+    conn.execute("UPDATE manutencoes_fila SET status = 'cancelada' WHERE plano_id = ? AND status = 'pendente'",
+                 (plano_id,))
+
+
+def atualizar_ativo(conn, ativo_id, categoria_id, hoje=None):
+    """
+    Ajusta a fila a um ativo criado ou que mudou de categoria
+
+    Ocorrências de planos de outra categoria são canceladas; os planos da
+    categoria atual entram com o primeiro vencimento um intervalo depois
+    de hoje (ou no início do plano, se for posterior).
+    """
+    hoje = hoje or date.today()
+    conn.execute('''
+        UPDATE manutencoes_fila SET status = 'cancelada'
+        WHERE ativo_id = ? AND status = 'pendente' AND plano_id IN (
+            SELECT id FROM planos_manutencao WHERE categoria_id IS NOT NULL AND categoria_id IS NOT ?
+        )
+    ''', (ativo_id, categoria_id))
+
+    if categoria_id is None:
+        return
+    planos = conn.execute('''
+        SELECT id, intervalo, unidade, antecedencia_dias, inicio
+        FROM planos_manutencao
+        WHERE categoria_id = ? AND habilitado = 1
+    ''', (categoria_id,)).fetchall()
+    for plano_id, intervalo, unidade, antecedencia, inicio in planos:
+        vencimento = max(_data(inicio), somar(hoje, intervalo, unidade))
+        _enfileirar(conn, plano_id, [ativo_id], vencimento, antecedencia)
+
+
+def remover_ativo(conn, ativo_id):
+    """Cancela as ocorrências pendentes de um ativo excluído"""
+    conn.execute("UPDATE manutencoes_fila SET status = 'cancelada' WHERE ativo_id = ? AND status = 'pendente'",
+                 (ativo_id,))
+
+
+def concluir(conn, ocorrencia_id, manutencao_id, data_conclusao):
+    """
+    Conclui uma ocorrência pendente e grava a próxima do mesmo plano
+
+    O próximo vencimento é contado a partir do vencimento atual, mantendo o
+    calendário do plano; se a conclusão atrasou além de um intervalo, é
+    contado a partir da data de conclusão.
+
+    Returns:
+        Data do próximo vencimento, ou None se a ocorrência não estava
+        pendente (já concluída em outra requisição) ou o plano foi desabilitado
+    """
+    data_conclusao = _data(data_conclusao)
+    linha = conn.execute('''
+        SELECT f.plano_id, f.ativo_id, f.vencimento, p.intervalo, p.unidade, p.antecedencia_dias, p.habilitado
+        FROM manutencoes_fila f
+        JOIN planos_manutencao p ON p.id = f.plano_id
+        WHERE f.id = ?
+    ''', (ocorrencia_id,)).fetchone()
+    if not linha:
+        return None
+    plano_id, ativo_id, vencimento, intervalo, unidade, antecedencia, habilitado = linha
+
+    cursor = conn.execute('''
+        UPDATE manutencoes_fila SET status = 'concluida', concluida_em = ?, manutencao_id = ?
+        WHERE id = ? AND status = 'pendente'
+    ''', (data_conclusao.isoformat(), manutencao_id, ocorrencia_id))
+    if cursor.rowcount == 0 or not habilitado:
+        return None
+
+    proximo = somar(_data(vencimento), intervalo, unidade)
+    if proximo <= data_conclusao:
+        proximo = somar(data_conclusao, intervalo, unidade)
+    _enfileirar(conn, plano_id, [ativo_id], proximo, antecedencia)
+    return proximo
+
+
+# ==================== CONSULTAS ====================
+
+def _consulta_fila(where):
+    return f'''
+        SELECT f.id, f.plano_id, f.ativo_id, a.codigo_id, a.nome, p.tipo, p.descricao,
+               COALESCE(p.responsavel, a.responsavel), f.vencimento, f.avisar_em, f.notificada_em
+        FROM manutencoes_fila f
+        JOIN planos_manutencao p ON p.id = f.plano_id
+        JOIN ativos a ON a.id = f.ativo_id
+        WHERE {where}
+    '''
+
+
+def pendentes_ativo(conn, ativo_id):
+    """Ocorrências pendentes de um ativo (dicts), vencimento mais próximo primeiro"""
+    linhas = conn.execute(_consulta_fila("f.ativo_id = ? AND f.status = 'pendente'") + ' ORDER BY f.vencimento',
+                          (ativo_id,)).fetchall()
+    return [dict(zip(COLUNAS_FILA, linha)) for linha in linhas]
+
+
+def vencendo(conn, ate, limite=200):
+    """Ocorrências pendentes com vencimento até 'ate' (inclui as atrasadas), pelo índice de vencimento"""
+    linhas = conn.execute(
+        _consulta_fila("f.status = 'pendente' AND f.vencimento <= ?") + ' ORDER BY f.vencimento LIMIT ?',
+        (_data(ate).isoformat(), limite)).fetchall()
+    return [dict(zip(COLUNAS_FILA, linha)) for linha in linhas]
+
+
+def listar_planos(conn):
+    """Planos com o alvo (ativo ou categoria) e o número de ocorrências pendentes"""
+    return conn.execute('''
+        SELECT p.id, p.tipo, p.descricao, p.intervalo, p.unidade, p.antecedencia_dias, p.inicio,
+               p.habilitado, a.codigo_id, a.nome, c.nome,
+               (SELECT COUNT(*) FROM manutencoes_fila f WHERE f.plano_id = p.id AND f.status = 'pendente'),
+               (SELECT MIN(f.vencimento) FROM manutencoes_fila f WHERE f.plano_id = p.id AND f.status = 'pendente'),
+               p.responsavel, p.ativo_id
+        FROM planos_manutencao p
+        LEFT JOIN ativos a ON a.id = p.ativo_id
+        LEFT JOIN categorias c ON c.id = p.categoria_id
+        ORDER BY p.habilitado DESC, p.criado_em DESC
+    ''').fetchall()
+
+
+# ==================== AVISOS ====================
+
+def proximo_aviso():
+    """
+    Momento do próximo aviso a enviar (menor data de aviso ainda não
+    notificada, pelo índice), ou None se não houver nada a avisar
+
+    Usado pelo agendador para acordar apenas quando há algo a enviar.
+    """
+    if not email_service.ALERTAS_HABILITADOS:
+        return None
+    with db.conectar() as conn:
+        avisar_em = conn.execute('''
+            SELECT MIN(avisar_em) FROM manutencoes_fila
+            WHERE status = 'pendente' AND notificada_em IS NULL
+        ''').fetchone()[0]
+    if avisar_em is None:
+        return None
+    return datetime.combine(_data(avisar_em), time(HORA_AVISOS))
+
+
+def processar_vencidos(hoje=None):
+    """
+    Envia um aviso com as ocorrências cuja data de aviso chegou e as marca
+    como notificadas
+
+    Returns:
+        Número de ocorrências avisadas
+
+    Raises:
+        RuntimeError: se o email não puder ser enviado (o agendador tenta de novo)
+    """
+    hoje = hoje or date.today()
+    with db.conectar() as conn:
+        linhas = conn.execute('''
+            SELECT f.id, f.ativo_id, p.tipo, a.codigo_id, a.nome, f.vencimento,
+                   p.descricao, COALESCE(p.responsavel, a.responsavel)
+            FROM manutencoes_fila f
+            JOIN planos_manutencao p ON p.id = f.plano_id
+            LEFT JOIN ativos a ON a.id = f.ativo_id
+            WHERE f.status = 'pendente' AND f.notificada_em IS NULL AND f.avisar_em <= ?
+            ORDER BY f.vencimento
+        ''', (hoje.isoformat(),)).fetchall()
+        if not linhas:
+            return 0
+
+        # Mesmo formato de email_service.verificar_manutencoes_proximas
+        avisos = [(id_, ativo_id, tipo, codigo_id, nome, vencimento, (_data(vencimento) - hoje).days,
+                   descricao, responsavel)
+                  for id_, ativo_id, tipo, codigo_id, nome, vencimento, descricao, responsavel in linhas
+                  if codigo_id is not None]
+
+        if avisos:
+            html, texto = email_service.criar_email_alerta_manutencao(avisos)
+            assunto = f"🔧 Lembrete: {len(avisos)} manutenção(ões) planejada(s) vencendo"
+            if not email_service.enviar_email(email_service.DESTINATARIOS_ALERTAS, assunto, html, texto):
+                raise RuntimeError('Não foi possível enviar o aviso de manutenções planejadas')
+
+        conn.executemany("UPDATE manutencoes_fila SET notificada_em = CURRENT_TIMESTAMP WHERE id = ?",
+                         [(linha[0],) for linha in linhas])
+        conn.commit()
+
+    logger.info(f'Aviso de manutenções planejadas enviado: {len(avisos)} ocorrência(s)')
+    return len(avisos)
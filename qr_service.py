@@ -0,0 +1,107 @@
+"""
+Geração de QR Codes com perfis de codificação
+Cada perfil ajusta correção de erro, tamanho do módulo e borda ao uso da etiqueta
+"""
+
+import os
+import qrcode
+from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H
+
+import desempenho
+import metricas
+
+QR_FOLDER = "static/qrcodes"
+
+NIVEIS_CORRECAO = {
+    'L': ERROR_CORRECT_L,
+    'M': ERROR_CORRECT_M,
+    'Q': ERROR_CORRECT_Q,
+    'H': ERROR_CORRECT_H,
+}
+
+# Perfis de codificação (medidos com benchmark_qrcode.py)
+#   correcao: nível de correção de erro (L=7%, M=15%, Q=25%, H=30%)
+#   tamanho_modulo: pixels por módulo do QR Code
+#   borda: módulos de margem branca (o padrão da norma é 4)
+#   otimizar: tamanho mínimo de trecho para otimização de modo (0 desativa)
+#   png_otimizado: compressão PNG extra (arquivo menor, gravação mais lenta)
+PERFIS_QR = {
+    'tela': {
+        'correcao': 'M',
+        'tamanho_modulo': 10,
+        'borda': 4,
+        'otimizar': 20,
+        'png_otimizado': False,
+    },
+    'etiqueta_pequena': {
+        'correcao': 'L',
+        'tamanho_modulo': 4,
+        'borda': 4,
+        'otimizar': 0,
+        'png_otimizado': False,
+    },
+    'etiqueta_grande': {
+        'correcao': 'Q',
+        'tamanho_modulo': 8,
+        'borda': 4,
+        'otimizar': 20,
+        'png_otimizado': True,
+    },
+}
+
+QR_PERFIL = os.getenv('QR_PERFIL', 'tela')
+
+
+def get_perfil(nome=None):
+    """Retorna a configuração do perfil (padrão: QR_PERFIL)"""
+    nome = nome or QR_PERFIL
+    if nome not in PERFIS_QR:
+        raise ValueError(f"Perfil de QR Code desconhecido: {nome}")
+    return PERFIS_QR[nome]
+
+
+def criar_qrcode(dados, perfil=None, image_factory=None, **ajustes):
+    """
+    Codifica os dados em um QR Code
+
+    Args:
+        dados: Texto/URL a codificar
+        perfil: Nome do perfil (padrão: QR_PERFIL)
+        image_factory: Fábrica de imagem do qrcode (padrão: PNG 1 bit)
+        ajustes: Sobrescreve chaves do perfil (usado pelo benchmark)
+
+    Returns:
+        Imagem do QR Code
+    """
+    config = dict(get_perfil(perfil), **ajustes)
+
+    qr = qrcode.QRCode(
+        version=config.get('versao'),
+        error_correction=NIVEIS_CORRECAO[config['correcao']],
+        box_size=config['tamanho_modulo'],
+        border=config['borda'],
+        image_factory=image_factory,
+    )
+    qr.add_data(dados, optimize=config['otimizar'])
+    qr.make(fit=config.get('versao') is None)
+    return qr.make_image()
+
+
+@desempenho.medido('qr')
+def salvar_qrcode_ativo(ativo_id, base_url, pasta=QR_FOLDER, perfil=None):
+    """
+    Gera e grava o QR Code de um ativo em static/qrcodes/ativo_<id>.png
+
+    Returns:
+        Caminho do arquivo gravado
+    """
+    config = get_perfil(perfil)
+    img = criar_qrcode(f"{base_url}/ver/{ativo_id}", perfil)
+    caminho = f"{pasta}/ativo_{ativo_id}.png"
+
+    if config['png_otimizado']:
+        img.save(caminho, optimize=True)
+    else:
+        img.save(caminho)
+    metricas.QRCODES.inc()
+    return caminho
@@ -4,8 +4,8 @@ Script para regenerar todos os QR codes com o novo URL da rede
 """
 
 import sqlite3
-import qrcode
 import os
+import qr_service
 
 DB = "ativos.db"
 QR_FOLDER = "static/qrcodes"
@@ -30,6 +30,7 @@ def regenerar_qrcodes():
 
         print(f"Regenerando QR codes para {len(ativos)} ativos...")
         print(f"Usando URL base: {BASE_URL}")
+        print(f"Perfil de QR Code: {qr_service.QR_PERFIL}")
         print("-" * 60)
 
         # Regenerar QR code para cada ativo
@@ -42,15 +43,8 @@ def regenerar_qrcodes():
             nome = ativo[2]
 
             try:
-                # Gerar URL completo
-                url = f"{BASE_URL}/ver/{ativo_id}"
-
-                # Criar QR code
-                img = qrcode.make(url)
-
-                # Salvar QR code
-                qr_path = f"{QR_FOLDER}/ativo_{ativo_id}.png"
-                img.save(qr_path)
+                # Criar e salvar QR code com o perfil configurado (QR_PERFIL)
+                qr_service.salvar_qrcode_ativo(ativo_id, BASE_URL, QR_FOLDER)
 
                 print(f"✓ QR Code regenerado: {codigo} - {nome}")
                 sucesso += 1
@@ -0,0 +1,286 @@
+"""
+Fila de relatórios gerados em segundo plano
+Exportações grandes viram jobs executados por um pool de threads; o
+arquivo gerado fica guardado com uma chave que combina o tipo, o filtro
+e a versão dos dados, e um pedido idêntico posterior recebe o mesmo
+arquivo até que os dados mudem
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import versao_dados
+
+# Fora de static/: os arquivos só saem pelas rotas com login
+PASTA = os.getenv('RELATORIOS_PASTA', 'relatorios_gerados')
+WORKERS = int(os.getenv('RELATORIOS_WORKERS', '2'))
+
+# Jobs pendentes/executando há mais que isso são dados como perdidos (worker reiniciado)
+TEMPO_MAXIMO = int(os.getenv('RELATORIOS_TEMPO_MAXIMO', '900'))
+
+# Arquivos e registros de jobs mais antigos que isso são apagados pela limpeza
+RETENCAO_HORAS = int(os.getenv('RELATORIOS_RETENCAO_HORAS', '24'))
+
+# A chave (e o nome do arquivo) leva o segredo da aplicação (app.secret_key,
+# definido pelo app), para que não possa ser deduzida a partir do tipo, do
+# filtro e das versões dos dados
+SEGREDO = b''
+
+# Colunas do ativo permitidas como filtro do relatório de ativos
+FILTROS_ATIVOS = ('estado', 'localizacao', 'responsavel')
+
+COLUNAS = ('id', 'tipo', 'parametros', 'chave', 'status', 'arquivo', 'linhas', 'erro',
+           'criado_por', 'criado_em', 'concluido_em')
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+
+
+def criar_tabelas(conn):
+    """
+    Cria a tabela relatorio_jobs
+
+    O índice único parcial garante no máximo um job ativo por chave, mesmo
+    com pedidos simultâneos em workers diferentes.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS relatorio_jobs (
+            id TEXT PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            parametros TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            arquivo TEXT,
+            linhas INTEGER,
+            erro TEXT,
+            criado_por TEXT,
+            criado_em REAL NOT NULL,
+            concluido_em REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_relatorio_jobs_chave ON relatorio_jobs(chave, status)')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_relatorio_jobs_ativo ON relatorio_jobs(chave)
+        WHERE status IN ('pendente', 'executando')
+    ''')
+
+
+# ==================== TIPOS DE RELATÓRIO ====================
+
+def _gerar_ativos(conn, parametros, caminho):
+    import exportacao
+
+    campo = parametros.get('campo')
+    if campo is None:
+        return exportacao.exportar_consulta_excel(conn, 'SELECT * FROM ativos', (), caminho)
+    if campo not in FILTROS_ATIVOS:
+        raise ValueError(f'Filtro de relatório inválido: {campo}')
+    return exportacao.exportar_consulta_excel(
+        conn, f'SELECT * FROM ativos WHERE {campo} = ?', (parametros['valor'],), caminho)
+
+
+def _gerar_inventario(conn, parametros, caminho):
+    import exportacao
+
+    inventario = conn.execute('SELECT * FROM inventarios WHERE id = ?', (parametros['inventario_id'],)).fetchone()
+    if not inventario:
+        raise ValueError('Inventário não encontrado')
+
+    itens = conn.execute('''
+        SELECT
+            a.codigo_id, a.nome, a.sn, a.localizacao, a.responsavel, c.nome,
+            ii.status, ii.conferido_por, ii.data_conferencia, ii.observacao
+        FROM inventario_itens ii
+        JOIN ativos a ON ii.ativo_id = a.id
+        LEFT JOIN categorias c ON a.categoria_id = c.id
+        WHERE ii.inventario_id = ?
+        ORDER BY ii.status, a.codigo_id
+    ''', (parametros['inventario_id'],)).fetchall()
+
+    exportacao.exportar_inventario_excel(inventario, itens, caminho)
+    return len(itens)
+
+
+# tipo -> (tabelas das quais o relatório depende, função que gera o arquivo)
+TIPOS = {
+    'ativos': (('ativos',), _gerar_ativos),
+    'inventario': (('inventarios', 'inventario_itens', 'ativos', 'categorias'), _gerar_inventario),
+}
+
+
+# ==================== FILA ====================
+
+def chave_relatorio(tipo, parametros, versoes):
+    """HMAC (com SEGREDO) do tipo, dos parâmetros e das versões das tabelas do relatório"""
+    tabelas, _ = TIPOS[tipo]
+    conteudo = json.dumps({
+        'tipo': tipo,
+        'parametros': parametros,
+        'versoes': {t: versoes.get(t, 0) for t in tabelas},
+    }, sort_keys=True, ensure_ascii=False)
+    return hmac.new(SEGREDO, conteudo.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def _como_dict(linha):
+    if linha is None:
+        return None
+    job = dict(zip(COLUNAS, linha))
+    job['parametros'] = json.loads(job['parametros'])
+    return job
+
+
+def _buscar(conn, where, params):
+    return conn.execute(f"SELECT {', '.join(COLUNAS)} FROM relatorio_jobs WHERE {where}", params).fetchone()
+
+
+def _pool():
+    """Pool de threads do processo (recriado após um fork)"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='relatorio')
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def submeter(tipo, parametros, usuario=None):
+    """
+    Pede um relatório e devolve o job correspondente
+
+    Se o mesmo relatório já foi gerado com a versão atual dos dados, o job
+    concluído é devolvido sem gerar nada; se já está na fila, o job em
+    andamento é devolvido. Caso contrário um novo job entra na fila.
+
+    Returns:
+        Dict com as colunas de relatorio_jobs
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f'Tipo de relatório desconhecido: {tipo}')
+
+    with db.conectar() as conn:
+        chave = chave_relatorio(tipo, parametros, versao_dados.obter_versoes(conn))
+
+        concluido = _como_dict(_buscar(
+            conn, "chave = ? AND status = 'concluido' ORDER BY concluido_em DESC LIMIT 1", (chave,)))
+        if concluido and (concluido['arquivo'] is None or os.path.exists(concluido['arquivo'])):
+            return concluido
+
+        # Job de um worker que morreu no meio da geração: libera a chave
+        conn.execute('''
+            UPDATE relatorio_jobs SET status = 'erro', erro = 'Tempo esgotado', concluido_em = ?
+            WHERE chave = ? AND status IN ('pendente', 'executando') AND criado_em < ?
+        ''', (time.time(), chave, time.time() - TEMPO_MAXIMO))
+
+        job_id = uuid.uuid4().hex
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO relatorio_jobs (id, tipo, parametros, chave, criado_por, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (job_id, tipo, json.dumps(parametros, ensure_ascii=False), chave, usuario, time.time()))
+        novo = cursor.rowcount == 1
+        conn.commit()
+
+        # O novo job ou o que outro pedido simultâneo acabou de criar
+        job = _como_dict(_buscar(conn, 'chave = ? ORDER BY criado_em DESC LIMIT 1', (chave,)))
+
+    if novo:
+        _pool().submit(_executar, job_id)
+    return job
+
+
+def _executar(job_id):
+    """Gera o arquivo do job (executado no pool de threads)"""
+    with db.conectar() as conn:
+        job = _como_dict(_buscar(conn, 'id = ?', (job_id,)))
+        conn.execute("UPDATE relatorio_jobs SET status = 'executando' WHERE id = ?", (job_id,))
+        conn.commit()
+
+    _, gerar = TIPOS[job['tipo']]
+    os.makedirs(PASTA, exist_ok=True)
+    caminho = os.path.join(PASTA, f"{job['chave']}.xlsx")
+    temporario = f'{caminho}.{job_id}.tmp'
+
+    inicio = time.perf_counter()
+    try:
+        with db.conectar() as conn:
+            with open(temporario, 'wb') as arquivo:
+                linhas = gerar(conn, job['parametros'], arquivo)
+        # Consulta sem resultados: nada é gravado e o job conclui sem arquivo
+        if os.path.getsize(temporario):
+            os.replace(temporario, caminho)
+        else:
+            os.remove(temporario)
+            caminho = None
+    except Exception as e:
+        logger.exception(f"Erro ao gerar relatório {job['tipo']} {job['parametros']}")
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        with db.conectar() as conn:
+            conn.execute("UPDATE relatorio_jobs SET status = 'erro', erro = ?, concluido_em = ? WHERE id = ?",
+                         (str(e), time.time(), job_id))
+        return
+
+    with db.conectar() as conn:
+        conn.execute('''
+            UPDATE relatorio_jobs SET status = 'concluido', arquivo = ?, linhas = ?, concluido_em = ?
+            WHERE id = ?
+        ''', (caminho, linhas, time.time(), job_id))
+    logger.info(f"Relatório {job['tipo']} gerado: {linhas} linhas em {time.perf_counter() - inicio:.1f} s",
+                extra={'job_id': job_id, 'parametros': job['parametros']})
+
+
+def obter(job_id):
+    """Job pelo id (dict) ou None"""
+    with db.conectar() as conn:
+        return _como_dict(_buscar(conn, 'id = ?', (job_id,)))
+
+
+def aguardar(job_id, timeout):
+    """
+    Espera o job terminar por até 'timeout' segundos
+
+    Relatórios pequenos ficam prontos nesse intervalo e são entregues na
+    própria requisição, sem passar pela página de acompanhamento.
+
+    Returns:
+        O job (concluído ou não)
+    """
+    limite = time.monotonic() + timeout
+    while True:
+        job = obter(job_id)
+        if job is None or job['status'] in ('concluido', 'erro') or time.monotonic() >= limite:
+            return job
+        time.sleep(0.1)
+
+
+def limpar_antigos(horas=RETENCAO_HORAS):
+    """
+    Apaga jobs mais antigos que 'horas' e os arquivos que deixaram de ser usados
+
+    Returns:
+        Número de arquivos removidos
+    """
+    with db.conectar() as conn:
+        conn.execute("DELETE FROM relatorio_jobs WHERE criado_em < ? AND status NOT IN ('pendente', 'executando')",
+                     (time.time() - horas * 3600,))
+        em_uso = {linha[0] for linha in conn.execute('SELECT arquivo FROM relatorio_jobs WHERE arquivo IS NOT NULL')}
+        conn.commit()
+
+    if not os.path.isdir(PASTA):
+        return 0
+
+    removidos = 0
+    for nome in os.listdir(PASTA):
+        caminho = os.path.join(PASTA, nome)
+        abandonado = nome.endswith('.tmp') and os.path.getmtime(caminho) < time.time() - TEMPO_MAXIMO
+        if (nome.endswith('.xlsx') and caminho not in em_uso) or abandonado:
+            os.remove(caminho)
+            removidos += 1
+    return removidos
@@ -347,6 +347,45 @@ function debounce(func, wait) {
   };
 }
 
+// ========================================
+// AUTOCOMPLETAR (localização, responsável...)
+// ========================================
+
+// Campos com data-autocompletar="<campo>" recebem um <datalist>
+// preenchido por /api/autocompletar/<campo>?q=<prefixo>
+document.addEventListener('DOMContentLoaded', function() {
+  document.querySelectorAll('input[data-autocompletar]').forEach(function(input) {
+    const campo = input.dataset.autocompletar;
+    const lista = document.createElement('datalist');
+    lista.id = `autocompletar-${input.id || campo}`;
+    input.setAttribute('list', lista.id);
+    input.after(lista);
+
+    let ultimaBusca = null;
+    const buscar = debounce(function() {
+      const prefixo = input.value.trim();
+      if (prefixo === ultimaBusca) return;
+      ultimaBusca = prefixo;
+
+      fetch(`/api/autocompletar/${campo}?q=${encodeURIComponent(prefixo)}`)
+        .then(response => response.ok ? response.json() : [])
+        .then(sugestoes => {
+          lista.innerHTML = '';
+          sugestoes.forEach(sugestao => {
+            const opcao = document.createElement('option');
+            opcao.value = sugestao.valor;
+            opcao.label = `${sugestao.total} ativo(s)`;
+            lista.appendChild(opcao);
+          });
+        })
+        .catch(() => {});
+    }, 150);
+
+    input.addEventListener('input', buscar);
+    input.addEventListener('focus', buscar);
+  });
+});
+
 // ========================================
 // PRINT QR CODE
 // ========================================
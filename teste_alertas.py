@@ -3,6 +3,7 @@
 Script de teste para verificar o sistema de alertas por email
 """
 
+import logging
 import sqlite3
 import email_service
 from datetime import datetime, timedelta
@@ -208,6 +209,9 @@ def verificar_configuracao():
 
 
 if __name__ == '__main__':
+    # Mensagens do email_service no console
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     print("\n" + "🧪 " + "="*57)
     print("   TESTE COMPLETO DO SISTEMA DE ALERTAS POR EMAIL")
     print("   " + "="*57)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Teste de carga de ponta a ponta
+Simula usuários concorrentes contra um servidor em execução, com a mistura
+de operações do dia a dia: login, leitura de QR Code (/ver), busca,
+dashboard, página de detalhe, conferência de inventário e exportação.
+Ao final mostra, por cenário, a vazão e as latências p50/p95/p99
+
+Uso:
+  python gerar_dados.py --ativos 50000 --banco carga.db
+  python teste_carga.py --url http://localhost:5000 --banco carga.db
+  python teste_carga.py --usuarios 20 --duracao 120          # Mais pressão
+  python teste_carga.py --salvar resultado.json              # Guarda o resultado
+  python teste_carga.py --comparar resultado.json            # Compara com execução anterior
+
+Os ids de ativos, termos de busca e o inventário conferido são lidos do
+banco (--banco), que deve ser o mesmo usado pelo servidor.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import db
+
+# Cenários e peso de cada um na mistura de operações
+CENARIOS = {
+    'ver_qrcode': 30,
+    'busca': 20,
+    'detalhe': 15,
+    'dashboard': 10,
+    'lista_ativos': 8,
+    'busca_aproximada': 5,
+    'inventario_conferir': 8,
+    'login': 2,
+    'exportar': 2,
+}
+
+# Widgets que a página do dashboard busca depois de carregar (/api/dashboard/<widget>)
+WIDGETS_DASHBOARD = ('totais', 'estados', 'localizacoes', 'garantias', 'manutencoes', 'ultimos')
+
+# Trocas comuns de digitação usadas na busca aproximada
+ERROS_DIGITACAO = [('o', '0'), ('i', 'l'), ('e', 'a'), ('s', 'z'), ('n', 'm')]
+
+
+def _percentil(ordenados, p):
+    """Percentil pelo posto mais próximo (lista já ordenada)"""
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados) + 0.5)) - 1))]
+
+
+class Amostras:
+    """Latências e erros por cenário, compartilhados entre as threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tempos = {}
+        self.erros = {}
+
+    def registrar(self, cenario, duracao, erro=None):
+        with self._lock:
+            self.tempos.setdefault(cenario, []).append(duracao)
+            if erro:
+                erros = self.erros.setdefault(cenario, {})
+                erros[erro] = erros.get(erro, 0) + 1
+
+    def resumo(self, duracao_total):
+        resultado = {}
+        for cenario, tempos in sorted(self.tempos.items()):
+            ordenados = sorted(t * 1000 for t in tempos)
+            resultado[cenario] = {
+                'requisicoes': len(ordenados),
+                'erros': sum(self.erros.get(cenario, {}).values()),
+                'vazao': len(ordenados) / duracao_total,
+                'p50': _percentil(ordenados, 50),
+                'p95': _percentil(ordenados, 95),
+                'p99': _percentil(ordenados, 99),
+                'maximo': ordenados[-1],
+            }
+        return resultado
+
+
+class DadosCarga:
+    """Ids e termos reais do banco usados para montar as requisições"""
+
+    def __init__(self, banco, limite=20000):
+        conn = sqlite3.connect(f'file:{banco}?mode=ro', uri=True)
+        try:
+            self.ativos = [linha[0] for linha in conn.execute(
+                'SELECT id FROM ativos ORDER BY RANDOM() LIMIT ?', (limite,))]
+            nomes = [linha[0] for linha in conn.execute(
+                'SELECT DISTINCT nome FROM ativos WHERE nome IS NOT NULL LIMIT 500')]
+            self.localizacoes = [linha[0] for linha in conn.execute(
+                'SELECT DISTINCT localizacao FROM ativos WHERE localizacao IS NOT NULL LIMIT 200')]
+            self.codigos = [linha[0] for linha in conn.execute(
+                'SELECT codigo_id FROM ativos ORDER BY RANDOM() LIMIT 2000')]
+            inventario = conn.execute(
+                "SELECT id FROM inventarios WHERE status = 'Em Andamento' ORDER BY total_ativos DESC LIMIT 1"
+            ).fetchone()
+            self.inventario = inventario[0] if inventario else None
+            self.itens_inventario = [linha[0] for linha in conn.execute(
+                'SELECT ativo_id FROM inventario_itens WHERE inventario_id = ? LIMIT ?',
+                (self.inventario, limite))] if self.inventario else []
+        finally:
+            conn.close()
+
+        self.palavras = sorted({palavra for nome in nomes for palavra in nome.split() if len(palavra) >= 4})
+        if not self.ativos:
+            raise SystemExit('❌ Banco sem ativos. Gere dados com: python gerar_dados.py')
+
+
+class UsuarioVirtual:
+    """Um navegador com sessão própria executando cenários sorteados"""
+
+    def __init__(self, url, usuario, senha, dados, amostras, rnd):
+        self.url = url.rstrip('/')
+        self.usuario = usuario
+        self.senha = senha
+        self.dados = dados
+        self.amostras = amostras
+        self.rnd = rnd
+        self._abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def _requisicao(self, caminho, dados=None):
+        """Executa a requisição e devolve (status, corpo)"""
+        corpo = urllib.parse.urlencode(dados).encode() if dados is not None else None
+        try:
+            with self._abridor.open(self.url + caminho, data=corpo, timeout=60) as resposta:
+                return resposta.status, resposta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def _medir(self, cenario, caminho, dados=None):
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            status, corpo = self._requisicao(caminho, dados)
+            if status >= 400:
+                erro = f'HTTP {status}'
+            elif b'name="password"' in corpo and cenario != 'login':
+                erro = 'sessão perdida'
+        except (urllib.error.URLError, OSError) as e:
+            erro = type(e).__name__
+        self.amostras.registrar(cenario, time.perf_counter() - inicio, erro)
+        return erro
+
+    def login(self, medir=True):
+        dados = {'username': self.usuario, 'password': self.senha}
+        if medir:
+            return self._medir('login', '/login', dados)
+        return self._requisicao('/login', dados)
+
+    def executar(self, cenario):
+        dados = self.dados
+        rnd = self.rnd
+        if cenario == 'ver_qrcode':
+            return self._medir(cenario, f'/ver/{rnd.choice(dados.ativos)}')
+        if cenario == 'detalhe':
+            return self._medir(cenario, f'/ativo/{rnd.choice(dados.ativos)}')
+        if cenario == 'dashboard':
+            erro = self._medir(cenario, '/dashboard')
+            for widget in WIDGETS_DASHBOARD:
+                self._medir('dashboard_widget', f'/api/dashboard/{widget}')
+            return erro
+        if cenario == 'lista_ativos':
+            local = rnd.choice(dados.localizacoes) if dados.localizacoes and rnd.random() < 0.5 else None
+            return self._medir(cenario, '/ativos' + (f'?{urllib.parse.urlencode({"localizacao": local})}'
+                                                     if local else ''))
+        if cenario == 'busca':
+            termo = rnd.choice(dados.codigos if rnd.random() < 0.4 or not dados.palavras else dados.palavras)
+            return self._medir(cenario, f'/ativos?{urllib.parse.urlencode({"busca": termo})}')
+        if cenario == 'busca_aproximada':
+            termo = rnd.choice(dados.palavras or dados.codigos).lower()
+            for certo, errado in rnd.sample(ERROS_DIGITACAO, 2):
+                termo = termo.replace(certo, errado, 1)
+            return self._medir(cenario, f'/ativos?{urllib.parse.urlencode({"busca": termo})}')
+        if cenario == 'inventario_conferir':
+            if not dados.itens_inventario:
+                return self._medir(cenario, '/inventarios')
+            status = 'Conferido' if rnd.random() < 0.95 else 'Não Localizado'
+            return self._medir(cenario,
+                               f'/inventario/{dados.inventario}/conferir/{rnd.choice(dados.itens_inventario)}',
+                               {'status': status, 'observacao': 'teste de carga'})
+        if cenario == 'login':
+            self._requisicao('/logout')
+            return self.login()
+        if cenario == 'exportar':
+            return self._medir(cenario, '/exportar')
+        raise ValueError(f'Cenário desconhecido: {cenario}')
+
+
+def executar_carga(args, dados, cenarios):
+    """Roda os usuários virtuais pelo tempo pedido e devolve (amostras, duração)"""
+    amostras = Amostras()
+    parar = threading.Event()
+    nomes = list(cenarios)
+    pesos = [cenarios[nome] for nome in nomes]
+
+    def trabalhador(numero):
+        rnd = random.Random(None if args.semente is None else args.semente + numero)
+        usuario = UsuarioVirtual(args.url, args.usuario, args.senha, dados, amostras, rnd)
+        usuario.login(medir=False)
+        while not parar.is_set():
+            usuario.executar(rnd.choices(nomes, weights=pesos)[0])
+            if args.pausa:
+                parar.wait(rnd.expovariate(1 / args.pausa))
+
+    # Aquecimento: caches, conexões e JIT do servidor antes da medição
+    if args.aquecimento:
+        aquecedor = UsuarioVirtual(args.url, args.usuario, args.senha, dados, Amostras(), random.Random(0))
+        aquecedor.login(medir=False)
+        fim = time.time() + args.aquecimento
+        while time.time() < fim:
+            aquecedor.executar(random.choice([n for n in nomes if n not in ('exportar', 'login')] or nomes))
+
+    threads = [threading.Thread(target=trabalhador, args=(i,), daemon=True) for i in range(args.usuarios)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    try:
+        while time.perf_counter() - inicio < args.duracao:
+            time.sleep(min(1.0, args.duracao))
+            decorrido = time.perf_counter() - inicio
+            total = sum(len(t) for t in list(amostras.tempos.values()))
+            print(f"  {decorrido:5.0f}s  {total:>8} requisições  ({total / decorrido:7.1f} req/s)",
+                  end='\r', flush=True)
+    except KeyboardInterrupt:
+        print("\n⚠ Interrompido: resultados parciais")
+    finally:
+        parar.set()
+        for thread in threads:
+            thread.join(timeout=65)
+
+    print(" " * 60, end='\r')
+    return amostras, time.perf_counter() - inicio
+
+
+def imprimir_resultado(resultado, anterior=None):
+    print(f"  {'Cenário':<22} {'Req':>7} {'Erros':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    print("-" * 86)
+    for cenario, r in resultado['cenarios'].items():
+        print(f"  {cenario:<22} {r['requisicoes']:>7} {r['erros']:>6} {r['vazao']:>8.1f} "
+              f"{r['p50']:>9.1f} {r['p95']:>9.1f} {r['p99']:>9.1f} {r['maximo']:>9.1f}")
+        base = (anterior or {}).get('cenarios', {}).get(cenario)
+        if base:
+            variacao = lambda chave: (r[chave] / base[chave] - 1) * 100 if base[chave] else 0.0
+            print(f"  {'  vs. anterior':<22} {'':>7} {'':>6} {variacao('vazao'):>+7.0f}% "
+                  f"{variacao('p50'):>+8.0f}% {variacao('p95'):>+8.0f}% {variacao('p99'):>+8.0f}%")
+    print("-" * 86)
+    total = resultado['total']
+    print(f"  {'TOTAL':<22} {total['requisicoes']:>7} {total['erros']:>6} {total['vazao']:>8.1f}")
+    if anterior:
+        print(f"  Execução anterior: {anterior['total']['vazao']:.1f} req/s "
+              f"({anterior.get('data', '?')}, {anterior.get('usuarios', '?')} usuários)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga do Sistema de Gestão de Ativos')
+    parser.add_argument('--url', default='http://localhost:5000', help='Endereço do servidor')
+    parser.add_argument('--banco', default=db.DB, help=f'Banco usado pelo servidor (padrão: {db.DB})')
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--senha', default=os.getenv('CARGA_SENHA', 'admin123'))
+    parser.add_argument('--usuarios', type=int, default=10, help='Usuários simultâneos (padrão: 10)')
+    parser.add_argument('--duracao', type=float, default=60, help='Duração da medição em segundos (padrão: 60)')
+    parser.add_argument('--aquecimento', type=float, default=5, help='Segundos de aquecimento não medidos')
+    parser.add_argument('--pausa', type=float, default=0, help='Pausa média entre ações de um usuário (s)')
+    parser.add_argument('--cenarios', help=f"Lista separada por vírgula (padrão: todos: {','.join(CENARIOS)})")
+    parser.add_argument('--semente', type=int, help='Semente aleatória (sequência reprodutível)')
+    parser.add_argument('--salvar', help='Grava o resultado em JSON')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparação')
+    args = parser.parse_args()
+
+    cenarios = CENARIOS
+    if args.cenarios:
+        desconhecidos = set(args.cenarios.split(',')) - set(CENARIOS)
+        if desconhecidos:
+            parser.error(f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+        cenarios = {nome: CENARIOS[nome] for nome in args.cenarios.split(',')}
+
+    dados = DadosCarga(args.banco)
+
+    print("=" * 86)
+    print("  TESTE DE CARGA - Sistema de Gestão de Ativos")
+    print("=" * 86)
+    print(f"  Servidor: {args.url}  |  Usuários: {args.usuarios}  |  Duração: {args.duracao:.0f}s")
+    print(f"  Ativos amostrados: {len(dados.ativos)}  |  Inventário conferido: {dados.inventario or '-'}")
+    print()
+
+    verificacao = UsuarioVirtual(args.url, args.usuario, args.senha, dados, Amostras(), random.Random())
+    try:
+        status, corpo = verificacao.login(medir=False)
+    except (urllib.error.URLError, OSError) as e:
+        print(f"❌ Servidor indisponível em {args.url}: {e}")
+        return 1
+    if b'name="password"' in corpo:
+        print("❌ Login recusado: verifique --usuario/--senha")
+        return 1
+
+    amostras, duracao = executar_carga(args, dados, cenarios)
+
+    por_cenario = amostras.resumo(duracao)
+    resultado = {
+        'data': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'url': args.url,
+        'usuarios': args.usuarios,
+        'duracao': duracao,
+        'cenarios': por_cenario,
+        'total': {
+            'requisicoes': sum(r['requisicoes'] for r in por_cenario.values()),
+            'erros': sum(r['erros'] for r in por_cenario.values()),
+            'vazao': sum(r['requisicoes'] for r in por_cenario.values()) / duracao,
+        },
+        'erros': amostras.erros,
+    }
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+
+    imprimir_resultado(resultado, anterior)
+
+    for cenario, erros in amostras.erros.items():
+        for erro, total in erros.items():
+            print(f"  ⚠ {cenario}: {erro} ({total}x)")
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultado salvo em {args.salvar}")
+
+    return 1 if resultado['total']['erros'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
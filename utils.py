@@ -2,12 +2,13 @@
 Funções utilitárias para o sistema de gestão de ativos
 """
 
-import sqlite3
 import os
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
-DB = "ativos.db"
+import db
+
+DB = db.DB
 UPLOAD_FOLDER = "static/uploads"
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'xls', 'xlsx'}
 
@@ -36,7 +37,7 @@ def registrar_historico(ativo_id, acao, campo=None, valor_anterior=None, valor_n
         ip_address: IP de onde veio a requisição
     """
     try:
-        with sqlite3.connect(DB) as conn:
+        with db.conectar() as conn:
             conn.execute('''
                 INSERT INTO historico (ativo_id, acao, campo, valor_anterior, valor_novo, usuario, ip_address)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -48,7 +49,7 @@ def registrar_historico(ativo_id, acao, campo=None, valor_anterior=None, valor_n
 
 def get_historico_ativo(ativo_id):
     """Busca todo o histórico de um ativo"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
         historico = cursor.execute('''
             SELECT id, acao, campo, valor_anterior, valor_novo, usuario, ip_address, criado_em
@@ -61,7 +62,7 @@ def get_historico_ativo(ativo_id):
 
 def get_anexos_ativo(ativo_id):
     """Busca todos os anexos de um ativo"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
         anexos = cursor.execute('''
             SELECT id, tipo, nome_arquivo, caminho, tamanho, mime_type, descricao, principal, criado_em
@@ -74,7 +75,7 @@ def get_anexos_ativo(ativo_id):
 
 def get_foto_principal(ativo_id):
     """Busca a foto principal de um ativo"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
         foto = cursor.execute('''
             SELECT caminho FROM anexos
@@ -86,7 +87,7 @@ def get_foto_principal(ativo_id):
 
 def get_manutencoes_ativo(ativo_id):
     """Busca todas as manutenções de um ativo"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
         manutencoes = cursor.execute('''
             SELECT id, tipo, descricao, data_manutencao, proximo_agendamento,
@@ -100,7 +101,7 @@ def get_manutencoes_ativo(ativo_id):
 
 def get_proximas_manutencoes(dias=30):
     """Busca manutenções agendadas nos próximos X dias"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
         manutencoes = cursor.execute('''
             SELECT m.id, m.ativo_id, a.codigo_id, a.nome, m.tipo, m.proximo_agendamento
@@ -116,7 +117,7 @@ def get_proximas_manutencoes(dias=30):
 
 def get_categorias():
     """Busca todas as categorias"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
         categorias = cursor.execute('''
             SELECT id, nome, descricao, icone, cor
@@ -128,7 +129,7 @@ def get_categorias():
 
 def get_categoria(categoria_id):
     """Busca uma categoria específica"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
         categoria = cursor.execute('''
             SELECT id, nome, descricao, icone, cor
@@ -140,7 +141,7 @@ def get_categoria(categoria_id):
 
 def get_estatisticas_categorias():
     """Busca estatísticas de ativos por categoria"""
-    with sqlite3.connect(DB) as conn:
+    with db.conectar() as conn:
         cursor = conn.cursor()
         stats = cursor.execute('''
             SELECT c.nome, c.cor, c.icone, COUNT(a.id) as total
@@ -0,0 +1,104 @@
+"""
+Valores distintos dos campos de filtro, com contagem de ativos
+A tabela ativos_valores é mantida por triggers em ativos, então os
+formulários não precisam de SELECT DISTINCT sobre a tabela inteira
+"""
+
+import db
+from cache import em_cache
+
+# Campos de ativos com lista de valores mantida
+CAMPOS_FILTRO = ('estado', 'localizacao', 'responsavel', 'categoria_id')
+
+
+def _sql_incrementar(campo, origem):
+    return f'''
+        INSERT INTO ativos_valores (campo, valor, total)
+        SELECT '{campo}', CAST({origem}.{campo} AS TEXT), 1
+        WHERE {origem}.{campo} IS NOT NULL AND {origem}.{campo} <> ''
+        ON CONFLICT(campo, valor) DO UPDATE SET total = total + 1;
+    '''
+
+
+def _sql_decrementar(campo, origem):
+    return f'''
+        UPDATE ativos_valores SET total = total - 1
+        WHERE campo = '{campo}' AND valor = CAST({origem}.{campo} AS TEXT);
+        DELETE FROM ativos_valores
+        WHERE campo = '{campo}' AND valor = CAST({origem}.{campo} AS TEXT) AND total <= 0;
+    '''
+
+
+def criar_tabelas(conn):
+    """Cria ativos_valores, seus triggers e preenche a partir de ativos se estiver vazia"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ativos_valores (
+            campo TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (campo, valor)
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS ativos_valores_insert AFTER INSERT ON ativos
+        BEGIN
+            {''.join(_sql_incrementar(c, 'NEW') for c in CAMPOS_FILTRO)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS ativos_valores_delete AFTER DELETE ON ativos
+        BEGIN
+            {''.join(_sql_decrementar(c, 'OLD') for c in CAMPOS_FILTRO)}
+        END
+    ''')
+    for campo in CAMPOS_FILTRO:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS ativos_valores_update_{campo}
+            AFTER UPDATE OF {campo} ON ativos
+            WHEN OLD.{campo} IS NOT NEW.{campo}
+            BEGIN
+                {_sql_decrementar(campo, 'OLD')}
+                {_sql_incrementar(campo, 'NEW')}
+            END
+        ''')
+
+    if not conn.execute('SELECT 1 FROM ativos_valores LIMIT 1').fetchone():
+        reconstruir(conn)
+
+
+def reconstruir(conn):
+    """Recalcula ativos_valores a partir de ativos (uma varredura por campo)"""
+    conn.execute('DELETE FROM ativos_valores')
+    for campo in CAMPOS_FILTRO:
+        conn.execute(f'''
+            INSERT INTO ativos_valores (campo, valor, total)
+            SELECT '{campo}', CAST({campo} AS TEXT), COUNT(*)
+            FROM ativos
+            WHERE {campo} IS NOT NULL AND {campo} <> ''
+            GROUP BY CAST({campo} AS TEXT)
+        ''')
+
+
+@em_cache(('ativos',))
+def valores_distintos(campo):
+    """
+    Lista de valores de um campo com o número de ativos em cada um
+
+    Returns:
+        Lista de tuplas (valor, total) em ordem alfabética
+    """
+    if campo not in CAMPOS_FILTRO:
+        raise ValueError(f"Campo sem lista de valores: {campo}")
+
+    with db.conectar() as conn:
+        return conn.execute('''
+            SELECT valor, total FROM ativos_valores
+            WHERE campo = ?
+            ORDER BY valor
+        ''', (campo,)).fetchall()
+
+
+def totais_por_categoria():
+    """Número de ativos por categoria: {categoria_id: total}"""
+    return {int(valor): total for valor, total in valores_distintos('categoria_id')}
@@ -0,0 +1,121 @@
+"""
+Versão dos dados por tabela e respostas condicionais (ETag / 304)
+Cada escrita em uma tabela monitorada incrementa a sua versão por trigger
+"""
+
+import hashlib
+import os
+from datetime import date
+
+from flask import g, request, session
+from flask_login import current_user
+
+import db
+
+# Tabelas cuja versão é mantida pelos triggers
+TABELAS_VERSIONADAS = (
+    'ativos', 'categorias', 'historico', 'anexos', 'manutencoes',
+    'inventarios', 'inventario_itens', 'manutencoes_fila',
+)
+
+
+def criar_tabelas(conn):
+    """
+    Cria a tabela versao_dados e os triggers que a incrementam
+
+    Os triggers cobrem qualquer escrita (rotas, scripts, migrações), então
+    nenhuma rota precisa lembrar de incrementar a versão manualmente.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS versao_dados (
+            tabela TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    for tabela in TABELAS_VERSIONADAS:
+        conn.execute('INSERT OR IGNORE INTO versao_dados (tabela, versao) VALUES (?, 0)', (tabela,))
+        for operacao in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS versao_{tabela}_{operacao.lower()}
+                AFTER {operacao} ON {tabela}
+                BEGIN
+                    UPDATE versao_dados SET versao = versao + 1 WHERE tabela = '{tabela}';
+                END
+            ''')
+
+
+def obter_versoes(conn=None):
+    """Retorna {tabela: versao} de todas as tabelas versionadas"""
+    conn = conn or db.conexao_persistente()
+    return dict(conn.execute('SELECT tabela, versao FROM versao_dados').fetchall())
+
+
+def _versao_templates(pasta):
+    """Assinatura dos templates, para que um deploy invalide as ETags antigas"""
+    assinatura = hashlib.sha1()
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in sorted(arquivos):
+            stat = os.stat(os.path.join(raiz, nome))
+            assinatura.update(f'{nome}:{stat.st_mtime_ns}:{stat.st_size}'.encode())
+    return assinatura.hexdigest()[:12]
+
+
+def calcular_etag(tabelas, versoes, *extras):
+    """ETag forte a partir das versões das tabelas e de dados da requisição"""
+    partes = [f'{t}={versoes.get(t, 0)}' for t in tabelas]
+    partes.extend(str(e) for e in extras)
+    return hashlib.sha1('|'.join(partes).encode()).hexdigest()
+
+
+def registrar_get_condicional(app, rotas):
+    """
+    Responde 304 Not Modified a GETs repetidos das rotas informadas
+
+    Args:
+        app: Aplicação Flask
+        rotas: {endpoint: (tabelas das quais a página depende)}; no lugar
+            da tupla pode vir uma função que recebe os argumentos da rota
+            e devolve as tabelas (ou None para não usar ETag)
+
+    A ETag combina as versões das tabelas, a rota e seus parâmetros, o
+    usuário (as páginas variam conforme o perfil), a data (dias restantes
+    de garantia etc.) e a versão dos templates.
+    """
+    versao_templates = _versao_templates(os.path.join(app.root_path, app.template_folder))
+
+    @app.before_request
+    def _verificar_etag():
+        tabelas = rotas.get(request.endpoint)
+        if callable(tabelas):
+            tabelas = tabelas(**request.view_args)
+        if request.method != 'GET' or not tabelas:
+            return None
+
+        # Mensagens flash pendentes mudam a página sem mudar os dados
+        if session.get('_flashes'):
+            return None
+
+        usuario = current_user.get_id() if current_user.is_authenticated else None
+        etag = calcular_etag(
+            tabelas, obter_versoes(),
+            request.endpoint, sorted(request.view_args.items()), request.query_string,
+            usuario, date.today().isoformat(), versao_templates,
+        )
+        g.etag = etag
+
+        if etag in request.if_none_match:
+            resposta = app.response_class(status=304)
+            resposta.set_etag(etag)
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return None
+
+    @app.after_request
+    def _definir_etag(resposta):
+        etag = g.pop('etag', None)
+        if etag and resposta.status_code == 200:
+            resposta.set_etag(etag)
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+        return resposta
+
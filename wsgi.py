@@ -0,0 +1,14 @@
+"""
+Ponto de entrada WSGI para produção
+
+  gunicorn -c gunicorn.conf.py
+
+Com preload_app, este módulo é importado uma única vez no processo
+mestre e os workers são criados por fork (memória compartilhada por
+copy-on-write). O agendador é iniciado em cada worker pelo hook
+post_fork de gunicorn.conf.py.
+"""
+
+from app import create_app
+
+app = create_app()